@@ -0,0 +1,75 @@
+import click
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from server.app.models.generation.success_generation_model import SuccessGenerationModel, Completion, Choice, \
+    Message, Usage  # noqa: E402
+from server.app.utils.stream_frames import StreamFrame, build_success_frame  # noqa: E402
+from server.app.utils.usage_tracker import UsageTracker  # noqa: E402
+
+PROMPT = "Write a rant in the style of Linus Torvalds about using spaces instead of tabs for indentation in code."
+CONTENT = "Spaces? SPACES? " * 8
+
+
+def legacy_pipeline(frames: int) -> None:
+    """Client validates and encodes, router decodes, re-validates and encodes again (previous behaviour)."""
+    for _ in range(frames):
+        encoded = SuccessGenerationModel(
+            id="benchmark",
+            model="benchmark-model",
+            completion=Completion(
+                id="chatcmpl-benchmark",
+                choices=[Choice(finish_reason="null", index=0, message=Message(content=CONTENT, role="assistant"))],
+                created=0,
+                model="benchmark-model",
+                object="chat.completion.chunk",
+                system_fingerprint=None,
+                usage=Usage(
+                    completion_tokens=len(CONTENT.split()),
+                    prompt_tokens=len(PROMPT.split()),
+                    total_tokens=len(CONTENT.split()) + len(PROMPT.split()),
+                    ended=int(datetime.utcnow().timestamp())
+                )
+            )
+        ).model_dump_json().encode('utf-8')
+
+        result = encoded.decode('utf-8')
+        success_model = SuccessGenerationModel.model_validate(json.loads(result))
+        success_model.model_dump_json().encode('utf-8') + b'\n'
+
+
+def frame_pipeline(frames: int) -> None:
+    """Client builds a StreamFrame encoded once, router passes the bytes through."""
+    usage = UsageTracker("benchmark-model", PROMPT)
+    for _ in range(frames):
+        frame = StreamFrame.from_model(build_success_frame(
+            id="benchmark", model="benchmark-model", content=CONTENT, usage=usage.usage(),
+            completion_id="chatcmpl-benchmark", created=0, object="chat.completion.chunk"
+        ), "benchmark-model")
+        frame.data
+
+
+@click.command('frame-pipeline-benchmark')
+@click.option('--frames', default=50000, help='Number of frames pushed through each pipeline')
+def frame_pipeline_benchmark(frames: int):
+    """
+    Measure frames per second per core for the client -> router frame pipeline, before and after StreamFrame.
+    """
+    click.echo(f"{'pipeline':<12}{'frames/s/core':>16}")
+    results = {}
+    for name, pipeline in (("legacy", legacy_pipeline), ("streamframe", frame_pipeline)):
+        started = time.process_time()
+        pipeline(frames)
+        elapsed = time.process_time() - started
+        results[name] = frames / elapsed
+        click.echo(f"{name:<12}{results[name]:>16,.0f}")
+
+    click.echo(f"speedup: {results['streamframe'] / results['legacy']:.2f}x")
+
+
+if __name__ == "__main__":
+    frame_pipeline_benchmark()
@@ -0,0 +1,93 @@
+import click
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from server.app.services.gripsbox_index_service import GripsboxIndex, get_embedder, hashing_embedder  # noqa: E402
+from server.app.utils.usage_tracker import UsageTracker  # noqa: E402
+
+TOPICS = ["invoice", "contract", "drone", "podcast", "database", "kubernetes", "telegram", "migration",
+          "embedding", "vacation", "budget", "security"]
+FILLER = ["the", "team", "agreed", "that", "every", "request", "should", "be", "checked", "before", "release",
+          "and", "documented", "in", "the", "wiki", "with", "examples", "for", "new", "colleagues", "."]
+
+
+def synthetic_documents(documents: int, paragraphs: int, seed: int) -> dict:
+    """Documents made of paragraphs that each talk about one topic."""
+    rng = random.Random(seed)
+    corpus = {}
+    for number in range(documents):
+        parts = []
+        for _ in range(paragraphs):
+            topic = rng.choice(TOPICS)
+            words = [topic if rng.random() < 0.1 else rng.choice(FILLER) for _ in range(rng.randint(60, 140))]
+            parts.append(" ".join(words))
+        corpus[f"document_{number}.txt"] = "\n\n".join(parts)
+    return corpus
+
+
+def load_documents(folder: str) -> dict:
+    corpus = {}
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path) and name.endswith(".txt"):
+            with open(path, "r", encoding="utf-8", errors="ignore") as file:
+                corpus[name] = file.read()
+    return corpus
+
+
+@click.command('gripsbox-retrieval-benchmark')
+@click.option('--folder', default=None, help='Folder with .txt documents (default: synthetic documents)')
+@click.option('--prompt', 'prompts', multiple=True, help='Prompt to retrieve for, can be repeated')
+@click.option('--top-k', default=6, help='Number of chunks injected per prompt')
+@click.option('--model', default='gpt-4o', help='Model whose tokenizer counts the tokens')
+@click.option('--embedder', type=click.Choice(['hashing', 'sentence-transformers']), default='hashing',
+              help='hashing runs without a model download, sentence-transformers uses the production model')
+@click.option('--documents', default=8, help='Number of synthetic documents')
+@click.option('--paragraphs', default=40, help='Paragraphs per synthetic document')
+@click.option('--seed', default=42, help='Random seed for the synthetic documents')
+def gripsbox_retrieval_benchmark(folder, prompts, top_k, model, embedder, documents, paragraphs, seed):
+    """
+    Compare the prompt tokens of pasting all active gripsbox files with injecting the top-k chunks.
+    Runs offline, no provider is called.
+    """
+    corpus = load_documents(folder) if folder else synthetic_documents(documents, paragraphs, seed)
+    prompts = prompts or [f"What do the documents say about the {topic}?" for topic in TOPICS[:5]]
+    embed = hashing_embedder() if embedder == 'hashing' else get_embedder()
+    counter = UsageTracker(model, "")
+
+    with tempfile.TemporaryDirectory() as index_folder:
+        index = GripsboxIndex(index_folder, embed)
+        started = time.perf_counter()
+        chunks = sum(index.add_document(name, name, text) for name, text in corpus.items())
+        build_time = time.perf_counter() - started
+
+        # Full paste: every active file is sent with every prompt
+        full_paste = " ".join(f"Content from Gripsbox file: File: {name} (type: text/plain)\n{text}"
+                              for name, text in corpus.items())
+        full_tokens = counter.count(full_paste)
+
+        click.echo(f"{len(corpus)} documents, {chunks} chunks, index built in {build_time * 1000:.0f} ms")
+        click.echo(f"{'prompt':<50}{'full paste':>12}{'top-k':>10}{'saved':>8}{'search ms':>11}")
+        total_retrieved = 0
+        for prompt in prompts:
+            started = time.perf_counter()
+            results = index.search(prompt, top_k)
+            search_time = time.perf_counter() - started
+            retrieved = " ".join(f"Content from Gripsbox file: File: {chunk.name} "
+                                 f"(part {chunk.index + 1}/{chunk.count})\n{chunk.text}" for chunk in results)
+            retrieved_tokens = counter.count(retrieved)
+            total_retrieved += retrieved_tokens
+            click.echo(f"{prompt[:48]:<50}{full_tokens:>12,}{retrieved_tokens:>10,}"
+                       f"{1 - retrieved_tokens / max(full_tokens, 1):>8.1%}{search_time * 1000:>11.1f}")
+
+    average = total_retrieved / len(prompts)
+    click.echo(f"average prompt tokens: full paste {full_tokens:,}, top-{top_k} {average:,.0f} "
+               f"({1 - average / max(full_tokens, 1):.1%} saved)")
+
+
+if __name__ == "__main__":
+    gripsbox_retrieval_benchmark()
@@ -0,0 +1,92 @@
+import click
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from server.app.utils.stream_frames import build_success_frame, build_delta_frame  # noqa: E402
+from server.app.utils.usage_tracker import UsageTracker  # noqa: E402
+
+WORDS = ["the", "model", "streams", "tokens", "to", "hudini", "while", "users", "compare", "answers",
+         "across", "providers", "and", "context", "windows", "grow", "with", "every", "turn", "."]
+
+
+def synthetic_deltas(tokens: int, seed: int) -> list:
+    """Simulate the content deltas of a provider stream, roughly one word per chunk."""
+    rng = random.Random(seed)
+    return [" " + rng.choice(WORDS) for _ in range(tokens)]
+
+
+def run_cumulative(deltas: list, prompt: str) -> tuple:
+    full_content = ""
+    total_bytes = 0
+    frames = 0
+    started = time.process_time()
+    usage = UsageTracker("benchmark-model", prompt)
+    for delta in deltas:
+        full_content += delta
+        usage.add(delta)
+        frame = build_success_frame(
+            id="benchmark", model="benchmark-model", content=full_content, usage=usage.usage(),
+            completion_id="chatcmpl-benchmark", created=0, object="chat.completion.chunk"
+        ).model_dump_json().encode('utf-8') + b'\n'
+        total_bytes += len(frame)
+        frames += 1
+    return frames, total_bytes, time.process_time() - started
+
+
+def run_delta(deltas: list, prompt: str) -> tuple:
+    full_content = ""
+    total_bytes = 0
+    frames = 0
+    started = time.process_time()
+    usage = UsageTracker("benchmark-model", prompt)
+    for seq, delta in enumerate(deltas):
+        full_content += delta
+        usage.add(delta)
+        frame = build_delta_frame("benchmark", "benchmark-model", seq, delta).model_dump_json().encode('utf-8') + b'\n'
+        total_bytes += len(frame)
+        frames += 1
+
+    final_frame = build_success_frame(
+        id="benchmark", model="benchmark-model", content=full_content, usage=usage.usage(),
+        completion_id="chatcmpl-benchmark", created=0, object="chat.completion.chunk", finish_reason="stop"
+    ).model_dump_json().encode('utf-8') + b'\n'
+    total_bytes += len(final_frame)
+    frames += 1
+    return frames, total_bytes, time.process_time() - started
+
+
+@click.command('stream-mode-benchmark')
+@click.option('--tokens', default=2000, help='Number of streamed chunks per answer')
+@click.option('--streams', default=5, help='Number of streams to average over')
+@click.option('--seed', default=42, help='Random seed for the synthetic answer')
+def stream_mode_benchmark(tokens: int, streams: int, seed: int):
+    """
+    Compare bytes on the wire and serialization CPU per stream for the cumulative and delta stream modes.
+    """
+    prompt = "Write a rant in the style of Linus Torvalds about using spaces instead of tabs for indentation in code."
+    deltas = synthetic_deltas(tokens, seed)
+
+    results = {}
+    for mode, runner in (("cumulative", run_cumulative), ("delta", run_delta)):
+        total_bytes = 0
+        total_cpu = 0.0
+        frames = 0
+        for _ in range(streams):
+            frames, stream_bytes, cpu = runner(deltas, prompt)
+            total_bytes += stream_bytes
+            total_cpu += cpu
+        results[mode] = (frames, total_bytes / streams, total_cpu / streams)
+
+    click.echo(f"{'mode':<12}{'frames':>10}{'bytes/stream':>16}{'cpu ms/stream':>16}")
+    for mode, (frames, stream_bytes, cpu) in results.items():
+        click.echo(f"{mode:<12}{frames:>10}{stream_bytes:>16,.0f}{cpu * 1000:>16.1f}")
+
+    cumulative, delta = results["cumulative"], results["delta"]
+    click.echo(f"bytes saved: {1 - delta[1] / cumulative[1]:.1%}, cpu saved: {1 - delta[2] / max(cumulative[2], 1e-9):.1%}")
+
+
+if __name__ == "__main__":
+    stream_mode_benchmark()
@@ -1,17 +1,33 @@
 import logging
-from typing import AsyncGenerator, List
+from typing import AsyncGenerator, List, Optional
 import anthropic
-from server.app.models.generation.success_generation_model import SuccessGenerationModel, Completion, Choice, Message, Usage
+import httpx
 from server.app.models.generation.generation_request import GenerationRequest, ModelConfig
 from server.app.models.generation.anthropic_model import AnthropicModel
+from server.app.utils.stream_frames import StreamFrame, build_error_frame, build_success_frame
+from server.app.utils.usage_tracker import UsageTracker
+from server.app.utils.context_packer import pack_context_async, generation_sources, TokenCache
+from server.app.utils.stream_multiplexer import merge_streams
 from datetime import datetime
 
 class AnthropicClient:
     async_methods = ['fetch_completion']
 
-    def __init__(self, api_key: str) -> None:
+    MODEL_CONTEXT_WINDOWS = {
+        'claude-3-5-sonnet-20240620': 200000,
+        'claude-3-opus-20240229': 200000,
+        'claude-3-sonnet-20240229': 200000,
+        'claude-3-haiku-20240307': 200000,
+    }
+
+    SYSTEM_PROMPT = "You are a helpful assistant."
+
+    # Matches max_tokens of the requests
+    MAX_OUTPUT_TOKENS = 4096
+
+    def __init__(self, api_key: str, http_client: Optional[httpx.AsyncClient] = None) -> None:
         self.api_key = api_key
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client)
         self.logger = self.setup_logger()
         self.logger.debug(f"AnthropicClient initialized with API key: {api_key[:5]}...")
 
@@ -27,69 +43,99 @@ class AnthropicClient:
         return logger
 
 
-    async def generate(self, models: List[ModelConfig], request: GenerationRequest, context: str) -> AsyncGenerator[bytes, None]:
+    async def close(self) -> None:
+        """
+        Close the shared connection pool. Called on application shutdown.
         """
-        Generate text from the Anthropic model with context passed as a parameter.
+        await self.client.close()
+
+    async def generate(self, models: List[ModelConfig], request: GenerationRequest, context: str) -> AsyncGenerator[StreamFrame, None]:
+        """
+        Generate text from the Anthropic models with context passed as a parameter.
+        All models stream at the same time, frames are yielded as they arrive.
 
         :param models: List of ModelConfig containing model details
         :param request: GenerationRequest containing user prompt
         :param context: The additional context to be passed to the API
-        :return: AsyncGenerator yielding the generation result as bytes
+        :return: AsyncGenerator yielding the generation result as StreamFrame
         """
-        for model_config in models:
-            async for result in self._stream_model_response(model_config, request, context):
-                yield result
+        # The models share the sources, each source is tokenized once per encoding
+        token_cache = TokenCache()
+        streams = [self._stream_model_response(model_config, request, context, token_cache)
+                   for model_config in models]
+
+        def error_frame(index: int, error: Exception) -> StreamFrame:
+            # A failing model ends with its error frame, the other models keep streaming
+            model = models[index].model
+            return StreamFrame.from_model(build_error_frame(request.id, model, error), model)
 
-    async def _stream_model_response(self, model_config: ModelConfig, request: GenerationRequest, context: str) -> AsyncGenerator[bytes, None]:
+        async for frame in merge_streams(streams, on_error=error_frame):
+            yield frame
+
+    async def _stream_model_response(self, model_config: ModelConfig, request: GenerationRequest, context: str,
+                                     token_cache: Optional[TokenCache] = None) -> AsyncGenerator[StreamFrame, None]:
         """
         Streams the response from the model and returns the completion details.
 
         :param model_config: The configuration of the model to use.
         :param request: The GenerationRequest object containing the prompt.
         :param context: The additional context to be passed along with the user prompt.
-        :return: AsyncGenerator yielding JSON response.
+        :param token_cache: Tokens of the sources, shared by the models of the request.
+        :return: AsyncGenerator yielding StreamFrame.
         """
-        # Use the `system` parameter instead of including it in `messages`
-        with self.client.messages.stream(
-                max_tokens=4096,
+        # Kontext auf das Kontextfenster des Modells zuschneiden
+        packed = await pack_context_async(model_config.model,
+                                          generation_sources(self.SYSTEM_PROMPT, context, "", request.prompt),
+                                          self.MODEL_CONTEXT_WINDOWS.get(model_config.model),
+                                          reserved_output_tokens=self.MAX_OUTPUT_TOKENS, token_cache=token_cache)
+
+        # Use the `system` parameter instead of including it in `messages`. The system message is sent as
+        # blocks with cache_control breakpoints, so the stable prefix is read from Anthropic's prompt cache.
+        async with self.client.beta.prompt_caching.messages.stream(
+                max_tokens=self.MAX_OUTPUT_TOKENS,
                 #max_tokens=model_config.max_tokens,
-                system=context,  # Use the system parameter for context
+                system=packed.system_blocks(),
                 messages=[{"role": "user", "content": request.prompt}],
                 model=model_config.model,
         ) as stream:
             full_content = ""
-            for text in stream.text_stream:
+            seq = 0
+            usage = UsageTracker(model_config.model, request.prompt, prompt_tokens=packed.total_tokens)
+            async for text in stream.text_stream:
                 full_content += text
-                completion = Completion(
+                usage.add(text)
+                yield StreamFrame.from_model(build_success_frame(
                     id=request.id,
-                    choices=[Choice(
-                        finish_reason="null",
-                        index=1,
-                        message=Message(
-                            content=full_content,
-                            role="assistant"
-                        )
-                    )],
-                    created=int(datetime.utcnow().timestamp()),
                     model=model_config.model,
+                    content=full_content,
+                    usage=usage.usage(),
+                    completion_id=request.id,
+                    created=int(datetime.utcnow().timestamp()),
                     object="model",
-                    system_fingerprint=None,
-                    usage=Usage(
-                        completion_tokens=len(full_content.split()),  # Calculate tokens using accumulated content
-                        prompt_tokens=len(request.prompt.split()),
-                        total_tokens=len(full_content.split()) + len(request.prompt.split()),
-                        ended=int(datetime.utcnow().timestamp())
-                    )
-                )
-
-                success_model = SuccessGenerationModel(
-                    id=request.id,
-                    model=model_config.model,
-                    completion=completion,
-                    finish_reason="incomplete"  # Adjust as needed
-                )
+                    index=1,
+                    seq=seq,
+                ), model_config.model)
+                seq += 1
 
-                yield success_model.model_dump_json().encode('utf-8') + b'\n'
+            # Final frame with the usage reported by Anthropic
+            final_message = await stream.get_final_message()
+            # input_tokens only counts the uncached part of the prompt
+            reported = final_message.usage
+            cache_read = getattr(reported, "cache_read_input_tokens", None) or 0
+            cache_creation = getattr(reported, "cache_creation_input_tokens", None) or 0
+            usage.report(reported.input_tokens + cache_read + cache_creation, reported.output_tokens, cache_read)
+            yield StreamFrame.from_model(build_success_frame(
+                id=request.id,
+                model=model_config.model,
+                content=full_content,
+                usage=usage.usage(),
+                completion_id=request.id,
+                created=int(datetime.utcnow().timestamp()),
+                object="model",
+                finish_reason=final_message.stop_reason,
+                index=1,
+                seq=seq,
+            ), model_config.model)
 
     def get_available_models(self) -> list:
         """
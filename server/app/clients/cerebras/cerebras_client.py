@@ -1,15 +1,21 @@
 import logging
 
 
-from datetime import datetime
+import httpx
 from cerebras.cloud.sdk import Cerebras
-from sqlalchemy.ext.asyncio import AsyncSession
-from server.app.models.generation.success_generation_model import SuccessGenerationModel, Completion, Choice, Message, Usage
 from server.app.models.generation.cerebras_model import CerebrasModel
+from server.app.models.generation.generation_request import StreamMode
 from typing import Optional
 from typing import List
 from server.app.models.models.models_get_response import ModelGetResponseModel
-from server.app.utils.hudini_utils import hudini_character
+from server.app.utils.hudini_utils import hudini_character, hudini_clock
+from server.app.utils.stream_frames import StreamFrame, build_success_frame, build_delta_frame, build_error_frame
+from server.app.utils.async_stream_bridge import iterate_in_thread
+from server.app.utils.usage_tracker import UsageTracker, reported_cached_tokens
+from server.app.utils.context_packer import pack_context_async, generation_sources, TokenCache
+
+# Maximum number of chunks buffered between the Cerebras worker thread and the response
+STREAM_QUEUE_SIZE = 32
 
 class CerebrasClient:
     async_methods = ['fetch_completion']
@@ -42,9 +48,10 @@ class CerebrasClient:
         'llama-3.3-70b': 8192,
     }
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, http_client: Optional[httpx.Client] = None):
         self.api_key = api_key
-        self.client = Cerebras(api_key=api_key)  # For async operations
+        # Das SDK ist synchron, gestreamt wird über iterate_in_thread
+        self.client = Cerebras(api_key=api_key, http_client=http_client)
         self.logger = self.setup_logger()
 
         self.logger.debug(f"CerebrasClient IN_PROGRESS with API key: {api_key[:5]}...")
@@ -52,121 +59,146 @@ class CerebrasClient:
     def setup_logger(self):
         logger = logging.getLogger(__name__)
         logger.setLevel(logging.DEBUG)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        if not logger.hasHandlers():
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
         return logger
 
+    async def close(self) -> None:
+        """
+        Close the connection pool. Called on application shutdown.
+        """
+        self.client.close()
+
     import asyncio
 
     async def fetch_completion(self, cerebras_model: CerebrasModel, prompt: str, id: str,
                                context: str, presence_penalty: Optional[float] = 0.0,
-                               gripsbox_content: Optional[str] = None, db: AsyncSession = None,
-                               user_uuid: Optional[str] = None):
+                               gripsbox_content: Optional[str] = None,
+                               user_system_prompt: Optional[str] = None,
+                               stream_mode: StreamMode = StreamMode.CUMULATIVE,
+                               temperature: Optional[float] = None,
+                               max_tokens: Optional[int] = None,
+                               token_cache: Optional[TokenCache] = None):
         try:
             # Kontext vorbereiten
-            now = datetime.now()
-            today = now.strftime("%Y-%m-%d")
-            current_time = now.strftime("%H:%M:%S")
-            system_prompt = await hudini_character(today, current_time, db, user_uuid)
-
-            sanitized_context = context
-            if gripsbox_content:
-                sanitized_context += f"\n\nGripsbox Content:\n{gripsbox_content}"
-
-            sanitized_context = sanitized_context.replace(system_prompt, "").strip()
-            self.logger.debug(f"sanitized_context: {sanitized_context}")
-
+            # Stabiler Teil vorne, die Uhrzeit als letztes Segment (Prefix-Caching der Provider)
+            system_prompt = hudini_character(user_system_prompt)
+
+            sanitized_context = context.replace(system_prompt, "").strip()
+
+            # Kontext auf das Kontextfenster des Modells zuschneiden (Verlauf und Gripsbox teilen sich das Budget)
+            # max_tokens der Anfrage bleibt für die Antwort frei
+            packed = await pack_context_async(cerebras_model.id,
+                                              generation_sources(system_prompt, sanitized_context,
+                                                                 gripsbox_content or "", prompt, clock=hudini_clock()),
+                                              self.MODEL_CONTEXT_WINDOWS.get(cerebras_model.id),
+                                              reserved_output_tokens=max_tokens, token_cache=token_cache)
             messages = [
-                {"role": "system", "content": f"{system_prompt}\n\n{sanitized_context}"},
+                {"role": "system", "content": packed.system_message()},
                 {"role": "user", "content": prompt},
             ]
 
-            # Anfrage an Cerebras senden (Streaming aktiviert)
-            stream = self.client.chat.completions.create(
-                model=cerebras_model.id,
-                messages=messages,
-                temperature=1.0,
-                stream=True,
-                presence_penalty=presence_penalty
-            )
+            # Anfrage an Cerebras senden (Streaming aktiviert). Das SDK ist synchron, daher läuft
+            # Request und Iteration in einem eigenen Thread, damit der Event-Loop nicht blockiert.
+            def open_stream():
+                return self.client.chat.completions.create(
+                    model=cerebras_model.id,
+                    messages=messages,
+                    temperature=temperature if temperature is not None else 1.0,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    presence_penalty=presence_penalty
+                )
 
             async def async_generator():
-                full_content = ""
-                for chunk in stream:
-                    self.logger.debug(f"Received chunk: {chunk}")
-                    delta_content = chunk.choices[0].delta.content or ""
-                    full_content += delta_content
-
-                    if delta_content.strip():  # Sende nur relevante Inhalte
-                        completion = Completion(
-                            id=chunk.id,
-                            choices=[Choice(
-                                finish_reason=chunk.choices[0].finish_reason or "null",
-                                index=chunk.choices[0].index,
-                                message=Message(
-                                    content=full_content,
-                                    role=chunk.choices[0].delta.role or "assistant"
-                                )
-                            )],
-                            created=chunk.created,
-                            model=cerebras_model.id,
-                            object=chunk.object,
-                            system_fingerprint=None,
-                            usage=Usage(
-                                completion_tokens=len(full_content.split()),
-                                prompt_tokens=len(prompt.split()),
-                                total_tokens=len(full_content.split()) + len(prompt.split()),
-                                ended=int(datetime.utcnow().timestamp())
-                            )
-                        )
-                        yield (SuccessGenerationModel(
-                            id=id,
-                            model=cerebras_model.id,
-                            completion=completion
-                        ).model_dump_json()).encode('utf-8')
+                try:
+                    async for frame in self._stream_frames(open_stream, cerebras_model, packed.total_tokens, id,
+                                                           stream_mode):
+                        yield frame
+                except Exception as e:
+                    self.logger.error(f"Error while streaming from Cerebras: {str(e)}")
+                    yield self._error_frame(cerebras_model, id, e)
 
             return async_generator()
 
-
         except Exception as e:
             self.logger.error(f"Error in fetch_completion: {str(e)}")
-            # Create a Completion object with the error message
-            completion_error = Completion(
-                id="error",
-                choices=[Choice(
-                    finish_reason="error",
-                    index=0,
-                    message=Message(
-                        content=f"Error occurred: {str(e)}",
-                        role="system"
-                    )
-                )],
-
-                created=int(datetime.utcnow().timestamp()),
-                model=cerebras_model.id,
-                object="error",
-                system_fingerprint=None,
-                usage=Usage(
-                    completion_tokens=0,
-                    prompt_tokens=0,
-                    total_tokens=0,
-                    ended=int(datetime.utcnow().timestamp())
-                )
-            )
-
-            # Return SuccessGenerationModel with error details
-
-            return iter([SuccessGenerationModel(
-
+            error_frame = self._error_frame(cerebras_model, id, e)
+
+            async def error_generator():
+                yield error_frame
+
+            return error_generator()
+
+    async def _stream_frames(self, open_stream, cerebras_model: CerebrasModel, prompt_tokens: int, id: str,
+                             stream_mode: StreamMode):
+        full_content = ""
+        seq = 0
+        last_chunk = None
+        finish_reason = None
+        usage = UsageTracker(cerebras_model.id, "", prompt_tokens=prompt_tokens)
+        usage_pending = False
+        async for chunk in iterate_in_thread(open_stream, maxsize=STREAM_QUEUE_SIZE):
+            self.logger.debug(f"Received chunk: {chunk}")
+            reported = getattr(chunk, "usage", None)
+            if reported:
+                usage.report(reported.prompt_tokens, reported.completion_tokens, reported_cached_tokens(reported))
+                usage_pending = True
+
+            if not chunk.choices:
+                continue
+
+            last_chunk = chunk
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta_content = chunk.choices[0].delta.content or ""
+            full_content += delta_content
+            usage.add(delta_content)
+
+            # Delta-Modus: nur den neuen Text senden
+            if stream_mode == StreamMode.DELTA:
+                if delta_content:
+                    yield StreamFrame.from_model(build_delta_frame(id, cerebras_model.id, seq, delta_content), cerebras_model.id)
+                    seq += 1
+                continue
+
+            if delta_content.strip():  # Sende nur relevante Inhalte
+                yield StreamFrame.from_model(build_success_frame(
+                    id=id,
+                    model=cerebras_model.id,
+                    content=full_content,
+                    usage=usage.usage(),
+                    completion_id=chunk.id,
+                    created=chunk.created,
+                    object=chunk.object,
+                    finish_reason=chunk.choices[0].finish_reason,
+                    index=chunk.choices[0].index,
+                    role=chunk.choices[0].delta.role,
+                    seq=seq,
+                ), cerebras_model.id)
+                seq += 1
+                usage_pending = False
+
+        # Abschließender Frame mit dem vollständigen Text und der exakten Usage
+        # (im Delta-Modus immer, sonst wenn die Usage nach dem letzten Frame kam)
+        if last_chunk is not None and (stream_mode == StreamMode.DELTA or usage_pending):
+            yield StreamFrame.from_model(build_success_frame(
                 id=id,
-
                 model=cerebras_model.id,
-
-                completion=completion_error
-
-            ).model_dump_json().encode('utf-8')])
+                content=full_content,
+                usage=usage.usage(),
+                completion_id=last_chunk.id,
+                created=last_chunk.created,
+                object=last_chunk.object,
+                finish_reason=finish_reason,
+                index=last_chunk.choices[0].index,
+                seq=seq,
+            ), cerebras_model.id)
+
+    def _error_frame(self, cerebras_model: CerebrasModel, id: str, e: Exception) -> StreamFrame:
+        return StreamFrame.from_model(build_error_frame(id, cerebras_model.id, e), cerebras_model.id)
 
     def get_available_models(self) -> List[ModelGetResponseModel]:
         try:
@@ -0,0 +1,92 @@
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from server.app.clients.anthropic.anthropic_client import AnthropicClient
+from server.app.clients.cerebras.cerebras_client import CerebrasClient
+from server.app.clients.googleai.google_ai_client import GoogleAICLient
+from server.app.clients.openai.openai_client import OpenAIClient
+
+logger = logging.getLogger(__name__)
+
+# Connection pools shared by all requests of the process. Streams are long-lived, so the
+# read timeout is generous while connecting fails fast.
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+def build_async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT, http2=HTTP2)
+
+
+def build_http_client() -> httpx.Client:
+    return httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT, http2=HTTP2)
+
+
+class ClientRegistry:
+    """
+    Owns exactly one client per provider and API key for the whole process.
+
+    Created by the FastAPIAppFactory lifespan and available as `app.state.clients`. Clients are
+    created on first use, every client gets its own keep-alive connection pool (HTTP/2 where
+    supported) and all of them are closed on shutdown.
+    """
+
+    API_KEYS = {
+        "openai": "API_KEY_OPEN_AI",
+        "anthropic": "API_KEY_ANTHROPIC",
+        "google_ai": "API_KEY_GOOGLE_AI",
+        "cerebras": "API_KEY_CEREBRAS",
+    }
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.clients: Dict[Tuple[str, str], Any] = {}
+        self.factories: Dict[str, Callable[[str], Any]] = {
+            "openai": lambda api_key: OpenAIClient(api_key=api_key, http_client=build_async_http_client()),
+            "anthropic": lambda api_key: AnthropicClient(api_key=api_key, http_client=build_async_http_client()),
+            "google_ai": lambda api_key: GoogleAICLient(api_key=api_key),
+            "cerebras": lambda api_key: CerebrasClient(api_key=api_key, http_client=build_http_client()),
+        }
+
+    def get(self, provider: str, api_key: Optional[str] = None) -> Any:
+        if provider not in self.factories:
+            raise ValueError(f"Unknown provider '{provider}'")
+
+        api_key = api_key or self.settings.get("default").get(self.API_KEYS[provider])
+        key = (provider, api_key)
+        if key not in self.clients:
+            logger.debug(f"Creating {provider} client")
+            self.clients[key] = self.factories[provider](api_key)
+        return self.clients[key]
+
+    @property
+    def openai(self) -> OpenAIClient:
+        return self.get("openai")
+
+    @property
+    def anthropic(self) -> AnthropicClient:
+        return self.get("anthropic")
+
+    @property
+    def google_ai(self) -> GoogleAICLient:
+        return self.get("google_ai")
+
+    @property
+    def cerebras(self) -> CerebrasClient:
+        return self.get("cerebras")
+
+    async def close(self) -> None:
+        for (provider, _), client in self.clients.items():
+            try:
+                await client.close()
+            except Exception as e:
+                logger.error(f"Error while closing {provider} client: {str(e)}")
+        self.clients.clear()
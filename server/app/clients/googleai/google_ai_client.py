@@ -1,11 +1,12 @@
 import logging
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, List
 import google.generativeai as genai
 from datetime import datetime
 from server.app.models.generation.google_ai_model import GoogleAIModel
 from server.app.models.generation.generation_request import GenerationRequest, ModelConfig
-from server.app.models.generation.success_generation_model import SuccessGenerationModel, Completion, Choice, Message, \
-    Usage
+from server.app.utils.stream_frames import StreamFrame, build_error_frame, build_success_frame
+from server.app.utils.usage_tracker import UsageTracker
+from server.app.utils.stream_multiplexer import merge_streams
 
 
 class GoogleAICLient:
@@ -14,6 +15,7 @@ class GoogleAICLient:
     def __init__(self, api_key: str) -> None:
         self.api_key = api_key
         genai.configure(api_key=api_key)
+        self.models: Dict[str, genai.GenerativeModel] = {}
         self.logger = self.setup_logger()
         self.logger.debug(f"GoogleAICLient initialized with API key: {api_key[:5]}...")
 
@@ -28,42 +30,65 @@ class GoogleAICLient:
             logger.addHandler(handler)
         return logger
 
-    async def generate(self, model_config: ModelConfig, request: GenerationRequest) -> AsyncGenerator[bytes, None]:
-        model = genai.GenerativeModel(model_config.model)
-        response = model.generate_content(request.prompt, stream=True)
+    def get_model(self, model: str) -> genai.GenerativeModel:
+        """
+        Return the process-wide GenerativeModel for the given model name.
+        """
+        if model not in self.models:
+            self.models[model] = genai.GenerativeModel(model)
+        return self.models[model]
+
+    async def close(self) -> None:
+        """
+        Release the cached models. Called on application shutdown.
+        """
+        self.models.clear()
+
+    async def generate(self, models: List[ModelConfig], request: GenerationRequest) -> AsyncGenerator[StreamFrame, None]:
+        """
+        Generate text from all requested Google AI models. The models stream at the same time,
+        frames are yielded as they arrive.
+        """
+        streams = [self._stream_model_response(model_config, request) for model_config in models]
+
+        def error_frame(index: int, error: Exception) -> StreamFrame:
+            # A failing model ends with its error frame, the other models keep streaming
+            model = models[index].model
+            return StreamFrame.from_model(build_error_frame(request.id, model, error), model)
+
+        async for frame in merge_streams(streams, on_error=error_frame):
+            yield frame
+
+    async def _stream_model_response(self, model_config: ModelConfig, request: GenerationRequest) -> AsyncGenerator[StreamFrame, None]:
+        model = self.get_model(model_config.model)
+        response = await model.generate_content_async(request.prompt, stream=True)
         full_content = ''
+        seq = 0
+        usage = UsageTracker(model_config.model, request.prompt)
 
-        # Use synchronous iteration over the response, assuming it's a regular iterator
-        for chunk in response:
+        async for chunk in response:
             full_content += chunk.text
-            success_model = SuccessGenerationModel(
+            usage.add(chunk.text)
+            # Google liefert die (bis dahin) exakte Usage mit jedem Chunk, der letzte enthält die Gesamtsumme
+            metadata = getattr(chunk, "usage_metadata", None)
+            if metadata and metadata.total_token_count:
+                usage.report(metadata.prompt_token_count, metadata.candidates_token_count,
+                             getattr(metadata, "cached_content_token_count", None))
+            frame = StreamFrame.from_model(build_success_frame(
                 id=request.id,
                 model=model_config.model,
-                completion=Completion(
-                    id=request.id,
-                    choices=[Choice(
-                        finish_reason="complete",
-                        index=1,
-                        message=Message(
-                            content=full_content,
-                            role="assistant"
-                        )
-                    )],
-                    created=int(datetime.utcnow().timestamp()),
-                    model=model_config.model,
-                    object="model",
-                    system_fingerprint=None,
-                    usage=Usage(
-                        completion_tokens=len(full_content.split()),  # Calculate tokens using accumulated content
-                        prompt_tokens=len(request.prompt.split()),
-                        total_tokens=len(full_content.split()) + len(request.prompt.split()),
-                        ended=int(datetime.utcnow().timestamp())
-                    )
-                ),
-                finish_reason="complete"
-            )
-            self.logger.debug(f"SuccessModel Google AI: {success_model.model_dump_json()}")
-            yield success_model.model_dump_json().encode('utf-8') + b'\n'
+                content=full_content,
+                usage=usage.usage(),
+                completion_id=request.id,
+                created=int(datetime.utcnow().timestamp()),
+                object="model",
+                finish_reason="complete",
+                index=1,
+                seq=seq,
+            ), model_config.model)
+            seq += 1
+            self.logger.debug(f"SuccessModel Google AI: {frame.data}")
+            yield frame
 
     def get_available_models(self) -> list:
         try:
@@ -1,19 +1,21 @@
 import logging
 from datetime import datetime
 
-import openai
+import httpx
 from openai import AsyncOpenAI
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from server.app.models.generation.success_generation_model import SuccessGenerationModel, Completion, Choice, Message, \
-    Usage
 from server.app.models.generation.openai_model import OpenaiModel
+from server.app.models.generation.generation_request import StreamMode
 from typing import Optional
 import json
 
 from server.app.models.model_parameter.models_parameter import ModelParameter
 from server.app.utils.tool_calling_tools import get_tool_calling_tools, get_weather, get_hudini_user
-from server.app.utils.hudini_utils import hudini_character
+from server.app.utils.hudini_utils import hudini_character, hudini_clock
+from server.app.utils.stream_frames import StreamFrame, build_success_frame, build_delta_frame
+from server.app.utils.usage_tracker import UsageTracker, reported_cached_tokens
+from server.app.utils.context_packer import pack_context_async, generation_sources, TokenCache
 
 
 class OpenAIClient:
@@ -43,24 +45,30 @@ class OpenAIClient:
         'o1',
     ]
 
+    # Tokens per model; every entry of CHAT_MODELS needs one (models not listed fall back to their family)
     MODEL_CONTEXT_WINDOWS = {
-        'gpt-3.5-turbo': 4096,
+        'gpt-3.5-turbo': 16385,
+        'gpt-3.5-turbo-16k': 16385,
+        'gpt-3.5-turbo-0125': 16385,
+        'gpt-3.5-turbo-1106': 16385,
         'gpt-4': 8192,
-        'gpt-4-turbo': 4096,
-        'gpt-3.5-turbo-16k': 16000,
-        'gpt-4-turbo-2024': 4096,
+        'gpt-4-0613': 8192,
+        'gpt-4-turbo': 128000,
+        'gpt-4-turbo-2024': 128000,
+        'gpt-4-turbo-2024-04-09': 128000,
+        'gpt-4-turbo-preview': 128000,
+        'gpt-4-1106-preview': 128000,
         'o1-preview': 128000,
-        'o1': 128000,
+        'o1': 200000,
         'o1-mini': 128000,
         'gpt-4o-mini': 128000,
         'gpt-4o': 128000,
         'chatgpt-4o-latest': 128000
     }
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, http_client: Optional[httpx.AsyncClient] = None):
         self.api_key = api_key
-        self.client = AsyncOpenAI(api_key=api_key)  # For async operations
-        openai.api_key = api_key  # For synchronous operations
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client)
         self.logger = self.setup_logger()
 
         self.logger.debug(f"OpenAIClient IN_PROGRESS with API key: {api_key[:5]}...")
@@ -68,19 +76,29 @@ class OpenAIClient:
     def setup_logger(self):
         logger = logging.getLogger(__name__)
         logger.setLevel(logging.DEBUG)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        if not logger.hasHandlers():
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
         return logger
 
+    async def close(self) -> None:
+        """
+        Close the connection pool. Called on application shutdown.
+        """
+        await self.client.close()
+
     async def fetch_completion(self, openai_model: OpenaiModel, prompt: str, id: str,
                                context: str,
                                presence_penalty: Optional[float] = 0.0,
                                use_tool: bool = True,
                                gripsbox_content: Optional[str] = None,
-                               db: AsyncSession = None,
-                               user_uuid: Optional[str] = None
+                               user_system_prompt: Optional[str] = None,
+                               stream_mode: StreamMode = StreamMode.CUMULATIVE,
+                               temperature: Optional[float] = None,
+                               max_tokens: Optional[int] = None,
+                               token_cache: Optional[TokenCache] = None
                                ):
         try:
             tools = []
@@ -89,21 +107,21 @@ class OpenAIClient:
 
 
 
-            # Kontext vorbereiten: Gripsbox-Inhalt und Benutzerkontext hinzufügen
-            context_combined = context
-            if gripsbox_content:
-                context_combined += f"\n\nGripsbox Content:\n{gripsbox_content}"
-
             # HUDINI-Systemprompt erstellen
-            now = datetime.now()
-            today = now.strftime("%Y-%m-%d")
-            current_time = now.strftime("%H:%M:%S")
-            system_prompt = await hudini_character(today, current_time, db, user_uuid)
-            # Remove occurrences of the system prompt from context_combined
-            sanitized_context = context_combined.replace(system_prompt, "").strip()
-            self.logger.debug(f"sanitized_context: {sanitized_context}")
+            # Stabiler Teil vorne, die Uhrzeit als letztes Segment (Prefix-Caching der Provider)
+            system_prompt = hudini_character(user_system_prompt)
+            # Remove occurrences of the system prompt from the history
+            sanitized_context = context.replace(system_prompt, "").strip()
+
+            # Kontext auf das Kontextfenster des Modells zuschneiden (Verlauf und Gripsbox teilen sich das Budget)
+            # max_tokens der Anfrage bleibt für die Antwort frei
+            packed = await pack_context_async(openai_model.id,
+                                              generation_sources(system_prompt, sanitized_context,
+                                                                 gripsbox_content or "", prompt, clock=hudini_clock()),
+                                              self.MODEL_CONTEXT_WINDOWS.get(openai_model.id),
+                                              reserved_output_tokens=max_tokens, token_cache=token_cache)
             messages = [
-                {"role": "system", "content": f"{system_prompt}\n\n{sanitized_context}"},
+                {"role": "system", "content": packed.system_message()},
                 {"role": "user", "content": prompt},
             ]
 
@@ -111,8 +129,11 @@ class OpenAIClient:
             stream = await self.client.chat.completions.create(
                 model=openai_model.id,
                 messages=messages,
-                temperature=0.1 if use_tool else 1.0,
+                temperature=temperature if temperature is not None else (0.1 if use_tool else 1.0),
+                max_tokens=max_tokens,
                 stream=True,
+                # Der letzte Chunk enthält die exakte Usage des Providers
+                stream_options={"include_usage": True},
                 presence_penalty=presence_penalty,
                 functions=tools if use_tool else None,
                 function_call="auto" if use_tool else None,
@@ -122,9 +143,25 @@ class OpenAIClient:
                 full_content = ""
                 partial_arguments = ""
                 function_name = None
+                seq = 0
+                last_chunk = None
+                finish_reason = None
+                usage = UsageTracker(openai_model.id, prompt, prompt_tokens=packed.total_tokens)
+                usage_pending = False
 
                 async for chunk in stream:
+                    if chunk.usage:
+                        usage.report(chunk.usage.prompt_tokens, chunk.usage.completion_tokens,
+                                     reported_cached_tokens(chunk.usage))
+                        usage_pending = True
+
+                    # Der Usage-Chunk am Ende enthält keine Choices
+                    if not chunk.choices:
+                        continue
 
+                    last_chunk = chunk
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    new_content = ""
 
                     # Tool-Handling
                     if use_tool and hasattr(chunk.choices[0].delta, "function_call"):
@@ -148,11 +185,13 @@ class OpenAIClient:
                                 result = get_weather(function_args["location"])
                                 self.logger.info(f"Tool {function_name} executed successfully: {result}")
                                 full_content = result
+                                new_content = result
 
                             elif function_name == "get_hudini_user":
                                 result = await get_hudini_user()
                                 self.logger.info(f"Tool {function_name} executed successfully: {result}")
                                 full_content = result
+                                new_content = result
                         except Exception as e:
                             self.logger.error(f"Error while executing tool '{function_name}': {str(e)}")
                         finally:
@@ -164,40 +203,53 @@ class OpenAIClient:
                         content = chunk.choices[0].delta.content
                         if content:
                             full_content += content
+                            new_content += content
 
+                    usage.add(new_content)
+
+                    # Delta-Modus: nur den neuen Text senden
+                    if stream_mode == StreamMode.DELTA:
+                        if new_content:
+                            yield StreamFrame.from_model(build_delta_frame(id, openai_model.id, seq, new_content), openai_model.id)
+                            seq += 1
+                        continue
 
                     # Leere Inhalte überspringen
                     if not full_content.strip():
                         continue
 
                     # Completion erstellen und streamen
-                    completion = Completion(
-                        id=chunk.id,
-                        choices=[Choice(
-                            finish_reason=chunk.choices[0].finish_reason or "null",
-                            index=chunk.choices[0].index,
-                            message=Message(
-                                content=full_content,
-                                role=chunk.choices[0].delta.role or "assistant"
-                            )
-                        )],
-                        created=chunk.created,
+                    yield StreamFrame.from_model(build_success_frame(
+                        id=id,
                         model=openai_model.id,
+                        content=full_content,
+                        usage=usage.usage(),
+                        completion_id=chunk.id,
+                        created=chunk.created,
                         object=chunk.object,
-                        system_fingerprint=None,
-                        usage=Usage(
-                            completion_tokens=len(full_content.split()),
-                            prompt_tokens=len(prompt.split()),
-                            total_tokens=len(full_content.split()) + len(prompt.split()),
-                            ended=int(datetime.utcnow().timestamp())
-                        )
-                    )
-
-                    yield (SuccessGenerationModel(
+                        finish_reason=chunk.choices[0].finish_reason,
+                        index=chunk.choices[0].index,
+                        role=chunk.choices[0].delta.role,
+                        seq=seq,
+                    ), openai_model.id)
+                    seq += 1
+                    usage_pending = False
+
+                # Abschließender Frame mit dem vollständigen Text und der exakten Usage
+                # (im Delta-Modus immer, sonst wenn die Usage nach dem letzten Frame kam)
+                if last_chunk is not None and (stream_mode == StreamMode.DELTA or usage_pending):
+                    yield StreamFrame.from_model(build_success_frame(
                         id=id,
                         model=openai_model.id,
-                        completion=completion
-                    ).model_dump_json()).encode('utf-8')
+                        content=full_content,
+                        usage=usage.usage(),
+                        completion_id=last_chunk.id,
+                        created=last_chunk.created,
+                        object=last_chunk.object,
+                        finish_reason=finish_reason,
+                        index=last_chunk.choices[0].index,
+                        seq=seq,
+                    ), openai_model.id)
 
             return async_generator()
 
@@ -232,15 +284,15 @@ class OpenAIClient:
 
 
 
-    def get_available_models(self) -> list:
+    async def get_available_models(self) -> list:
         """
-        Fetches the list of available chat models from OpenAI using the synchronous OpenAI client.
+        Fetches the list of available chat models from OpenAI through the pooled client.
 
         Returns:
             list: A list of OpenaiModel instances representing the chat models available in the OpenAI API.
         """
         try:
-            response = openai.models.list()
+            response = await self.client.models.list()
             chat_models = [
                 OpenaiModel.from_dict(model.model_dump()).model_dump()
                 for model in response.data
@@ -38,14 +38,21 @@ class OpenAIClient:
         'o1',
     ]
 
+    # Tokens per model; every entry of CHAT_MODELS needs one (models not listed fall back to their family)
     MODEL_CONTEXT_WINDOWS = {
-        'gpt-3.5-turbo': 4096,
+        'gpt-3.5-turbo': 16385,
+        'gpt-3.5-turbo-16k': 16385,
+        'gpt-3.5-turbo-0125': 16385,
+        'gpt-3.5-turbo-1106': 16385,
         'gpt-4': 8192,
-        'gpt-4-turbo': 4096,
-        'gpt-3.5-turbo-16k': 16000,
-        'gpt-4-turbo-2024': 4096,
+        'gpt-4-0613': 8192,
+        'gpt-4-turbo': 128000,
+        'gpt-4-turbo-2024': 128000,
+        'gpt-4-turbo-2024-04-09': 128000,
+        'gpt-4-turbo-preview': 128000,
+        'gpt-4-1106-preview': 128000,
         'o1-preview': 128000,
-        'o1': 128000,
+        'o1': 200000,
         'o1-mini': 128000,
         'gpt-4o-mini': 128000,
         'gpt-4o': 128000,
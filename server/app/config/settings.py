@@ -35,11 +35,14 @@ class Settings:
         logging.debug(f"Attempting to resolve value: {value}")
 
         if value.startswith('env:'):
-            env_var = value[4:]
+            # "env:NAME" is required, "env:NAME|default" falls back to the default if NAME is not set
+            env_var, has_default, default = value[4:].partition('|')
             resolved_value = os.getenv(env_var)
             logging.debug(f"Mapping 'env:{env_var}' to environment variable '{env_var}' with value '{resolved_value}'")
 
             if resolved_value is None:
+                if has_default:
+                    return default
                 raise EnvironmentError(f"Environment variable {env_var} is not set.")
             return resolved_value
 
@@ -65,6 +68,33 @@ class Settings:
                 return default
         return value
 
+    def get_int(self, item, default=None) -> int:
+        return self._typed(item, default, int, "an integer")
+
+    def get_float(self, item, default=None) -> float:
+        return self._typed(item, default, float, "a number")
+
+    def get_bool(self, item, default=False) -> bool:
+        value = self.get(item)
+        if value is None or value == "":
+            return default
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in ("1", "true", "yes", "on"):
+            return True
+        if str(value).lower() in ("0", "false", "no", "off"):
+            return False
+        raise ValueError(f"Setting {item} must be a boolean, got {value!r}")
+
+    def _typed(self, item, default, cast, description):
+        value = self.get(item)
+        if value is None or value == "":
+            return default
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Setting {item} must be {description}, got {value!r}")
+
     def items(self):
         return self.resolved_config.items()
 
@@ -50,14 +50,6 @@ sync_engine = create_engine(SQLALCHEMY_DATABASE_URL_SYNC)
 # Sync session maker for Alembic migrations
 sync_session_maker = sessionmaker(bind=sync_engine)
 
-# Async DB handling for FastAPI
-async def get_db():
-    async with async_session_maker() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
-
 async def init_db():
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -74,4 +66,4 @@ async def check_db_connection():
 async def close_db_connection():
     await async_engine.dispose()
 
-__all__ = ["Base", "async_engine", "sync_engine", "async_session_maker", "sync_session_maker", "get_db", "init_db", "check_db_connection", "close_db_connection"]
+__all__ = ["Base", "async_engine", "sync_engine", "async_session_maker", "sync_session_maker", "init_db", "check_db_connection", "close_db_connection"]
@@ -1,7 +1,75 @@
+import asyncio
+import functools
+import inspect
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from server.app.db.base import async_session_maker
 
-# Dependency to get the database session
+
+# Dependency to get the database session.
+# FastAPI resolves a dependency once per request: auth, handler and every other dependency that
+# declares Depends(get_db) get the same session, so a request checks out at most one connection.
 async def get_db():
     async with async_session_maker() as session:
         yield session
+
+
+@asynccontextmanager
+async def use_session(db: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    """
+    The session of the current request if the caller has one, otherwise a new session for the
+    duration of the block (background tasks, CLI, tool calls).
+    """
+    if db is not None:
+        yield db
+    else:
+        async with async_session_maker() as session:
+            yield session
+
+
+class SerializedSession:
+    """
+    Request session shared by concurrent tasks of the same request.
+
+    An AsyncSession cannot run two statements at once; the statements of the tasks are executed
+    one after another on the one connection, while everything else the tasks do (cache lookups,
+    file reads, embeddings) still runs concurrently. Every awaitable method of the session (execute,
+    get, scalars, flush, commit, refresh, run_sync, ...) takes the lock.
+    """
+
+    # Their results are read after the call returned, outside the lock
+    UNSUPPORTED = ("stream", "stream_scalars")
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.lock = asyncio.Lock()
+
+    def __getattr__(self, name):
+        if name in self.UNSUPPORTED:
+            raise AttributeError(f"{name}() is not supported on a session shared by concurrent tasks")
+        attribute = getattr(self.session, name)
+        if not inspect.iscoroutinefunction(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def serialized(*args, **kwargs):
+            async with self.lock:
+                return await attribute(*args, **kwargs)
+
+        return serialized
+
+
+async def release_session(db: AsyncSession) -> None:
+    """
+    Return the connection of the request session to the pool before a long-lived response starts.
+
+    Streaming endpoints do their reads up front and call this before returning the StreamingResponse:
+    a stream can run for minutes, and holding a connection for that time would make the pool size the
+    limit for concurrent generations. Whether FastAPI closes the get_db session before or after the
+    response body is sent depends on its version, so streaming endpoints do not rely on it.
+    A closed session checks out a new connection if it is used again; writes during or after the
+    stream open a short session with use_session() instead.
+    """
+    await db.close()
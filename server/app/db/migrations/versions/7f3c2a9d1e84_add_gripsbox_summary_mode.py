@@ -0,0 +1,26 @@
+"""Add summary_mode to gripsbox
+
+Revision ID: 7f3c2a9d1e84
+Revises: d49503a73659
+Create Date: 2024-12-18 10:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3c2a9d1e84'
+down_revision: Union[str, None] = 'd49503a73659'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing entries keep injecting the full document
+    op.add_column('gripsbox', sa.Column('summary_mode', sa.Boolean(), server_default=sa.text('FALSE'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('gripsbox', 'summary_mode')
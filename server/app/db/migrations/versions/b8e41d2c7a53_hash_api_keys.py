@@ -0,0 +1,41 @@
+"""Store API keys as HMAC-SHA256
+
+Revision ID: b8e41d2c7a53
+Revises: 7f3c2a9d1e84
+Create Date: 2024-12-20 09:31:07.118402
+
+"""
+import hashlib
+import hmac
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from server.app.config.settings import Settings
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e41d2c7a53'
+down_revision: Union[str, None] = '7f3c2a9d1e84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Same hash as server.app.services.api_key_service.hash_api_key, APP_API_KEY_SECRET must match the server's.
+    # The hex digest has 64 characters and fits the existing column and index.
+    secret = Settings().get("default.APP_API_KEY_SECRET")
+    if not secret:
+        # Hashing without the secret would lock every key out once the server runs with one
+        raise RuntimeError("APP_API_KEY_SECRET is not set, refusing to hash the stored API keys without it.")
+    secret = secret.encode("utf-8")
+    connection = op.get_bind()
+    api_keys = connection.execute(sa.text("SELECT id, key FROM api_keys")).fetchall()
+    for key_id, key in api_keys:
+        key_hash = hmac.new(secret, key.encode("utf-8"), hashlib.sha256).hexdigest()
+        connection.execute(sa.text("UPDATE api_keys SET key = :key WHERE id = :id"), {"key": key_hash, "id": key_id})
+
+
+def downgrade() -> None:
+    # Hashes cannot be turned back into keys; after a downgrade the keys have to be issued again
+    pass
@@ -0,0 +1,46 @@
+"""Add indexes for the hot queries
+
+Revision ID: c2d7f9a41e06
+Revises: b8e41d2c7a53
+Create Date: 2024-12-23 14:05:52.730914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d7f9a41e06'
+down_revision: Union[str, None] = 'b8e41d2c7a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, table, columns, access method
+# api_keys.key is covered by ix_api_keys_key from the initial migration.
+INDEXES = [
+    # Thread history (ordered by created) and the list of a user's contexts
+    ('ix_user_context_thread_id_created', 'user_context', ['thread_id', 'created'], None),
+    ('ix_user_context_user_created', 'user_context', ['user', 'created'], None),
+    # Active gripsbox files of a user
+    ('ix_gripsbox_user_active', 'gripsbox', ['user', 'active'], None),
+    # System prompt and cache opt-out of a user
+    ('ix_model_parameter_user_parameter_active', 'model_parameter', ['user', 'parameter', 'active'], None),
+    # Prompt dedup on create: equality only on an unbounded Text column, a hash index stays small
+    # and has no size limit for the indexed value, unlike a btree
+    ('ix_prompts_prompt_hash', 'prompts', ['prompt'], 'hash'),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY does not lock the tables against writes while the index is built, but it cannot run in a
+    # transaction. If a build fails, Postgres leaves an INVALID index behind which has to be dropped before
+    # the migration is run again.
+    with op.get_context().autocommit_block():
+        for name, table, columns, using in INDEXES:
+            op.create_index(name, table, columns, postgresql_using=using, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
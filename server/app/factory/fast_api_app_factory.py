@@ -1,4 +1,5 @@
 import logging
+from contextlib import asynccontextmanager
 from diskcache import FanoutCache
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -21,6 +22,13 @@ from server.app.routers.users.users_router import router as users_router
 from server.app.routers.postcasts.google.podcast_google_tts_router import router as podcast_google_tts_router
 from server.app.routers.postcasts.elevenlabs.podcast_elevenlabs_router import router as podcast_elevenlabs_router
 from server.app.routers.auth.auth_router import router as auth_router, setup_oauth
+from server.app.routers.api_keys.api_keys_router import router as api_keys_router
+from server.app.clients.client_registry import ClientRegistry
+from server.app.services.generation_cache_service import GenerationCacheService
+from server.app.services.model_discovery_service import ModelDiscoveryService
+from server.app.services.thread_context_service import ThreadContextService
+from server.app.services.system_prompt_service import SystemPromptService
+from server.app.services.context_compression_service import ContextCompressionService
 
 logger = logging.getLogger("hudini_logger")
 
@@ -37,6 +45,7 @@ class FastAPIAppFactory:
             The API allows for seamless integration and management of AI-driven tasks such as text generation, image creation, and user context handling.
             """,
             version="1.0.0",
+            lifespan=self.lifespan,
         )
 
     def create_app(self):
@@ -48,6 +57,19 @@ class FastAPIAppFactory:
         self.register_routes()
         return self.app
 
+    @asynccontextmanager
+    async def lifespan(self, app: FastAPI):
+        self.logger.debug("Starting provider client registry")
+        app.state.clients = ClientRegistry(self.settings)
+        app.state.model_discovery = ModelDiscoveryService(app.state.cache, app.state.clients)
+        yield
+        self.logger.debug("Closing provider clients")
+        await app.state.model_discovery.close()
+        await app.state.clients.close()
+        app.state.context_compression.close()
+        if app.state.generation_cache.enabled:
+            self.logger.info(f"Generation cache stats: {app.state.generation_cache.stats()}")
+
     def load_config(self, config):
         for key, value in config.items():
             setattr(self.app.state, key, value)
@@ -58,6 +80,10 @@ class FastAPIAppFactory:
         self.logger.debug(f"Cache directory set to: {cache_directory}")
         cache = FanoutCache(directory=cache_directory, shards=8)
         self.app.state.cache = cache
+        self.app.state.generation_cache = GenerationCacheService(cache)
+        self.app.state.thread_context = ThreadContextService(cache)
+        self.app.state.system_prompts = SystemPromptService(cache)
+        self.app.state.context_compression = ContextCompressionService(cache)
 
     def add_session_middleware(self):
         self.logger.debug("Adding FastAPISessionMiddleware")
@@ -113,6 +139,7 @@ class FastAPIAppFactory:
         self.app.include_router(socialmedia_telegram_image_text_router)
         self.app.include_router(gripsbox_router)
         self.app.include_router(auth_router)
+        self.app.include_router(api_keys_router)
         self.app.include_router(tool_call_router)
         self.app.include_router(tool_call_router)
         self.app.include_router(open_ai_text_generation_router)
@@ -0,0 +1,13 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional
+from uuid import UUID
+from datetime import datetime
+
+
+class ApiKeyResponseModel(BaseModel):
+    id: UUID = Field(..., description="The unique identifier of the API key.")
+    created: datetime = Field(..., description="Timestamp when the API key was issued.")
+    active: bool = Field(..., description="Indicates whether the API key is accepted.")
+    key: Optional[str] = Field(None, description="The plain API key. Only returned once, when the key is issued.")
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Literal
+
+
+class DeltaGenerationModel(BaseModel):
+    """
+    A single frame of a `stream_mode=delta` generation stream.
+
+    Only the text generated since the previous frame is sent. The stream of a model always ends with a
+    regular `SuccessGenerationModel` frame carrying the full text, finish reason and usage.
+    """
+    type: Literal["delta"] = Field("delta", description="Frame type, always 'delta'.")
+    id: str = Field(..., description="ID of the generation request.")
+    model: str = Field(..., description="Model used for the generation.")
+    seq: int = Field(..., ge=0, description="Sequence number of the frame within the stream of this model.")
+    delta: str = Field(..., description="Text generated since the previous frame.")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "type": "delta",
+                "id": "gen-xyz-456",
+                "model": "gpt-4o-mini",
+                "seq": 0,
+                "delta": "This is"
+            }
+        }
+    )
@@ -14,6 +14,10 @@ class ModelCategory(str, Enum):
 class Platform(str, Enum):
     OPENAI = "openai"
 
+class StreamMode(str, Enum):
+    CUMULATIVE = "cumulative"
+    DELTA = "delta"
+
 class ModelConfig(BaseModel):
     id: str = Field(..., description="uuid")
     platform: str = Field(..., description="The name of the platform to be used.")
@@ -67,6 +71,16 @@ class GenerationRequest(BaseModel):
         description="Method to use for generation",
         example="chat_completion"
     )
+    stream_mode: StreamMode = Field(
+        StreamMode.CUMULATIVE,
+        description="'cumulative' sends the full text in every frame, 'delta' only the new text plus a final full frame",
+        example="delta"
+    )
+    thread_id: int = Field(
+        1,
+        description="Conversation thread whose context is passed to the models",
+        example=1
+    )
 
     class ConfigDict:
         use_enum_values = True
@@ -44,6 +44,7 @@ class Usage(BaseModel):
     completion_tokens: int = Field(..., description="Number of completion tokens used.")
     prompt_tokens: int = Field(..., description="Number of prompt tokens used.")
     total_tokens: int = Field(..., description="Total number of tokens used.")
+    cached_tokens: Optional[int] = Field(None, description="Prompt tokens read from the provider's prompt cache (if reported).")
     started: int = Field(int(datetime.utcnow().timestamp()), description="Timestamp of when the completion started.")
     ended: int = Field(int(datetime.utcnow().timestamp()), description="Timestamp of when the completion ended.")
 
@@ -54,6 +55,7 @@ class Usage(BaseModel):
                 "completion_tokens": 50,
                 "prompt_tokens": 100,
                 "total_tokens": 150,
+                "cached_tokens": 0,
                 "started": 1633046400,
                 "ended": 1633046400
             }
@@ -102,6 +104,7 @@ class Completion(BaseModel):
 class SuccessGenerationModel(BaseModel):
     id: str = Field(..., description="ID of the generated model.")
     model: str = Field(..., description="Model used for the generation.")
+    seq: Optional[int] = Field(None, description="Sequence number of the frame within the stream of this model.")
     completion: Completion
 
     # Use ConfigDict instead of class Config
@@ -110,6 +113,7 @@ class SuccessGenerationModel(BaseModel):
             "example": {
                 "id": "gen-xyz-456",
                 "model": "gpt-3.5-turbo",
+                "seq": 0,
                 "completion": {
                     "id": "abc123",
                     "choices": [{
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, ARRAY, TIMESTAMP, func
+from sqlalchemy import Column, String, Integer, Boolean, ARRAY, TIMESTAMP, func, text
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from server.app.db.base import Base  # Adjust the import path as needed
@@ -14,6 +14,8 @@ class Gripsbox(Base):
     size = Column(Integer, nullable=False)
     type = Column(String, nullable=False)
     active = Column(Boolean, nullable=False)
+    # Inject the precomputed digest (outline + summary) instead of the full document
+    summary_mode = Column(Boolean, nullable=False, default=False, server_default=text("false"))
     tags = Column(JSONB, nullable=False)
     models = Column(JSONB, nullable=False)
     created = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
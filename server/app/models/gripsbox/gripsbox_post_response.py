@@ -9,6 +9,7 @@ class GripsboxPostResponseModel(BaseModel):
     size: int
     type: str
     active: bool
+    summary_mode: bool = False
     tags: list[str]
     models: list[str]
     created: datetime
@@ -30,6 +31,7 @@ class GripsboxPostResponseModel(BaseModel):
             size=obj.size,
             type=obj.type,
             active=obj.active,
+            summary_mode=bool(obj.summary_mode),
             tags=obj.tags,
             models=obj.models,
             created=obj.created,
@@ -0,0 +1,55 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+from typing import List
+
+from server.app.db.get_db import get_db
+from server.app.utils.auth import auth
+from server.app.models.api_key.api_key_response import ApiKeyResponseModel
+from server.app.models.users.user import User
+from server.app.services.api_key_service import create_api_key, deactivate_api_key, delete_api_key, get_api_keys
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/api-keys", response_model=List[ApiKeyResponseModel], tags=["api_keys"])
+async def get_api_keys_route(db: AsyncSession = Depends(get_db), user: User = Depends(auth)):
+    """
+    List the API keys of the current user. Keys are stored hashed, only id, state and creation date are returned.
+    """
+    return [ApiKeyResponseModel.model_validate(entry) for entry in await get_api_keys(user.uuid, db=db)]
+
+
+@router.post("/api-keys", response_model=ApiKeyResponseModel, status_code=status.HTTP_201_CREATED, tags=["api_keys"])
+async def create_api_key_route(db: AsyncSession = Depends(get_db), user: User = Depends(auth)):
+    """
+    Issue a new API key for the current user. The plain key is part of this response only.
+    """
+    entry, api_key = await create_api_key(user.uuid, db=db)
+    logger.info(f"Issued API key {entry.id} for user {user.uuid}")
+    response = ApiKeyResponseModel.model_validate(entry)
+    response.key = api_key
+    return response
+
+
+@router.post("/api-keys/{id}/deactivate", tags=["api_keys"])
+async def deactivate_api_key_route(id: UUID, db: AsyncSession = Depends(get_db), user: User = Depends(auth)):
+    """
+    Deactivate an API key of the current user. The key is rejected from the next request on.
+    """
+    if not await deactivate_api_key(id, user.uuid, db=db):
+        raise HTTPException(status_code=404, detail=f"API key {id} not found")
+    logger.info(f"Deactivated API key {id} of user {user.uuid}")
+    return {"status": "API key deactivated successfully"}
+
+
+@router.delete("/api-keys/{id}", tags=["api_keys"])
+async def delete_api_key_route(id: UUID, db: AsyncSession = Depends(get_db), user: User = Depends(auth)):
+    """
+    Delete an API key of the current user. The key is rejected from the next request on.
+    """
+    if not await delete_api_key(id, user.uuid, db=db):
+        raise HTTPException(status_code=404, detail=f"API key {id} not found")
+    logger.info(f"Deleted API key {id} of user {user.uuid}")
+    return {"status": "API key deleted successfully"}
@@ -7,7 +7,7 @@ from pydantic import BaseModel
 from typing import Dict, Any
 from datetime import datetime
 from server.app.config.settings import Settings
-from server.app.services.user_service import UserService
+from server.app.services.user_service import UserService, session_user_cache
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -122,13 +122,15 @@ async def auth_google_callback(request: Request, db: AsyncSession = Depends(get_
             user_service = UserService()
             user = await user_service.create_user(
                 email=email,
-                username=google_user_info.get('name', email.split('@')[0])
+                username=google_user_info.get('name', email.split('@')[0]),
+                db=db
             )
 
         # Update last_login
         if hasattr(user, 'last_login'):
             user.last_login = datetime.utcnow()
         await db.commit()
+        session_user_cache.invalidate(user.uuid)
 
         # Prepare user info for session
         user_dict = {}
@@ -1,16 +1,15 @@
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from server.app.config.settings import Settings
-from server.app.db.base import async_session_maker
+from server.app.db.get_db import get_db, release_session
 from server.app.models.generation.generation_request import GenerationRequest
 from server.app.clients.anthropic.anthropic_client import AnthropicClient
 from server.app.models.generation.success_generation_model import SuccessGenerationModel
-from sqlalchemy import select
-from server.app.models.usercontext.user_context import UserContextModel
+from server.app.models.users.user import User
+from server.app.services.thread_context_service import ThreadContextService
 from server.app.utils.auth import auth
-import json
 router = APIRouter()
 settings = Settings()
 
@@ -18,26 +17,13 @@ settings = Settings()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
+def get_anthropic_client(request: Request) -> AnthropicClient:
+    return request.app.state.clients.anthropic
 
 
-async def get_user_context(db: AsyncSession, thread_id: int = 1) -> str:
-    result = await db.execute(
-        select(UserContextModel)
-        .where(UserContextModel.thread_id == thread_id)
-        .order_by(UserContextModel.created.asc())
-    )
-    user_contexts = result.scalars().all()
-
-    # Extract context_data and convert to string
-    context_data_strings = [json.dumps(uc.context_data) for uc in user_contexts]
-
-    # Add "You are a helpful assistant" as the first part of the context
-    combined_context = "You are a helpful assistant. " + " ".join(context_data_strings)
+def get_thread_context(request: Request) -> ThreadContextService:
+    return request.app.state.thread_context
 
-    return combined_context
 
 @router.post(
     "/stream/anthropic",
@@ -53,7 +39,9 @@ async def get_user_context(db: AsyncSession, thread_id: int = 1) -> str:
 
 )
 
-async def stream_anthropic_route(request: GenerationRequest, db: AsyncSession = Depends(get_db), _: str = Depends(auth)):
+async def stream_anthropic_route(request: GenerationRequest, db: AsyncSession = Depends(get_db), user: User = Depends(auth),
+                                 client: AnthropicClient = Depends(get_anthropic_client),
+                                 thread_context: ThreadContextService = Depends(get_thread_context)):
     """
     Stream output from the Anthropic model based on the provided generation request.
 
@@ -72,9 +60,13 @@ async def stream_anthropic_route(request: GenerationRequest, db: AsyncSession =
     if not request.models or len(request.models) == 0:
         raise HTTPException(status_code=400, detail="No models provided in the request.")
 
-    # Fetch user context from the database
-    user_context = await get_user_context(db, thread_id=1)
+    # Materialized context of the requested thread (built from the database only on a cache miss)
+    user_context = await thread_context.get(db, str(user.uuid), request.thread_id)
+    # The stream does not touch the database, the connection goes back to the pool
+    await release_session(db)
 
-    client = AnthropicClient(api_key=settings.get("default").get("API_KEY_ANTHROPIC"))
+    async def generate():
+        async for frame in client.generate(request.models, request, context=user_context):
+            yield frame.data
 
-    return StreamingResponse(client.generate(request.models, request, context=user_context), media_type='application/json')
+    return StreamingResponse(generate(), media_type='application/json')
@@ -1,21 +1,25 @@
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import StreamingResponse
-import asyncio
 from typing import List, Any, Dict, Type, Optional
 from pydantic import BaseModel, Field
 
-from server.app.clients.cerebras.cerebras_client import CerebrasClient
 from server.app.config.settings import Settings
-from server.app.db.base import async_session_maker
+from server.app.db.get_db import get_db, release_session
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.app.models.generation.cerebras_model import CerebrasModel
-from server.app.models.generation.generation_request import GenerationRequest
+from server.app.models.generation.generation_request import GenerationRequest, StreamMode
 from server.app.models.generation.success_generation_model import SuccessGenerationModel
 from server.app.utils.auth import auth
-from server.app.services.gripsbox_service import add_gripsbox_content_to_llm_context
+from server.app.services.context_assembly_service import assemble_generation_context
+from server.app.utils.stream_frames import StreamFrame, build_error_frame
+from server.app.utils.stream_multiplexer import merge_streams
+from server.app.utils.context_packer import TokenCache
+from server.app.services.system_prompt_service import SystemPromptService
+from server.app.services.context_compression_service import ContextCompressionService
+from server.app.services.generation_cache_service import GenerationCacheService
 from server.app.models.users.user import User
-import json
-from server.app.utils.user_context_util import get_user_context
+from server.app.services.thread_context_service import ThreadContextService
 
 router = APIRouter()
 settings = Settings()
@@ -24,14 +28,7 @@ settings = Settings()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize clients
-cerebras_client = CerebrasClient(api_key=settings.get("default").get("API_KEY_CEREBRAS"))
-
-
 registered_methods = ['fetch_completion', 'chat_completion']
-clients = {
-    'cerebras': cerebras_client,
-}
 
 MODEL_CLASS_MAP: Dict[str, Type] = {
     "cerebras": CerebrasModel,
@@ -53,9 +50,27 @@ class ModelConfig(BaseModel):
     object: Optional[str] = Field(None, description="Object type (if applicable).")
 
 
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
+def get_clients(request: Request) -> Dict[str, Any]:
+    # Clients come from the process-wide registry (app.state.clients)
+    return {
+        'cerebras': request.app.state.clients.cerebras,
+    }
+
+
+def get_thread_context(request: Request) -> ThreadContextService:
+    return request.app.state.thread_context
+
+
+def get_generation_cache(request: Request) -> GenerationCacheService:
+    return request.app.state.generation_cache
+
+
+def get_system_prompts(request: Request) -> SystemPromptService:
+    return request.app.state.system_prompts
+
+
+def get_context_compression(request: Request) -> ContextCompressionService:
+    return request.app.state.context_compression
 
 
 def get_model_class(platform: str):
@@ -79,7 +94,7 @@ def set_model_id(platform: str, model_dict: dict) -> None:
             )
 
 
-def validate_models_and_clients(models: List[ModelConfig], method_name: str) -> List[Any]:
+def validate_models_and_clients(models: List[ModelConfig], method_name: str, clients: Dict[str, Any]) -> List[Any]:
     valid_models = []
     for model_data in models:
         platform = model_data.platform
@@ -144,12 +159,17 @@ def validate_models_and_clients(models: List[ModelConfig], method_name: str) ->
         "If the configuration is invalid or the platform is not supported, a `400 Bad Request` error is raised."
     ),
 )
-async def stream_route(request: GenerationRequest, user: User = Depends(auth),db: Any = Depends(get_db)):
+async def stream_route(request: GenerationRequest, user: User = Depends(auth),
+                       db: AsyncSession = Depends(get_db),
+                       generation_cache: GenerationCacheService = Depends(get_generation_cache),
+                       clients: Dict[str, Any] = Depends(get_clients),
+                       thread_context: ThreadContextService = Depends(get_thread_context),
+                       system_prompts: SystemPromptService = Depends(get_system_prompts),
+                       context_compression: ContextCompressionService = Depends(get_context_compression)):
     """
     Stream AI-generated content based on the provided prompt and model configurations.
 
     - **request**: A `GenerationRequest` object containing the models, method name, and other parameters for generation.
-    - **db**: Database session dependency.
 
     This endpoint validates the model configurations and method name, then streams the generated content
     as a JSON response. It supports concurrent model generation and handles errors related to invalid configurations.
@@ -160,46 +180,63 @@ async def stream_route(request: GenerationRequest, user: User = Depends(auth),db
     logger.info(request.model_dump_json())
     logger.info("=" * 50)
 
-    # Fetch user context from the database
-    user_context = await get_user_context(thread_id=1, get_db=get_db)
-
-    try:
-        gripsbox_context_messages = await add_gripsbox_content_to_llm_context(user)
-        # Safely join content messages
-        gripsbox_content = " ".join([msg.content for msg in gripsbox_context_messages])
-
-    except Exception as e:
-        # Log the error if necessary
-        gripsbox_content = ""
-
-
-    # Combine user context and Gripsbox content into a single context
-    combined_context = user_context + " " + gripsbox_content
-
-
-
     # Validate models and clients
-    valid_models = validate_models_and_clients(request.models, request.method_name)
+    valid_models = validate_models_and_clients(request.models, request.method_name, clients)
+
+    # Verlauf, Gripsbox, Systemprompt und Cache-Einstellung sind unabhängig und werden parallel geladen.
+    # The system prompt is resolved once per request and shared by all models.
+    context = await assemble_generation_context(request, user, db, thread_context, system_prompts,
+                                                generation_cache, compression=context_compression)
+    user_context = context["thread_context"]
+    gripsbox_content = context["gripsbox"]
+    system_prompt = context["system_prompt"]
+    # Identische Anfragen (Modell, Temperatur, Systemprompt, Kontext, Prompt) werden aus dem Cache abgespielt
+    cache_setting = context["generation_cache"]
+    # Everything the stream needs from the database is loaded, the connection goes back to the pool
+    await release_session(db)
+
+    # History and Gripsbox content together make up the context part of the generation cache key
+    combined_context = user_context + " " + gripsbox_content
+    # The models share the sources, each source is tokenized once per encoding
+    token_cache = TokenCache()
+
+    async def model_stream(method, model, model_config):
+        async def fetch():
+            # History and gripsbox are passed separately, the client packs them into the model's context window
+            return await method(model, request.prompt, request.id, context=user_context,
+                                gripsbox_content=gripsbox_content,
+                                user_system_prompt=system_prompt, stream_mode=request.stream_mode,
+                                temperature=model_config.temperature, max_tokens=model_config.max_tokens,
+                                token_cache=token_cache)
+
+        # The key holds the temperature and max_tokens that are sent,
+        # only deterministic or opted-in answers are cached
+        if generation_cache.should_cache(cache_setting, model_config.temperature):
+            key = generation_cache.build_key(model.id, model_config.temperature, system_prompt, combined_context,
+                                             request.prompt, request.stream_mode.value,
+                                             max_tokens=model_config.max_tokens)
+            async_gen = generation_cache.stream(key, model.id, request.id, fetch)
+        else:
+            async_gen = await fetch()
+
+        async for frame in async_gen:
+            yield frame
 
     async def generate():
-        tasks = []
-
-        for model, client, method in valid_models:
-            # Pass the combined context as a parameter to fetch_completion
-            async_task = method(model, request.prompt, request.id, context=combined_context,   db=db, user_uuid=str(user.uuid) )
-            task = asyncio.create_task(async_task)
-            tasks.append(task)
-
-        for completed_task in asyncio.as_completed(tasks):
-            async_gen = await completed_task
-            async for result in async_gen:
-                if isinstance(result, bytes):
-                    result = result.decode('utf-8')
-
-                # Deserialize using Pydantic model's model_validate
-                success_model = SuccessGenerationModel.model_validate(json.loads(result))
-                # Serialize using model_dump_json
-                yield success_model.model_dump_json().encode('utf-8') + b'\n'
-
-    return StreamingResponse(generate(), media_type='application/json')
+        # All models are consumed at the same time, frames are interleaved as they arrive.
+        # Frames are encoded once by the client and written as is.
+        streams = [model_stream(method, model, model_config)
+                   for (model, client, method), model_config in zip(valid_models, request.models)]
+
+        def error_frame(index: int, error: Exception) -> StreamFrame:
+            # A failing model ends with its error frame, the other models keep streaming
+            model_id = valid_models[index][0].id
+            return StreamFrame.from_model(build_error_frame(request.id, model_id, error), model_id)
+
+        async for frame in merge_streams(streams, on_error=error_frame):
+            yield frame.data
+
+    media_type = 'application/x-ndjson' if request.stream_mode == StreamMode.DELTA else 'application/json'
+    return StreamingResponse(generate(), media_type=media_type,
+                             headers={"Server-Timing": context.server_timing()})
 
@@ -1,9 +1,9 @@
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from server.app.config.settings import Settings
-from server.app.db.base import async_session_maker
+from server.app.db.get_db import get_db, release_session
 from server.app.models.generation.generation_request import GenerationRequest
 from server.app.clients.googleai.google_ai_client import GoogleAICLient
 from server.app.models.generation.success_generation_model import SuccessGenerationModel
@@ -15,9 +15,9 @@ settings = Settings()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
+def get_google_ai_client(request: Request) -> GoogleAICLient:
+    return request.app.state.clients.google_ai
+
 
 @router.post(
     "/stream/google-ai",
@@ -31,7 +31,8 @@ async def get_db():
         "The endpoint returns a streaming JSON response that contains the generated output."
     ),
 )
-async def stream_google_ai_route(request: GenerationRequest, db: AsyncSession = Depends(get_db), _: str = Depends(auth)):
+async def stream_google_ai_route(request: GenerationRequest, db: AsyncSession = Depends(get_db), _: str = Depends(auth),
+                                 google_ai_client: GoogleAICLient = Depends(get_google_ai_client)):
     """
     Stream output from the Google AI model based on the provided generation request.
 
@@ -50,8 +51,11 @@ async def stream_google_ai_route(request: GenerationRequest, db: AsyncSession =
     if not request.models or len(request.models) == 0:
         raise HTTPException(status_code=400, detail="No models provided in the request.")
 
-    model_config = request.models[0]  # Assuming you're using the first model in the list
+    # The session was only needed for authentication, the connection goes back to the pool
+    await release_session(db)
 
-    google_ai_client = GoogleAICLient(api_key=settings.get("default").get("API_KEY_GOOGLE_AI"))
+    async def generate():
+        async for frame in google_ai_client.generate(request.models, request):
+            yield frame.data
 
-    return StreamingResponse(google_ai_client.generate(model_config, request), media_type='application/json')
+    return StreamingResponse(generate(), media_type='application/json')
@@ -1,15 +1,13 @@
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from typing import List, Literal
-from openai import OpenAI
 from openai.types.images_response import ImagesResponse
 
 from server.app.utils.auth import auth
 # Assuming you have these imports from your existing code
 from server.app.config.settings import Settings
-from server.app.db.base import async_session_maker
 
 router = APIRouter()
 settings = Settings()
@@ -18,9 +16,6 @@ settings = Settings()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=settings.get("default").get("API_KEY_OPEN_AI"))
-
 class ImageGenerationRequest(BaseModel):
     prompt: str = Field(..., description="The prompt for image generation")
     n: int = Field(1, ge=1, le=10, description="Number of images to generate")
@@ -56,10 +51,6 @@ class ImageGenerationResponse(BaseModel):
             }
         }
 
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
-
 @router.post(
     "/generate/image",
     response_model=ImageGenerationResponse,
@@ -67,13 +58,15 @@ async def get_db():
     summary="Generate images using DALL-E 3",
     description="This endpoint generates images based on the provided prompt using OpenAI's DALL-E 3 model.",
 )
-async def generate_image(request: ImageGenerationRequest, _: str = Depends(auth)):
+async def generate_image(request: ImageGenerationRequest, http_request: Request, _: str = Depends(auth)):
     logger.info("Incoming request to /generate/image:")
     logger.info(request.model_dump_json())
     logger.info("=" * 50)
 
     try:
-        response: ImagesResponse = client.images.generate(
+        # Pooled client of the process-wide registry (app.state.clients)
+        client = http_request.app.state.clients.openai.client
+        response: ImagesResponse = await client.images.generate(
             model="dall-e-3",
             prompt=request.prompt,
             n=request.n,
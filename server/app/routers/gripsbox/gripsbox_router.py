@@ -7,9 +7,10 @@ from typing import List
 from server.app.config.settings import Settings
 from uuid import UUID
 import logging
-from fastapi import APIRouter, Depends, status, File, UploadFile, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, status, File, UploadFile, Form
 from sqlalchemy.ext.asyncio import AsyncSession
-from server.app.services.gripsbox_service import create_gripsbox_service
+from server.app.services.gripsbox_service import create_gripsbox_service, invalidate_gripsbox_content, \
+    remove_gripsbox_from_index, load_gripsbox_digest
 from server.app.models.gripsbox.gripsbox_post_response import GripsboxPostResponseModel
 from server.app.utils.auth import auth
 from server.app.db.get_db import get_db
@@ -42,12 +43,30 @@ async def get_gripsbox(db: AsyncSession = Depends(get_db),  _: str = Depends(aut
 class GripsboxActiveUpdateModel(BaseModel):
     active: bool
 
+
+class GripsboxSummaryModeUpdateModel(BaseModel):
+    summary_mode: bool
+
+
+async def get_user_gripsbox(db: AsyncSession, id: UUID, user: User) -> Gripsbox:
+    """
+    The gripsbox entry `id` of the user. Entries of other users are reported as not found.
+    """
+    result = await db.execute(select(Gripsbox).where(Gripsbox.id == id, Gripsbox.user == user.uuid))
+    gripsbox = result.scalars().first()
+    if not gripsbox:
+        logger.warning(f"Gripsbox not found: id={id}, user={user.uuid}")
+        raise HTTPException(status_code=404, detail=f"Gripsbox with id {id} not found")
+    return gripsbox
+
 @router.delete("/gripsbox/{id}", tags=["gripsbox"])
 async def delete_gripsbox(id: UUID, db: AsyncSession = Depends(get_db), _: str = Depends(auth)):
     gripsbox = await db.get(Gripsbox, id)
     if gripsbox:
         await db.delete(gripsbox)
         await db.commit()
+        invalidate_gripsbox_content(str(gripsbox.user), gripsbox.name)
+        await remove_gripsbox_from_index(str(gripsbox.user), str(id))
         logger.info(f"Gripsbox deleted successfully: id={id}")
         return {"status": "Gripsbox deleted successfully"}
     else:
@@ -65,6 +84,7 @@ async def update_gripsbox_active_status(id: UUID, update_data: GripsboxActiveUpd
 
         gripsbox.active = update_data.active
         await db.commit()
+        invalidate_gripsbox_content(str(gripsbox.user), gripsbox.name)
         logger.info(f"Gripsbox active status updated: id={id}, active={update_data.active}")
 
         return {"status": "Active status updated successfully"}
@@ -74,6 +94,42 @@ async def update_gripsbox_active_status(id: UUID, update_data: GripsboxActiveUpd
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 
+@router.patch("/gripsbox/{id}/summary-mode", response_model=dict, status_code=status.HTTP_200_OK, tags=["gripsbox"])
+async def update_gripsbox_summary_mode(id: UUID, update_data: GripsboxSummaryModeUpdateModel,
+                                       db: AsyncSession = Depends(get_db), user: User = Depends(auth)):
+    """
+    Switch a gripsbox entry between the full document and its precomputed digest (outline and summary)
+    in the LLM context.
+    """
+    try:
+        gripsbox = await get_user_gripsbox(db, id, user)
+
+        gripsbox.summary_mode = update_data.summary_mode
+        await db.commit()
+        logger.info(f"Gripsbox summary mode updated: id={id}, summary_mode={update_data.summary_mode}")
+
+        return {"status": "Summary mode updated successfully"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating gripsbox summary mode: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+
+@router.get("/gripsbox/{id}/summary", response_model=dict, tags=["gripsbox"])
+async def get_gripsbox_summary(id: UUID, db: AsyncSession = Depends(get_db), user: User = Depends(auth)):
+    """
+    The digest that is injected for this gripsbox entry in summary mode.
+    """
+    gripsbox = await get_user_gripsbox(db, id, user)
+
+    digest = await load_gripsbox_digest(str(gripsbox.user), gripsbox)
+    if digest is None:
+        raise HTTPException(status_code=404, detail=f"No summary available for gripsbox {id}")
+    return {"id": str(id), "name": gripsbox.name, "summary": digest}
+
+
 @router.post("/gripsbox", response_model=GripsboxPostResponseModel, status_code=status.HTTP_201_CREATED, tags=["gripsbox"])
 async def create_gripsbox(
     name: str = Form(...),
@@ -83,6 +139,7 @@ async def create_gripsbox(
     tags: str = Form(None),  # Allow tags to be optional
     models: str = Form(None),  # Allow models to be optional
     file: UploadFile = File(...),
+    background_tasks: BackgroundTasks = None,
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth)
 ):
@@ -112,7 +169,9 @@ async def create_gripsbox(
     new_gripsbox = await create_gripsbox_service(
         file=file,
         gripsbox_post_data=gripsbox_data,
-        user=user
+        user=user,
+        background_tasks=background_tasks,
+        db=db
     )
 
     logger.debug(f"Gripsbox created successfully: id={new_gripsbox.id}")
@@ -126,6 +185,8 @@ async def delete_gripsbox(id: UUID, db: AsyncSession = Depends(get_db), _: str =
     if gripsbox:
         await db.delete(gripsbox)
         await db.commit()
+        invalidate_gripsbox_content(str(gripsbox.user), gripsbox.name)
+        await remove_gripsbox_from_index(str(gripsbox.user), str(id))
         logger.info(f"Gripsbox deleted successfully: id={id}")
         return {"status": "Gripsbox deleted successfully"}
     else:
@@ -1,27 +1,26 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
 from uuid import UUID
 from typing import List
 
-from server.app.db.base import async_session_maker
+from server.app.db.get_db import get_db
 from server.app.utils.auth import auth
 from server.app.models.model_parameter.models_parameter import ModelParameter
 from server.app.models.model_parameter.models_parameter_request import ModelParameterRequestModel
 from server.app.models.model_parameter.models_parameter_response import ModelParameterResponseModel
 from server.app.models.users.user import User
+from server.app.services.system_prompt_service import SystemPromptService
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 from fastapi import Body, Path
 router = APIRouter()
 
 
-# Dependency to get the database session
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
+def get_system_prompts(request: Request) -> SystemPromptService:
+    return request.app.state.system_prompts
 
 
 @router.get("/model-parameters/user", response_model=List[ModelParameterResponseModel], tags=["model_parameters"])
@@ -73,7 +72,8 @@ async def update_model_parameter(
     parameter_id: UUID = Path(..., description="The unique identifier of the model parameter"),
     request: ModelParameterRequestModel = Body(...),
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(auth)
+    user: User = Depends(auth),
+    system_prompts: SystemPromptService = Depends(get_system_prompts)
 ):
     """
     Update a model parameter by ID.
@@ -106,6 +106,7 @@ async def update_model_parameter(
         db.add(parameter)
         await db.commit()
         await db.refresh(parameter)
+        await system_prompts.invalidate(str(user.uuid))
 
         logger.info(f"Model parameter updated successfully: id={parameter_id}")
         return ModelParameterResponseModel(**parameter.to_dict())
@@ -124,7 +125,8 @@ async def update_model_parameter(
 async def create_model_parameter(
     request: ModelParameterRequestModel,
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(auth)  # Fetch user from session
+    user: User = Depends(auth),  # Fetch user from session
+    system_prompts: SystemPromptService = Depends(get_system_prompts)
 ):
     """
     Create a new model parameter.
@@ -151,6 +153,7 @@ async def create_model_parameter(
         db.add(new_parameter)
         await db.commit()
         await db.refresh(new_parameter)
+        await system_prompts.invalidate(str(user.uuid))
 
         logger.debug(f"Model parameter created successfully: {new_parameter}")
         return ModelParameterResponseModel(**new_parameter.to_dict())
@@ -162,7 +165,8 @@ async def create_model_parameter(
 
 
 @router.delete("/model-parameters/{parameter_id}", tags=["model_parameters"])
-async def delete_model_parameter(parameter_id: UUID, db: AsyncSession = Depends(get_db), _: dict = Depends(auth)):
+async def delete_model_parameter(parameter_id: UUID, db: AsyncSession = Depends(get_db), _: dict = Depends(auth),
+                                 system_prompts: SystemPromptService = Depends(get_system_prompts)):
     """
     Delete a model parameter by ID.
     """
@@ -174,6 +178,7 @@ async def delete_model_parameter(parameter_id: UUID, db: AsyncSession = Depends(
 
         await db.delete(parameter)
         await db.commit()
+        await system_prompts.invalidate(str(parameter.user))
         logger.info(f"Model parameter deleted successfully: id={parameter_id}")
         return {"status": "Model parameter deleted successfully"}
     except SQLAlchemyError as e:
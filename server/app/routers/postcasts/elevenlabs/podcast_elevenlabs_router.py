@@ -3,13 +3,15 @@ import logging
 import json
 import requests
 from uuid import uuid4
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Request, status, Depends
 from pydantic import BaseModel, Field
 from server.app.config.settings import Settings
 from server.app.services.gripsbox_service import load_gripsbox_by_id
 from server.app.models.podcasts.podcast_response_model import PodcastPostResponseModel
-from openai import OpenAI
+from openai import AsyncOpenAI
 from server.app.utils.auth import auth
+from server.app.db.get_db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydub import AudioSegment
 
 # Logging konfigurieren
@@ -24,7 +26,6 @@ settings = Settings()
 
 # API-Schlüssel und URLs
 ELEVENLABS_API_KEY = settings.get("default").get("API_KEY_ELEVENLABS")
-OPENAI_API_KEY = settings.get("default").get("API_KEY_OPEN_AI")
 url = "https://api.elevenlabs.io/v1/text-to-speech"
 
 # Stimmenzuordnung für ElevenLabs
@@ -113,14 +114,13 @@ def create_elevenlabs_audio(dialogue: list, user_uuid: str, gripsbox_uuid: str):
     return audio_file_paths
 
 
-def generate_dialog_with_gpt4(text: str):
+async def generate_dialog_with_gpt4(client: AsyncOpenAI, text: str):
     """
     Nutzt GPT-4, um den Text in Dialogform zu konvertieren.
+    `client` ist der gepoolte Client aus app.state.clients.
     """
     try:
-        client = OpenAI(api_key=OPENAI_API_KEY)
-
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4o",
             messages=[{
                 "role": "system",
@@ -198,7 +198,8 @@ from server.app.models.users.user import User
 
 @router.post("/podcasts/elevenlabs", response_model=PodcastPostResponseModel, status_code=status.HTTP_201_CREATED,
              tags=["podcasts"])
-async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel, user: User = Depends(auth)):
+async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel, request: Request, user: User = Depends(auth),
+                         db: AsyncSession = Depends(get_db)):
     """
     Erstellt einen Podcast aus einer Gripsbox mit Textinhalt über ElevenLabs TTS.
     """
@@ -207,7 +208,7 @@ async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel, user: User
     logger.debug(f"Request erhalten - Gripsbox ID: {gripsbox_id}, Sprecher: {speakers}")
 
     try:
-        text = await load_gripsbox_by_id(gripsbox_id)
+        text = await load_gripsbox_by_id(gripsbox_id, db)
         if isinstance(text, list):
             text = " ".join(text)
     except HTTPException as e:
@@ -217,7 +218,7 @@ async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel, user: User
         logger.error("Gripsbox enthält keinen gültigen Text.")
         raise HTTPException(status_code=400, detail="Gripsbox enthält keinen Text.")
 
-    dialog_text = generate_dialog_with_gpt4(text)
+    dialog_text = await generate_dialog_with_gpt4(request.app.state.clients.openai.client, text)
 
     dialog_parts = split_dialog_by_speakers(dialog_text, speakers)
     logger.debug(f"Parts: {dialog_parts}")
@@ -4,6 +4,8 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel, Field
 from server.app.config.settings import Settings
 from server.app.utils.auth import auth
+from server.app.db.get_db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
 # Logging konfigurieren
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -49,7 +51,7 @@ def split_text_into_chunks(text: str, max_bytes: int = 4000):
 import os
 import logging
 from uuid import uuid4
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from pydantic import BaseModel, Field
 import re
 import json
@@ -57,7 +59,7 @@ from google.cloud import texttospeech
 from server.app.config.settings import Settings
 from server.app.services.gripsbox_service import load_gripsbox_by_id
 from server.app.models.podcasts.podcast_response_model import PodcastPostResponseModel
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 # Logging konfigurieren
 logging.basicConfig(level=logging.DEBUG)
@@ -198,16 +200,13 @@ def synthesize_google_speech(text_chunks: list, voice_name: str, language_code:
 
 
 
-def generate_dialog_with_gpt4(text: str):
+async def generate_dialog_with_gpt4(client: AsyncOpenAI, text: str):
     """
     Nutzt GPT-4, um den Text in Dialogform zu konvertieren.
+    `client` ist der gepoolte Client aus app.state.clients.
     """
     try:
-        API_KEY_OPEN_AI = settings.get("default").get("API_KEY_OPEN_AI")
-        # OpenAI Client mit API-Schlüssel initialisieren
-        client = OpenAI(api_key=API_KEY_OPEN_AI)
-
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4o",
             messages=[
                 {
@@ -227,14 +226,14 @@ def generate_dialog_with_gpt4(text: str):
         dialog = response.choices[0].message.content
         return dialog
     except Exception as e:
-        logger.error(f"OpenAI API-Fehler: {str(e)} for api_key: {API_KEY_OPEN_AI}")
-        raise HTTPException(status_code=500, detail=f"OpenAI API-Fehler: {str(e)} for api_key: {API_KEY_OPEN_AI}")
+        logger.error(f"OpenAI API-Fehler: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"OpenAI API-Fehler: {str(e)}")
 
 
 
 
 @router.post("/podcasts", response_model=PodcastPostResponseModel, status_code=status.HTTP_201_CREATED,  tags=["podcasts"])
-async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel):
+async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel, request: Request):
     """
     Erstellt einen Podcast aus einer Gripsbox mit Textinhalt über die Google TTS-API.
     """
@@ -255,7 +254,7 @@ async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel):
         raise HTTPException(status_code=400, detail="Gripsbox enthält keinen Text.")
 
     # 2. Text in Dialogform bringen
-    dialog_text = generate_dialog_with_gpt4(text)
+    dialog_text = await generate_dialog_with_gpt4(request.app.state.clients.openai.client, text)
 
     # Entferne die Sprecher-Namen
     cleaned_dialog = remove_speaker_names(dialog_text)
@@ -318,7 +317,8 @@ def remove_speaker_names(dialog: str):
 
 
 @router.post("/podcasts", response_model=PodcastPostResponseModel, status_code=status.HTTP_201_CREATED,  tags=["podcasts"])
-async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel,  _: str = Depends(auth)):
+async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel, request: Request, _: str = Depends(auth),
+                         db: AsyncSession = Depends(get_db)):
     """
     Erstellt einen Podcast aus einer Gripsbox mit Textinhalt über die Google TTS-API.
     """
@@ -328,7 +328,7 @@ async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel,  _: str = D
 
     # 1. Gripsbox-Inhalt abrufen
     try:
-        text = await load_gripsbox_by_id(gripsbox_id)
+        text = await load_gripsbox_by_id(gripsbox_id, db)
         if isinstance(text, list):
             text = " ".join(text)
     except HTTPException as e:
@@ -339,7 +339,7 @@ async def create_podcast(gripsbox_data: PodcastGripsboxRequestModel,  _: str = D
         raise HTTPException(status_code=400, detail="Gripsbox enthält keinen Text.")
 
     # 2. Text in Dialogform bringen
-    dialog_text = generate_dialog_with_gpt4(text)
+    dialog_text = await generate_dialog_with_gpt4(request.app.state.clients.openai.client, text)
 
     # Entferne die Sprecher-Namen
     cleaned_dialog = remove_speaker_names(dialog_text)
@@ -3,7 +3,7 @@ from fastapi import APIRouter, FastAPI
 
 from jsonschema import ValidationError
 from server.app.models.prompts.prompts import Prompt
-from server.app.db.base import async_session_maker
+from server.app.db.get_db import get_db
 from server.app.config.settings import Settings
 from typing import List
 from server.app.models.prompts.prompt_post_response_model import PromptPostResponseModel
@@ -22,13 +22,6 @@ router = APIRouter()
 
 settings = Settings()
 
-# Dependency to get the database session
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
-
-
-
 api_key_header = APIKeyHeader(name="X-API-Key")
 
 
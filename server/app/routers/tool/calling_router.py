@@ -4,7 +4,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Dict, Any
-from server.app.db.base import async_session_maker
+from server.app.db.get_db import get_db
 from server.app.config.settings import Settings
 from server.app.utils.auth import auth
 from server.app.models.tools.tool_call_response_model import ToolCallResponseModel
@@ -17,17 +17,6 @@ router = APIRouter()
 settings = Settings()
 
 
-# Dependency to get the database session
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
-
-
-
-
-
-
-
 @router.post("/tools/call", response_model=ToolCallResponseModel, tags=["tools"])
 async def call_tool(tool_call: ToolCallRequestModel, db: AsyncSession = Depends(get_db), _: str = Depends(auth)):
     """
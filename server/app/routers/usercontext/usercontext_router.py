@@ -1,11 +1,11 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from server.app.models.usercontext.user_context import UserContextModel
 from server.app.models.usercontext.usercontext_post_request_model import UserContextPostRequestModel
 from server.app.models.usercontext.usercontext_post_response_model import UserContextResponseModel
-from server.app.db.base import async_session_maker
+from server.app.db.get_db import get_db
 from fastapi.encoders import jsonable_encoder
 from datetime import datetime
 from typing import List
@@ -15,20 +15,21 @@ from pydantic import ValidationError
 from fastapi.responses import StreamingResponse
 from server.app.utils.auth import auth
 from server.app.models.users.user import User
+from server.app.services.thread_context_service import ThreadContextService
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Dependency to get database session
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
+def get_thread_context(request: Request) -> ThreadContextService:
+    return request.app.state.thread_context
 
 # Route to save user context
 @router.post("/usercontext", tags=["usercontext"], response_model=List[UserContextResponseModel])
 async def save_user_context(
     user_contexts: List[UserContextPostRequestModel],
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(auth)  # Get user from auth dependency
+    user: User = Depends(auth),  # Get user from auth dependency
+    thread_context: ThreadContextService = Depends(get_thread_context)
 ):
     try:
         saved_contexts = []
@@ -39,6 +40,9 @@ async def save_user_context(
             # Use user.uuid from the authenticated user
             existing_context = await db.get(UserContextModel, user_context.uuid)
             if existing_context:
+                # Turn moves to another user/thread: the materialized context of the old one is outdated
+                if str(existing_context.user) != str(user.uuid) or existing_context.thread_id != user_context.thread_id:
+                    await thread_context.invalidate(str(existing_context.user), existing_context.thread_id)
                 existing_context.user = user.uuid  # Update with authenticated user's UUID
                 existing_context.thread_id = user_context.thread_id
                 existing_context.context_data = jsonable_encoder(user_context.dict())
@@ -56,6 +60,8 @@ async def save_user_context(
 
             await db.commit()
             await db.refresh(new_user_context)
+            await thread_context.save_turn(str(user.uuid), new_user_context.thread_id, str(new_user_context.uuid),
+                                           new_user_context.context_data)
             saved_contexts.append(UserContextResponseModel(**new_user_context.to_dict()))
 
         return saved_contexts
@@ -96,7 +102,8 @@ async def get_user_contexts(
 async def delete_user_context(
     thread_id: int,
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(auth)  # Get user from auth dependency
+    user: User = Depends(auth),  # Get user from auth dependency
+    thread_context: ThreadContextService = Depends(get_thread_context)
 ):
     try:
         logger.debug(f"Deleting contexts for thread {thread_id} of user {user.uuid}")
@@ -114,6 +121,7 @@ async def delete_user_context(
             await db.delete(user_context)
 
         await db.commit()
+        await thread_context.invalidate(str(user.uuid), thread_id)
         return {"status": f"All user contexts with thread_id {thread_id} deleted successfully"}
 
     except Exception as e:
@@ -11,6 +11,8 @@ from server.app.models.users.users_post_request import UserPostRequestModel  # F
 from server.app.models.users.user import User
 from server.app.utils.auth import auth
 from server.app.db.get_db import get_db
+from server.app.services.api_key_service import api_key_cache
+from server.app.services.user_service import session_user_cache
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -101,6 +103,9 @@ async def delete_user(id: int, db: AsyncSession = Depends(get_db), _: str = Depe
         if user:
             await db.delete(user)
             await db.commit()
+            # The user's keys are deleted with the user (cascade), they must not be served from the cache
+            api_key_cache.invalidate(user_uuid=user.uuid)
+            session_user_cache.invalidate(user.uuid)
             return {"status": "User deleted successfully"}
         else:
             logger.debug(f"User with id {id} not found for deletion")  # Debug level log for not found scenario
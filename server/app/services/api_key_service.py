@@ -0,0 +1,138 @@
+import hashlib
+import hmac
+import logging
+import secrets
+from typing import List, Optional
+from uuid import UUID
+
+from cachetools import TTLCache
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from server.app.db.get_db import use_session
+from server.app.models.api_key.api_key import ApiKey
+from server.app.models.users.user import User
+from server.app.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+# Key of the HMAC the API keys are stored with. Changing it invalidates all issued keys.
+API_KEY_SECRET = settings.get("default.APP_API_KEY_SECRET")
+
+# Verified keys are served from memory for this long; deactivating or deleting a key through the
+# server drops it immediately, the TTL only bounds changes made directly in the database
+API_KEY_CACHE_SIZE = settings.get_int("default.APP_API_KEY_CACHE_SIZE")
+API_KEY_CACHE_TTL = settings.get_int("default.APP_API_KEY_CACHE_TTL")
+# Unknown keys are remembered briefly, so repeated bad keys do not reach the database
+API_KEY_NEGATIVE_CACHE_TTL = settings.get_int("default.APP_API_KEY_NEGATIVE_CACHE_TTL")
+
+# Without a secret the stored hashes could be recomputed from guessed keys; only tests may run without one
+if not API_KEY_SECRET and not settings.get_bool("default.APP_TESTING"):
+    raise EnvironmentError("APP_API_KEY_SECRET is not set, API keys cannot be hashed without a secret.")
+
+
+def hash_api_key(api_key: str, secret: str = API_KEY_SECRET) -> str:
+    """
+    HMAC-SHA256 of an API key as 64 hex characters, the form the key is stored and looked up in.
+
+    API keys are random and long, a fast keyed hash is enough; a slow password hash would cost a
+    few hundred milliseconds on every request that misses the cache.
+    """
+    return hmac.new(secret.encode("utf-8"), api_key.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def generate_api_key() -> str:
+    return secrets.token_urlsafe(32)
+
+
+class ApiKeyCache:
+    """
+    Verified API keys (hash -> user) and recently rejected ones, both bounded and with a TTL.
+
+    The cached users are detached from their session and must be treated as read only.
+    """
+
+    def __init__(self, maxsize: int = API_KEY_CACHE_SIZE, ttl: int = API_KEY_CACHE_TTL,
+                 negative_ttl: int = API_KEY_NEGATIVE_CACHE_TTL):
+        self.users = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.invalid = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+        # Counts invalidations: a lookup that started before one must not put its result into the cache
+        self.generation = 0
+
+    def get(self, key_hash: str) -> Optional[User]:
+        entry = self.users.get(key_hash)
+        return entry[1] if entry else None
+
+    def is_invalid(self, key_hash: str) -> bool:
+        return key_hash in self.invalid
+
+    def set(self, key_hash: str, key_id: UUID, user: User, generation: int) -> None:
+        if generation == self.generation:
+            self.users[key_hash] = (key_id, user)
+
+    def set_invalid(self, key_hash: str, generation: int) -> None:
+        if generation == self.generation:
+            self.invalid[key_hash] = True
+
+    def invalidate(self, key_hash: Optional[str] = None, key_id: Optional[UUID] = None,
+                   user_uuid: Optional[UUID] = None) -> None:
+        self.generation += 1
+        if key_hash is not None:
+            self.users.pop(key_hash, None)
+            self.invalid.pop(key_hash, None)
+        if key_id is not None or user_uuid is not None:
+            for cached_hash, (cached_id, user) in list(self.users.items()):
+                if cached_id == key_id or (user_uuid is not None and user.uuid == user_uuid):
+                    self.users.pop(cached_hash, None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.users.clear()
+        self.invalid.clear()
+
+
+api_key_cache = ApiKeyCache()
+
+
+async def create_api_key(user_uuid: UUID, db: Optional[AsyncSession] = None) -> tuple[ApiKey, str]:
+    """
+    Issue a new active key for a user. Returns the stored entry and the plain key, which is not
+    stored anywhere and can only be shown once.
+    """
+    api_key = generate_api_key()
+    key_hash = hash_api_key(api_key)
+    async with use_session(db) as session:
+        entry = ApiKey(user=user_uuid, key=key_hash, active=True)
+        session.add(entry)
+        await session.commit()
+        await session.refresh(entry)
+    api_key_cache.invalidate(key_hash=key_hash)
+    return entry, api_key
+
+
+async def get_api_keys(user_uuid: UUID, db: Optional[AsyncSession] = None) -> List[ApiKey]:
+    async with use_session(db) as session:
+        result = await session.execute(
+            select(ApiKey).filter_by(user=user_uuid).order_by(ApiKey.created.desc())
+        )
+        return list(result.scalars().all())
+
+
+async def deactivate_api_key(key_id: UUID, user_uuid: UUID, db: Optional[AsyncSession] = None) -> bool:
+    async with use_session(db) as session:
+        result = await session.execute(
+            update(ApiKey).filter_by(id=key_id, user=user_uuid).values(active=False)
+        )
+        await session.commit()
+    api_key_cache.invalidate(key_id=key_id)
+    return result.rowcount > 0
+
+
+async def delete_api_key(key_id: UUID, user_uuid: UUID, db: Optional[AsyncSession] = None) -> bool:
+    async with use_session(db) as session:
+        result = await session.execute(delete(ApiKey).filter_by(id=key_id, user=user_uuid))
+        await session.commit()
+    api_key_cache.invalidate(key_id=key_id)
+    return result.rowcount > 0
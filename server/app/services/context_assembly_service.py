@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.app.db.get_db import SerializedSession
+from server.app.models.generation.generation_request import GenerationRequest
+from server.app.models.users.user import User
+from server.app.services.context_compression_service import COMPRESSED, ContextCompressionService
+from server.app.services.generation_cache_service import GenerationCacheService
+from server.app.services.gripsbox_service import add_gripsbox_content_to_llm_context
+from server.app.services.system_prompt_service import SystemPromptService
+from server.app.services.thread_context_service import ThreadContextService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AssembledContext:
+    values: Dict[str, Any]
+    # Latency per source and of the whole stage in milliseconds
+    timings: Dict[str, float] = field(default_factory=dict)
+    total: float = 0.0
+    # A/B variant of the context compression, None without a compression service
+    variant: Optional[str] = None
+    # The parts a value was joined from with spaces (turns, gripsbox files), compressed one by one
+    segments: Dict[str, List[str]] = field(default_factory=dict)
+
+    def __getitem__(self, name: str) -> Any:
+        return self.values[name]
+
+    def server_timing(self) -> str:
+        """Value of a Server-Timing header, shown per request in the browser's network tab."""
+        entries = [f"{name};dur={duration:.1f}" for name, duration in self.timings.items()]
+        entries.append(f"context;dur={self.total:.1f}")
+        if self.variant:
+            entries.append(f'variant;desc="{self.variant}"')
+        return ", ".join(entries)
+
+
+async def assemble_context(sources: Dict[str, Callable[[], Awaitable[Any]]]) -> AssembledContext:
+    """
+    Run independent context lookups concurrently and measure each one.
+    The stage takes as long as the slowest source instead of the sum of all of them.
+    """
+    timings: Dict[str, float] = {}
+
+    async def timed(name: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            return await load()
+        finally:
+            timings[name] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed(name, load) for name, load in sources.items()))
+    context = AssembledContext(values=dict(zip(sources.keys(), results)),
+                               timings={name: timings[name] for name in sources},
+                               total=(time.perf_counter() - started) * 1000)
+
+    logger.info(f"Context assembled in {context.total:.1f} ms: "
+                + ", ".join(f"{name}={duration:.1f} ms" for name, duration in context.timings.items()))
+    return context
+
+
+async def assemble_generation_context(request: GenerationRequest, user: User, db: AsyncSession,
+                                      thread_context: ThreadContextService,
+                                      system_prompts: SystemPromptService,
+                                      generation_cache: GenerationCacheService,
+                                      compression: Optional[ContextCompressionService] = None) -> AssembledContext:
+    """
+    Everything a generation request needs before the provider call: thread history, gripsbox
+    content, the user's system prompt and the generation cache setting. With a compression service,
+    history and gripsbox content are compressed for users in the compressed variant.
+
+    All lookups use the request's session (`db`, shared with auth), so the request holds a single
+    connection. The lookups run concurrently, only their SQL statements take turns on the session;
+    lookups served from the cache do not touch it at all.
+    """
+    session = SerializedSession(db)
+    user_uuid = str(user.uuid)
+    segments: Dict[str, List[str]] = {}
+
+    async def load_thread_context() -> str:
+        segments["thread_context"] = await thread_context.get_turns(session, user_uuid, request.thread_id)
+        return " ".join(segments["thread_context"])
+
+    async def load_gripsbox() -> str:
+        try:
+            gripsbox_context_messages = await add_gripsbox_content_to_llm_context(user, request.prompt, db=session)
+            segments["gripsbox"] = [msg.content for msg in gripsbox_context_messages]
+            return " ".join(segments["gripsbox"])
+        except Exception as e:
+            # Requests without (active) gripsbox files are answered without gripsbox content
+            logger.debug(f"No gripsbox content for user {user_uuid}: {str(e)}")
+            return ""
+
+    async def load_system_prompt() -> Optional[str]:
+        return await system_prompts.get(session, user_uuid)
+
+    async def load_cache_setting() -> Optional[bool]:
+        return await generation_cache.get_user_setting(session, user_uuid)
+
+    context = await assemble_context({
+        "thread_context": load_thread_context,
+        "gripsbox": load_gripsbox,
+        "system_prompt": load_system_prompt,
+        "generation_cache": load_cache_setting,
+    })
+    context.segments = segments
+    if compression is not None:
+        await compress_context(context, compression, user_uuid)
+    return context
+
+
+async def compress_context(context: AssembledContext, compression: ContextCompressionService, user_uuid: str) -> None:
+    """Compress history and gripsbox content in place and record the variant and the time it took."""
+    context.variant = compression.variant(user_uuid)
+    if context.variant != COMPRESSED:
+        return
+
+    started = time.perf_counter()
+    names = ("thread_context", "gripsbox")
+    originals = [context.values[name] for name in names]
+    results = await asyncio.gather(*(compression.compress_segments(context.segments.get(name) or [context.values[name]])
+                                     for name in names))
+    compressed = [" ".join(segments) for segments in results]
+    duration = (time.perf_counter() - started) * 1000
+
+    context.values.update(zip(names, compressed))
+    context.timings["compression"] = duration
+    context.total += duration
+    logger.info(f"Context compressed in {duration:.1f} ms: " + ", ".join(
+        f"{name}={len(original.split())}->{len(text.split())} words"
+        for name, original, text in zip(names, originals, compressed)))
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from diskcache import FanoutCache
+
+from server.app.utils.context_compression import compress, count_words, create_scorer
+from server.app.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+# off: never compress, on: always compress, ab: compress for APP_CONTEXT_COMPRESSION_AB_SHARE of the users
+CONTEXT_COMPRESSION = settings.get("default.APP_CONTEXT_COMPRESSION").lower()
+CONTEXT_COMPRESSION_AB_SHARE = settings.get_float("default.APP_CONTEXT_COMPRESSION_AB_SHARE")
+
+# Target size of the compressed text relative to the original
+CONTEXT_COMPRESSION_RATIO = settings.get_float("default.APP_CONTEXT_COMPRESSION_RATIO")
+
+# Hard limit per request: a compression that takes longer is not waited for, the text is sent as it is
+CONTEXT_COMPRESSION_BUDGET_MS = settings.get_int("default.APP_CONTEXT_COMPRESSION_BUDGET_MS")
+
+# Compressions running at the same time; with all workers busy the context is sent uncompressed
+CONTEXT_COMPRESSION_WORKERS = settings.get_int("default.APP_CONTEXT_COMPRESSION_WORKERS")
+
+# Shorter texts are not worth compressing
+CONTEXT_COMPRESSION_MIN_WORDS = settings.get_int("default.APP_CONTEXT_COMPRESSION_MIN_WORDS")
+
+# Small causal LM (e.g. distilgpt2) for scoring sentences on the CPU, empty for the lexical scorer
+CONTEXT_COMPRESSION_MODEL = settings.get("default.APP_CONTEXT_COMPRESSION_MODEL")
+CONTEXT_COMPRESSION_TTL = settings.get_int("default.APP_CONTEXT_COMPRESSION_TTL")
+
+COMPRESSED = "compressed"
+BASELINE = "baseline"
+
+
+class ContextCompressionService:
+    """
+    Optional compression of history and gripsbox content before the provider call.
+
+    The content is compressed per segment (a turn of the thread, a gripsbox file) and every segment
+    is cached by its own content hash. A new turn only costs the compression of that turn, the
+    earlier turns come from the cache exactly as they were sent before. Compression does not depend
+    on the prompt for the same reason.
+
+    Compression runs on its own small thread pool and never waits for a free worker: the default
+    pool of asyncio.to_thread also serves gripsbox reads, digests and embeddings, which must not
+    queue behind compressions. With all workers busy the content is sent uncompressed.
+
+    Notes for the A/B test: compression works against the prefix-stable prompt layout of
+    context_packer, which relies on history and gripsbox content only ever being appended to. A
+    segment that misses the budget or finds the workers busy is sent uncompressed and compressed
+    for a later request, so the prompt changes once at that segment and the provider's prompt cache
+    misses from there on. The compressed variant therefore gets fewer cached prompt tokens than the
+    baseline; compare latency and cost together with the cached-token counts, not by prompt size.
+    """
+
+    def __init__(self, cache: FanoutCache, mode: str = CONTEXT_COMPRESSION,
+                 ratio: float = CONTEXT_COMPRESSION_RATIO, budget_ms: int = CONTEXT_COMPRESSION_BUDGET_MS,
+                 ab_share: float = CONTEXT_COMPRESSION_AB_SHARE, min_words: int = CONTEXT_COMPRESSION_MIN_WORDS,
+                 scorer=None, ttl: int = CONTEXT_COMPRESSION_TTL, workers: int = CONTEXT_COMPRESSION_WORKERS):
+        if mode not in ("off", "on", "ab"):
+            raise ValueError(f"Unknown context compression mode: {mode}")
+        self.cache = cache
+        self.mode = mode
+        self.ratio = ratio
+        self.budget_ms = budget_ms
+        self.ab_share = ab_share
+        self.min_words = min_words
+        self.scorer = scorer or create_scorer(CONTEXT_COMPRESSION_MODEL)
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="context-compression")
+        # One slot per worker, a compression that had to queue would miss the budget anyway
+        self.slots = threading.BoundedSemaphore(workers)
+
+    def close(self) -> None:
+        """
+        Stop the compression workers. Called on application shutdown, queued compressions are dropped
+        and running ones are not waited for.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def variant(self, user_uuid: str) -> str:
+        """
+        Variant of the A/B test for a user. Users are assigned by a hash of their id, so a user stays
+        in the same variant across requests and restarts.
+        """
+        if self.mode == "off":
+            return BASELINE
+        if self.mode == "on":
+            return COMPRESSED
+        bucket = int(hashlib.sha256(user_uuid.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        return COMPRESSED if bucket < self.ab_share else BASELINE
+
+    def cache_key(self, text: str) -> str:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"context_compression:{self.scorer.name}:{self.ratio}:{text_hash}"
+
+    def cached(self, segments: List[str]) -> Tuple[List[str], List[Optional[str]]]:
+        """Cache keys of `segments` and their cached compressions (None if not cached)."""
+        keys = [self.cache_key(segment) for segment in segments]
+        return keys, [self.cache.get(key) for key in keys]
+
+    async def compress(self, text: str) -> str:
+        """Compressed `text` as a single segment, see `compress_segments`."""
+        return (await self.compress_segments([text]))[0]
+
+    async def compress_segments(self, segments: List[str]) -> List[str]:
+        """
+        Compressed `segments`. Nothing is compressed if all of them together are short. Segments that
+        are not done within the budget, or while all workers are busy, are returned as they are; a
+        compression that exceeds the budget still finishes in its thread and is cached for the next request.
+        """
+        if sum(count_words(segment) for segment in segments) < self.min_words:
+            return list(segments)
+
+        # Hashing and the diskcache lookups are file I/O, one worker thread does all of them
+        keys, results = await asyncio.to_thread(self.cached, segments)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing and self.slots.acquire(blocking=False):
+            done: Dict[int, str] = {}
+
+            def run() -> None:
+                try:
+                    for i in missing:
+                        done[i] = compress(segments[i], self.ratio, self.scorer)
+                        self.cache.set(keys[i], done[i], expire=self.ttl)
+                except Exception as e:
+                    logger.error(f"Context compression failed: {str(e)}")
+                finally:
+                    self.slots.release()
+
+            try:
+                job = asyncio.get_running_loop().run_in_executor(self.executor, run)
+            except RuntimeError:
+                # Closed on shutdown, the executor takes no new jobs
+                self.slots.release()
+                job = None
+            try:
+                if job is not None:
+                    await asyncio.wait_for(job, timeout=self.budget_ms / 1000)
+            except asyncio.TimeoutError:
+                logger.info(f"Context compression exceeded {self.budget_ms} ms, "
+                            f"sending {len(missing) - len(done)} segments uncompressed")
+            for i in missing:
+                results[i] = done.get(i)
+        elif missing:
+            logger.info(f"Context compression workers are busy, sending {len(missing)} segments uncompressed")
+
+        return [segment if result is None else result for segment, result in zip(segments, results)]
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, List, Optional
+
+from diskcache import FanoutCache
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from server.app.models.model_parameter.models_parameter import ModelParameter
+from server.app.utils.stream_frames import StreamFrame
+from server.app.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+# Opt-in: the cache is only used when APP_GENERATION_CACHE is set
+GENERATION_CACHE_ENABLED = settings.get_bool("default.APP_GENERATION_CACHE")
+GENERATION_CACHE_TTL = settings.get_int("default.APP_GENERATION_CACHE_TTL")
+GENERATION_CACHE_SIZE_LIMIT = settings.get_int("default.APP_GENERATION_CACHE_SIZE_LIMIT")
+GENERATION_CACHE_MAX_ENTRY_BYTES = settings.get_int("default.APP_GENERATION_CACHE_MAX_ENTRY_BYTES")
+# The system prompt carries the current time (hudini_clock), answers are only reused within this many seconds
+GENERATION_CACHE_CLOCK_GRANULARITY = settings.get_int("default.APP_GENERATION_CACHE_CLOCK_GRANULARITY")
+
+# Without an active model parameter `generation_cache` only answers at temperature 0 are cached, users opt in
+# for all temperatures by setting it to true or opt out by setting it to false
+USER_SETTING_PARAMETER = "generation_cache"
+
+# Only answers that ended normally are cached, no errors, tool calls or aborted streams
+CACHEABLE_FINISH_REASONS = {"stop", "length"}
+# Answers that ran a tool (weather, user data) depend on the tool result and are never cached
+TOOL_FINISH_REASONS = {"function_call", "tool_calls"}
+
+HITS_KEY = "generation_cache:hits"
+MISSES_KEY = "generation_cache:misses"
+
+
+class GenerationCacheService:
+    """
+    Cache for complete generation streams in front of `fetch_completion`.
+
+    The frame payloads of an answer are stored without their request specific fields and replayed
+    without delay on a hit: every replayed frame gets the id of the current request, a new sequence
+    number and current timestamps, so the client assigns it to the prompt that asked for it.
+    """
+
+    def __init__(self, cache: FanoutCache, enabled: bool = GENERATION_CACHE_ENABLED,
+                 ttl: int = GENERATION_CACHE_TTL, size_limit: int = GENERATION_CACHE_SIZE_LIMIT,
+                 max_entry_bytes: int = GENERATION_CACHE_MAX_ENTRY_BYTES):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        # Own sub cache, so generations are evicted by their own size limit and never push out other entries
+        self.cache = cache.cache("generation", size_limit=size_limit, eviction_policy="least-recently-used")
+
+    @staticmethod
+    def build_key(model: str, temperature: Optional[float], system_prompt: Optional[str], context: str,
+                  prompt: str, stream_mode: str, clock: Optional[str] = None,
+                  max_tokens: Optional[int] = None) -> str:
+        """
+        `clock` defaults to the current time bucket (see clock_bucket): the clock is part of the system
+        prompt, so "what time is it" must not be answered from an older entry.
+        """
+        clock = clock if clock is not None else clock_bucket()
+        context_hash = hashlib.sha256(f"{system_prompt or ''}\0{context}".encode("utf-8")).hexdigest()
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return (f"generation:v3:{model}:{temperature}:{max_tokens}:{stream_mode}:{clock}:"
+                f"{context_hash}:{prompt_hash}")
+
+    async def get_user_setting(self, db: AsyncSession, user_uuid: str) -> Optional[bool]:
+        """The user's explicit opt-in (True) or opt-out (False), None if the user did not choose."""
+        if not self.enabled:
+            return False
+
+        try:
+            result = await db.execute(
+                select(ModelParameter.value)
+                .filter_by(user=user_uuid, parameter=USER_SETTING_PARAMETER, active=True)
+            )
+            value = result.scalar()
+        except Exception as e:
+            logger.error(f"Error fetching generation cache setting for user {user_uuid}: {str(e)}")
+            return False
+
+        if value is None:
+            return None
+        return str(value).lower() not in ("false", "0", "off", "no")
+
+    def should_cache(self, user_setting: Optional[bool], temperature: Optional[float]) -> bool:
+        """
+        Answers are cached when the user opted in, otherwise only at temperature 0: any other temperature
+        samples a different answer every time, and replaying one would silently make it deterministic.
+        """
+        if not self.enabled or user_setting is False:
+            return False
+        return user_setting is True or temperature == 0
+
+    async def stream(self, key: str, model: str, request_id: str,
+                     fetch: Callable[[], Awaitable[AsyncIterator[StreamFrame]]]) -> AsyncGenerator[StreamFrame, None]:
+        """
+        Replay a cached answer for `request_id` or stream it from the provider (via `fetch`) and store it
+        once it is complete.
+        """
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            self.cache.incr(HITS_KEY)
+            logger.debug(f"Generation cache hit for {model}")
+            for frame in self.replay(cached, model, request_id):
+                yield frame
+            return
+
+        self.cache.incr(MISSES_KEY)
+        payloads: Optional[List[dict]] = []
+        size = 0
+        async for frame in await fetch():
+            yield frame
+            if payloads is None:
+                continue
+            size += len(frame.data)
+            payload = self.payload(frame.data)
+            if size > self.max_entry_bytes or payload is None or self.ran_tool(payload):
+                payloads = None
+                continue
+            payloads.append(payload)
+
+        if payloads and self.is_complete(payloads[-1]):
+            await asyncio.to_thread(self.cache.set, key, payloads, expire=self.ttl)
+
+    @staticmethod
+    def payload(data: bytes) -> Optional[dict]:
+        """Frame payload without the fields of the request that produced it."""
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            return None
+        if not isinstance(payload, dict):
+            return None
+        payload.pop("id", None)
+        payload.pop("seq", None)
+        return payload
+
+    @staticmethod
+    def finish_reason(payload: dict) -> Optional[str]:
+        try:
+            return (payload.get("completion") or {})["choices"][0]["finish_reason"]
+        except (KeyError, IndexError, TypeError):
+            return None
+
+    @classmethod
+    def ran_tool(cls, payload: dict) -> bool:
+        return cls.finish_reason(payload) in TOOL_FINISH_REASONS
+
+    @classmethod
+    def is_complete(cls, payload: dict) -> bool:
+        return cls.finish_reason(payload) in CACHEABLE_FINISH_REASONS
+
+    @staticmethod
+    def replay(payloads: List[dict], model: str, request_id: str) -> List[StreamFrame]:
+        """Frames of a cached answer for the current request: its id, new sequence numbers, current timestamps."""
+        now = int(time.time())
+        frames = []
+        for seq, stored in enumerate(payloads):
+            payload = {"id": request_id, "seq": seq, **stored}
+            completion = payload.get("completion")
+            if completion:
+                completion = {**completion, "created": now}
+                if completion.get("usage"):
+                    completion["usage"] = {**completion["usage"], "started": now, "ended": now}
+                payload["completion"] = completion
+            data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            frames.append(StreamFrame(model=model, data=data))
+        return frames
+
+    def stats(self) -> dict:
+        hits = self.cache.get(HITS_KEY, 0)
+        misses = self.cache.get(MISSES_KEY, 0)
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_ratio": hits / total if total else 0.0}
+
+
+def clock_bucket(now: Optional[datetime] = None, granularity: int = GENERATION_CACHE_CLOCK_GRANULARITY) -> str:
+    """Current time floored to `granularity` seconds, part of the cache key."""
+    timestamp = int((now or datetime.now()).timestamp())
+    return str(timestamp - timestamp % max(granularity, 1))
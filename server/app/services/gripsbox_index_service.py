@@ -0,0 +1,284 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+import faiss
+import numpy as np
+from cachetools import LRUCache
+
+from server.app.utils.text_chunker import chunk_text
+from server.app.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+# Embedding model of the existing FAISS tools in server/app/cli
+EMBEDDING_MODEL = settings.get("default.APP_GRIPSBOX_EMBEDDING_MODEL")
+
+# After a failed load of the embedding model, retrieval is off for this long before the load is tried again
+GRIPSBOX_EMBEDDING_RETRY_SECONDS = settings.get_int("default.APP_GRIPSBOX_EMBEDDING_RETRY_SECONDS")
+
+# Number of user indexes kept in memory, the others are loaded from disk on demand
+GRIPSBOX_INDEX_CACHE_SIZE = settings.get_int("default.APP_GRIPSBOX_INDEX_CACHE_SIZE")
+
+INDEX_FILE = "gripsbox.faiss"
+CHUNKS_FILE = "gripsbox_chunks.json"
+
+Embedder = Callable[[List[str]], np.ndarray]
+
+
+@dataclass
+class RetrievedChunk:
+    gripsbox_id: str
+    name: str
+    index: int
+    count: int
+    text: str
+    score: float
+
+
+class EmbeddingModelUnavailable(RuntimeError):
+    pass
+
+
+def load_embedder() -> Embedder:
+    """
+    Load the sentence transformer. Vectors are normalized, so the inner product of the index is
+    the cosine similarity.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    logger.info(f"Loaded embedding model {EMBEDDING_MODEL}")
+
+    def embed(texts: List[str]) -> np.ndarray:
+        return model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype('float32')
+
+    return embed
+
+
+class EmbedderLoader:
+    """
+    Loads the embedder once per process. A failed load is remembered as well: for `retry_seconds`
+    every call fails at once with EmbeddingModelUnavailable instead of loading the model again on
+    each request, and the failure is logged once.
+    """
+
+    def __init__(self, load: Callable[[], Embedder], retry_seconds: int = GRIPSBOX_EMBEDDING_RETRY_SECONDS):
+        self.load = load
+        self.retry_seconds = retry_seconds
+        self.lock = threading.Lock()
+        self.embedder: Optional[Embedder] = None
+        self.failed_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def available(self) -> bool:
+        """False while the last load failed and the retry is not due yet."""
+        return self.failed_at is None or time.monotonic() - self.failed_at >= self.retry_seconds
+
+    def __call__(self) -> Embedder:
+        with self.lock:
+            if self.embedder is not None:
+                return self.embedder
+            if not self.available():
+                raise EmbeddingModelUnavailable(f"Embedding model {EMBEDDING_MODEL} is unavailable: {self.error}")
+            try:
+                self.embedder = self.load()
+            except Exception as e:
+                self.failed_at = time.monotonic()
+                self.error = str(e)
+                logger.error(f"Could not load embedding model {EMBEDDING_MODEL}, gripsbox retrieval is disabled "
+                             f"for {self.retry_seconds} s: {self.error}")
+                raise EmbeddingModelUnavailable(f"Embedding model {EMBEDDING_MODEL} is unavailable: {self.error}") from e
+            self.failed_at = None
+            self.error = None
+            return self.embedder
+
+
+get_embedder = EmbedderLoader(load_embedder)
+
+
+def hashing_embedder(dimension: int = 384) -> Embedder:
+    """
+    Bag-of-words embedder without a model download, for offline benchmarks and tests.
+    Only texts sharing words are similar, there is no semantic matching.
+    """
+    def embed(texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), dimension), dtype='float32')
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                bucket = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), "little")
+                vectors[row, bucket % dimension] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    return embed
+
+
+class GripsboxIndex:
+    """
+    Vector index over the chunks of all gripsbox documents of one user.
+
+    The FAISS index and the chunk texts are stored next to the user's gripsbox files, so the index
+    survives restarts. Every chunk has a stable id, which allows removing the chunks of one document
+    without rebuilding the index.
+    """
+
+    def __init__(self, folder: str, embed: Embedder):
+        self.folder = folder
+        self.embed = embed
+        self.lock = threading.Lock()
+        self.index = None
+        self.next_id = 0
+        # chunk id -> {"gripsbox": id, "name": name, "index": position, "count": chunks of the document, "text": text}
+        self.chunks: Dict[int, dict] = {}
+        self._load()
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.folder, INDEX_FILE)
+
+    @property
+    def chunks_path(self) -> str:
+        return os.path.join(self.folder, CHUNKS_FILE)
+
+    def documents(self) -> set:
+        with self.lock:
+            return {chunk["gripsbox"] for chunk in self.chunks.values()}
+
+    def add_document(self, gripsbox_id: str, name: str, text: str) -> int:
+        """Chunk, embed and store a document, replacing an earlier version. Returns the number of chunks."""
+        chunks = chunk_text(text)
+        vectors = self.embed([chunk.text for chunk in chunks]) if chunks else None
+
+        with self.lock:
+            self._remove(gripsbox_id)
+            if chunks:
+                if self.index is None:
+                    self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+                ids = np.arange(self.next_id, self.next_id + len(chunks), dtype='int64')
+                self.index.add_with_ids(vectors, ids)
+                for chunk_id, chunk in zip(ids.tolist(), chunks):
+                    self.chunks[chunk_id] = {"gripsbox": gripsbox_id, "name": name, "index": chunk.index,
+                                             "count": len(chunks), "text": chunk.text}
+                self.next_id += len(chunks)
+            self._save()
+
+        logger.info(f"Indexed gripsbox document {name} ({len(chunks)} chunks) in {self.folder}")
+        return len(chunks)
+
+    def remove_document(self, gripsbox_id: str) -> None:
+        with self.lock:
+            if self._remove(gripsbox_id):
+                self._save()
+
+    def search(self, query: str, k: int, allowed: Optional[Iterable[str]] = None) -> List[RetrievedChunk]:
+        """
+        Return the `k` chunks most similar to the query, restricted to the documents in `allowed`.
+        """
+        allowed = set(allowed) if allowed is not None else None
+        with self.lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+            candidates = [chunk_id for chunk_id, chunk in self.chunks.items()
+                          if allowed is None or chunk["gripsbox"] in allowed]
+        if not candidates:
+            return []
+
+        vector = self.embed([query])
+        with self.lock:
+            # Inactive documents stay in the index, the selector skips their chunks during the search
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.array(candidates, dtype='int64')))
+            scores, ids = self.index.search(vector, min(k, len(candidates)), params=params)
+            results = []
+            for chunk_id, score in zip(ids[0].tolist(), scores[0].tolist()):
+                chunk = self.chunks.get(chunk_id)
+                if chunk_id < 0 or chunk is None:
+                    continue
+                results.append(RetrievedChunk(gripsbox_id=chunk["gripsbox"], name=chunk["name"],
+                                              index=chunk["index"], count=chunk["count"],
+                                              text=chunk["text"], score=float(score)))
+        return results
+
+    def _remove(self, gripsbox_id: str) -> bool:
+        ids = [chunk_id for chunk_id, chunk in self.chunks.items() if chunk["gripsbox"] == gripsbox_id]
+        if not ids:
+            return False
+        self.index.remove_ids(np.array(ids, dtype='int64'))
+        for chunk_id in ids:
+            del self.chunks[chunk_id]
+        return True
+
+    def _load(self) -> None:
+        if not (os.path.exists(self.index_path) and os.path.exists(self.chunks_path)):
+            return
+        try:
+            self.index = faiss.read_index(self.index_path)
+            with open(self.chunks_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            self.next_id = data["next_id"]
+            self.chunks = {int(chunk_id): chunk for chunk_id, chunk in data["chunks"].items()}
+        except Exception as e:
+            # A broken index is rebuilt from the documents on the next generation
+            logger.error(f"Could not load gripsbox index from {self.folder}: {str(e)}")
+            self.index, self.next_id, self.chunks = None, 0, {}
+
+    def _save(self) -> None:
+        os.makedirs(self.folder, exist_ok=True)
+        if self.index is not None:
+            faiss.write_index(self.index, self.index_path)
+        with open(self.chunks_path, "w", encoding="utf-8") as file:
+            json.dump({"next_id": self.next_id, "chunks": self.chunks}, file)
+
+
+class GripsboxIndexService:
+    """
+    Per-user gripsbox indexes. Indexes are opened lazily and kept in an LRU; embedding and FAISS
+    calls run in a worker thread so they do not block the event loop.
+    """
+
+    def __init__(self, embedder: Callable[[], Embedder] = get_embedder, max_indexes: int = GRIPSBOX_INDEX_CACHE_SIZE):
+        self.embedder = embedder
+        self.indexes: LRUCache = LRUCache(maxsize=max_indexes)
+        self.lock = threading.Lock()
+
+    def get_index(self, folder: str) -> GripsboxIndex:
+        with self.lock:
+            index = self.indexes.get(folder)
+            if index is None:
+                index = GripsboxIndex(folder, self.embed)
+                self.indexes[folder] = index
+            return index
+
+    def available(self) -> bool:
+        """False while the embedding model failed to load, retrieval falls back to the full files until then."""
+        return not isinstance(self.embedder, EmbedderLoader) or self.embedder.available()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        # The model is only loaded when something has to be embedded, not for deletes
+        return self.embedder()(texts)
+
+    async def add_document(self, folder: str, gripsbox_id: str, name: str, text: str) -> int:
+        return await asyncio.to_thread(lambda: self.get_index(folder).add_document(gripsbox_id, name, text))
+
+    async def remove_document(self, folder: str, gripsbox_id: str) -> None:
+        await asyncio.to_thread(lambda: self.get_index(folder).remove_document(gripsbox_id))
+
+    async def indexed_documents(self, folder: str) -> set:
+        return await asyncio.to_thread(lambda: self.get_index(folder).documents())
+
+    async def search(self, folder: str, query: str, k: int, allowed: Iterable[str]) -> List[RetrievedChunk]:
+        allowed = list(allowed)
+        return await asyncio.to_thread(lambda: self.get_index(folder).search(query, k, allowed))
+
+    def forget(self, folder: str) -> None:
+        """Drop the in-memory index of a folder, e.g. after the folder was deleted."""
+        with self.lock:
+            self.indexes.pop(folder, None)
@@ -1,23 +1,45 @@
 import os
+import json
+import asyncio
 import logging
-from fastapi import HTTPException, UploadFile
+from fastapi import BackgroundTasks, HTTPException, UploadFile
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from server.app.models.gripsbox.gripsbox_model import Gripsbox
 from server.app.models.gripsbox.gripsbox_post_request import GripsboxPostRequestModel
 from server.app.config.settings import Settings
 from server.app.models.users.user import User
 from datetime import datetime
-from typing import List
-from server.app.db.get_db import get_db
+from typing import Dict, List, Optional
+from server.app.db.get_db import use_session
 from server.app.models.generation.success_generation_model import Message  # Ensure this is correctly imported
 
 from server.app.utils.pdf_utils import extract_text_from_pdf, extract_images_from_pdf  # Import PDF utility functions
+from server.app.utils.file_content_cache import FileContentCache
+from server.app.services.gripsbox_index_service import GripsboxIndexService
+from server.app.utils.extractive_summary import build_digest
+from server.app.utils.simhash import ParagraphDeduplicator, fingerprint_paragraphs
 
 settings = Settings()
 logger = logging.getLogger(__name__)
 
 ALLOWED_FILE_EXTENSIONS = settings.get("default").get("ALLOWED_FILE_EXTENSIONS")
 
+# Inhalte aktiver Dateien bleiben zwischen den Chat-Turns im Speicher (LRU, begrenzt auf dieses Budget)
+GRIPSBOX_CACHE_MAX_BYTES = settings.get_int("default.APP_GRIPSBOX_CACHE_MAX_BYTES")
+gripsbox_content_cache = FileContentCache(GRIPSBOX_CACHE_MAX_BYTES)
+
+# Statt aller aktiven Dateien werden nur die zum Prompt passenden Abschnitte in den Kontext gelegt
+GRIPSBOX_RETRIEVAL = settings.get_bool("default.APP_GRIPSBOX_RETRIEVAL")
+GRIPSBOX_TOP_K = settings.get_int("default.APP_GRIPSBOX_TOP_K")
+gripsbox_index_service = GripsboxIndexService()
+
+# Laufende Indexierungen im Hintergrund, nach Gripsbox-ID (eine Datei wird nur einmal gleichzeitig indexiert)
+gripsbox_indexing: Dict[str, asyncio.Task] = {}
+
+# Absätze, die schon aus einer anderen aktiven Datei im Kontext stehen (z.B. zweite Version eines Dokuments), entfallen
+GRIPSBOX_DEDUPLICATION = settings.get_bool("default.APP_GRIPSBOX_DEDUPLICATION")
+
 
 def get_users_gripsbox_folder(user_uuid: str) -> str:
     """Get the folder path for the user's gripsbox files."""
@@ -25,6 +47,153 @@ def get_users_gripsbox_folder(user_uuid: str) -> str:
     return os.path.join(storage_path, "gripsbox", user_uuid)
 
 
+def get_gripsbox_text_path(user_gripsbox_path: str, name: str) -> str:
+    """Path of the text that is passed to the LLM: the extracted text for PDFs, the file itself otherwise."""
+    if name.lower().endswith('.pdf'):
+        return os.path.join(user_gripsbox_path, f"{os.path.splitext(name)[0]}_extracted.txt")
+    return os.path.join(user_gripsbox_path, name)
+
+
+def get_gripsbox_digest_path(user_gripsbox_path: str, name: str) -> str:
+    """Path of the precomputed digest (outline and summary) of a gripsbox file."""
+    return os.path.join(user_gripsbox_path, f"{os.path.splitext(name)[0]}_digest.txt")
+
+
+def get_gripsbox_fingerprints_path(user_gripsbox_path: str, name: str) -> str:
+    """Path of the paragraph fingerprints (SimHash) of a gripsbox file."""
+    return os.path.join(user_gripsbox_path, f"{os.path.splitext(name)[0]}_fingerprints.json")
+
+
+def invalidate_gripsbox_content(user_uuid: str, name: str) -> None:
+    """Drop the cached content of a gripsbox file (file, extracted PDF text, digest and fingerprints)."""
+    user_gripsbox_path = get_users_gripsbox_folder(user_uuid)
+    gripsbox_content_cache.invalidate(os.path.join(user_gripsbox_path, name))
+    gripsbox_content_cache.invalidate(get_gripsbox_text_path(user_gripsbox_path, name))
+    gripsbox_content_cache.invalidate(get_gripsbox_digest_path(user_gripsbox_path, name))
+    gripsbox_content_cache.invalidate(get_gripsbox_fingerprints_path(user_gripsbox_path, name))
+
+
+def _write_text(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text)
+
+
+async def create_gripsbox_digest(user_uuid: str, name: str, text_path: str) -> Optional[str]:
+    """
+    Precompute the digest of a gripsbox file (outline and extractive summary) and store it next to
+    the file. Runs as a background task after the upload, failures are only logged.
+    """
+    digest_path = get_gripsbox_digest_path(get_users_gripsbox_folder(user_uuid), name)
+    try:
+        text = await gripsbox_content_cache.read(text_path)
+        digest = await asyncio.to_thread(build_digest, text)
+        await asyncio.to_thread(_write_text, digest_path, digest)
+        gripsbox_content_cache.invalidate(digest_path)
+        logger.info(f"Created digest for gripsbox file {name}: {len(text)} -> {len(digest)} characters")
+        return digest
+    except Exception as e:
+        logger.error(f"Could not create digest for gripsbox file {name}: {str(e)}")
+        return None
+
+
+async def load_gripsbox_digest(user_uuid: str, gripsbox_entry: Gripsbox) -> Optional[str]:
+    """
+    Digest of a gripsbox file in summary mode. Files uploaded before digests existed (or whose
+    background step has not finished yet) get their digest now.
+    """
+    user_gripsbox_path = get_users_gripsbox_folder(user_uuid)
+    try:
+        return await gripsbox_content_cache.read(get_gripsbox_digest_path(user_gripsbox_path, gripsbox_entry.name))
+    except FileNotFoundError:
+        return await create_gripsbox_digest(user_uuid, gripsbox_entry.name,
+                                            get_gripsbox_text_path(user_gripsbox_path, gripsbox_entry.name))
+
+
+async def create_gripsbox_fingerprints(user_uuid: str, name: str, text_path: str) -> Optional[List[int]]:
+    """
+    Fingerprint every paragraph of a gripsbox file and store the fingerprints next to the file.
+    Runs as a background task after the upload, failures are only logged.
+    """
+    fingerprints_path = get_gripsbox_fingerprints_path(get_users_gripsbox_folder(user_uuid), name)
+    try:
+        text = await gripsbox_content_cache.read(text_path)
+        fingerprints = await asyncio.to_thread(fingerprint_paragraphs, text)
+        await asyncio.to_thread(_write_text, fingerprints_path,
+                                json.dumps({"fingerprints": [f"{fingerprint:016x}" for fingerprint in fingerprints]}))
+        gripsbox_content_cache.invalidate(fingerprints_path)
+        logger.debug(f"Fingerprinted {len(fingerprints)} paragraphs of gripsbox file {name}")
+        return fingerprints
+    except Exception as e:
+        logger.error(f"Could not fingerprint gripsbox file {name}: {str(e)}")
+        return None
+
+
+async def load_gripsbox_fingerprints(user_uuid: str, name: str) -> Optional[List[int]]:
+    """Stored paragraph fingerprints of a gripsbox file, computed now for files uploaded before fingerprints existed."""
+    user_gripsbox_path = get_users_gripsbox_folder(user_uuid)
+    try:
+        stored = json.loads(await gripsbox_content_cache.read(get_gripsbox_fingerprints_path(user_gripsbox_path, name)))
+        return [int(fingerprint, 16) for fingerprint in stored["fingerprints"]]
+    except FileNotFoundError:
+        return await create_gripsbox_fingerprints(user_uuid, name, get_gripsbox_text_path(user_gripsbox_path, name))
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Invalid fingerprints for gripsbox file {name}, computing them again: {str(e)}")
+        return None
+
+
+def log_deduplication(user_uuid: str, deduplicator: Optional[ParagraphDeduplicator]) -> None:
+    """Tokens saved in this request by dropping paragraphs that several active files share."""
+    if deduplicator is not None and deduplicator.removed_paragraphs:
+        logger.info(f"Gripsbox deduplication for user {user_uuid}: removed {deduplicator.removed_paragraphs} "
+                    f"duplicate paragraphs (~{deduplicator.removed_tokens} tokens) from "
+                    f"{', '.join(sorted(deduplicator.documents))}")
+
+
+async def remove_gripsbox_from_index(user_uuid: str, gripsbox_id: str) -> None:
+    """Remove the chunks of a deleted gripsbox file from the user's vector index."""
+    try:
+        await gripsbox_index_service.remove_document(get_users_gripsbox_folder(user_uuid), gripsbox_id)
+    except Exception as e:
+        logger.error(f"Could not remove gripsbox {gripsbox_id} from the index: {str(e)}")
+
+
+async def index_gripsbox_file(user_uuid: str, gripsbox_id: str, name: str, text_path: str) -> None:
+    """
+    Chunk and embed a gripsbox file into the user's vector index. Failures are only logged,
+    files missing in the index are indexed again on the next generation.
+    """
+    if not gripsbox_index_service.available():
+        logger.debug(f"Embedding model unavailable, gripsbox file {name} is indexed later")
+        return
+    try:
+        text = await gripsbox_content_cache.read(text_path)
+        await gripsbox_index_service.add_document(get_users_gripsbox_folder(user_uuid), gripsbox_id, name, text)
+    except Exception as e:
+        logger.error(f"Could not index gripsbox file {name}: {str(e)}")
+
+
+def schedule_gripsbox_indexing(user_uuid: str, gripsbox_id: str, name: str, text_path: str) -> asyncio.Task:
+    """
+    Index a gripsbox file in the background, unless it is already being indexed. The caller does not
+    have to wait for it.
+    """
+    task = gripsbox_indexing.get(gripsbox_id)
+    if task is None:
+        task = asyncio.create_task(index_gripsbox_file(user_uuid, gripsbox_id, name, text_path))
+        gripsbox_indexing[gripsbox_id] = task
+        task.add_done_callback(lambda done: gripsbox_indexing.pop(gripsbox_id, None))
+    return task
+
+
+async def index_gripsbox_file_in_background(user_uuid: str, gripsbox_id: str, name: str, text_path: str) -> None:
+    """Background task of the upload, shares the indexing with generations that find the file missing."""
+    await asyncio.shield(schedule_gripsbox_indexing(user_uuid, gripsbox_id, name, text_path))
+
+
+class GripsboxIndexPending(Exception):
+    """Active files are still being indexed, retrieval would leave them out."""
+
+
 async def delete_user_gripsbox_folder(user_uuid):
     """Delete the user's gripsbox folder using the helper function."""
     gripsbox_folder = get_users_gripsbox_folder(user_uuid)
@@ -35,6 +204,7 @@ async def delete_user_gripsbox_folder(user_uuid):
             if os.path.isfile(file_path):
                 os.remove(file_path)
         os.rmdir(gripsbox_folder)
+    gripsbox_index_service.forget(gripsbox_folder)
 
 
 async def handle_pdf(file_path: str, user_gripsbox_path: str, file_name: str) -> tuple:
@@ -59,7 +229,9 @@ async def handle_pdf(file_path: str, user_gripsbox_path: str, file_name: str) ->
 async def create_gripsbox_service(
         file: UploadFile,
         gripsbox_post_data: GripsboxPostRequestModel,
-        user: User
+        user: User,
+        background_tasks: Optional[BackgroundTasks] = None,
+        db: Optional[AsyncSession] = None
 ) -> Gripsbox:
     # Validate file extension
     file_extension = os.path.splitext(file.filename)[1].lower()
@@ -83,6 +255,7 @@ async def create_gripsbox_service(
     # Save the file to the path
     with open(file_path, "wb") as f:
         f.write(await file.read())
+    gripsbox_content_cache.invalidate(file_path)
 
     # **Neue Überprüfung: Existiert die Datei?**
     if not os.path.exists(file_path):
@@ -102,9 +275,10 @@ async def create_gripsbox_service(
     if file_extension == ".pdf":
         file_name = os.path.splitext(file.filename)[0]
         extracted_text_filename, image_filenames = await handle_pdf(file_path, user_gripsbox_path, file_name)
+        gripsbox_content_cache.invalidate(extracted_text_filename)
 
     # Speichere die Gripsbox in der Datenbank
-    async for db in get_db():
+    async with use_session(db) as db:
         try:
             new_gripsbox = Gripsbox(
                 user=user.uuid,
@@ -120,18 +294,32 @@ async def create_gripsbox_service(
             await db.commit()
             await db.refresh(new_gripsbox)
 
-            return new_gripsbox
-
         except Exception as e:
             await db.rollback()
             logger.error(f"Error creating gripsbox: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to create Gripsbox")
 
-async def load_gripsbox_by_id(gripsbox_id: str) -> List[str]:
+    # Embeddings entstehen nach der Antwort im Hintergrund, bis dahin wird die ganze Datei gesendet
+    if background_tasks is not None:
+        background_tasks.add_task(index_gripsbox_file_in_background, str(user.uuid), str(new_gripsbox.id),
+                                  new_gripsbox.name, extracted_text_filename or file_path)
+    else:
+        await index_gripsbox_file(str(user.uuid), str(new_gripsbox.id), new_gripsbox.name,
+                                  extracted_text_filename or file_path)
+
+    # Zusammenfassung (Summary-Modus) und Absatz-Fingerprints entstehen nach der Antwort im Hintergrund
+    for task in (create_gripsbox_digest, create_gripsbox_fingerprints):
+        if background_tasks is not None:
+            background_tasks.add_task(task, str(user.uuid), new_gripsbox.name, extracted_text_filename or file_path)
+        else:
+            await task(str(user.uuid), new_gripsbox.name, extracted_text_filename or file_path)
+    return new_gripsbox
+
+async def load_gripsbox_by_id(gripsbox_id: str, db: Optional[AsyncSession] = None) -> List[str]:
     """
     Load the contents of a single Gripsbox by ID.
     """
-    async for db in get_db():
+    async with use_session(db) as db:
         # Suche nach der Gripsbox anhand der ID
         result = await db.execute(
             select(Gripsbox).where(Gripsbox.id == gripsbox_id, Gripsbox.active == True)
@@ -154,41 +342,26 @@ async def _load_gripsbox_files(gripsbox_entries, user_gripsbox_path: str) -> Lis
     """
     file_contents = []
     for gripsbox_entry in gripsbox_entries:
-        file_path = os.path.join(user_gripsbox_path, gripsbox_entry.name)
+        text_path = get_gripsbox_text_path(user_gripsbox_path, gripsbox_entry.name)
 
         # PDF: Extrahierte Texte laden
         if gripsbox_entry.name.lower().endswith('.pdf'):
-            extracted_text_filename = os.path.join(
-                user_gripsbox_path,
-                f"{os.path.splitext(gripsbox_entry.name)[0]}_extracted.txt"
-            )
-            if os.path.exists(extracted_text_filename):
-                try:
-                    with open(extracted_text_filename, "r", encoding="utf-8", errors="ignore") as text_file:
-                        extracted_text = text_file.read()
-                    file_contents.append(f"File: {gripsbox_entry.name} (type: PDF)\n{extracted_text}")
-                except UnicodeDecodeError as e:
-                    logger.error(f"Error reading extracted text for {gripsbox_entry.name}: {str(e)}")
-                    raise HTTPException(status_code=500, detail="Fehler beim Laden des PDFs.")
-            else:
+            try:
+                extracted_text = await gripsbox_content_cache.read(text_path)
+                file_contents.append(f"File: {gripsbox_entry.name} (type: PDF)\n{extracted_text}")
+            except FileNotFoundError:
                 logger.warning(f"Extracted text file for {gripsbox_entry.name} nicht gefunden.")
         else:
             # Normale Datei laden
-            if os.path.exists(file_path) and os.path.isfile(file_path):
-                try:
-                    with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
-                        content = file.read()
-                    file_contents.append(content)
-                except UnicodeDecodeError as e:
-                    logger.error(f"Error reading file {gripsbox_entry.name}: {str(e)}")
-                    raise HTTPException(status_code=500, detail=f"Fehler beim Laden der Datei {gripsbox_entry.name}.")
-            else:
+            try:
+                file_contents.append(await gripsbox_content_cache.read(text_path))
+            except (FileNotFoundError, IsADirectoryError):
                 logger.error(f"File {gripsbox_entry.name} nicht gefunden.")
                 raise HTTPException(status_code=404, detail=f"File {gripsbox_entry.name} nicht gefunden.")
     return file_contents
 
 
-async def load_active_gripsbox_files(user_uuid: str) -> List[str]:
+async def load_active_gripsbox_files(user_uuid: str, db: Optional[AsyncSession] = None) -> List[str]:
     """
     Load the contents of all active files in the user's Gripsbox, and load extracted text for PDFs.
     Includes the file name and type directly in the content.
@@ -200,8 +373,8 @@ async def load_active_gripsbox_files(user_uuid: str) -> List[str]:
         logger.error(f"Gripsbox folder {user_gripsbox_path} for user {user_uuid} does not exist.")
         raise HTTPException(status_code=404, detail="Gripsbox folder not found.")
 
-    # Manually use get_db() for the session
-    async for db in get_db():
+    # The request's session, or an own one outside of a request
+    async with use_session(db) as db:
         result = await db.execute(
             select(Gripsbox).where(Gripsbox.user == user_uuid, Gripsbox.active == True)
         )
@@ -211,59 +384,143 @@ async def load_active_gripsbox_files(user_uuid: str) -> List[str]:
             logger.warning(f"No active Gripsbox files found for user {user_uuid}.")
             raise HTTPException(status_code=404, detail=f"No active Gripsbox files found for user {user_uuid}")
 
-        # Load content from all active files
+        # Load content from all active files. Unchanged files come from the content cache without disk reads.
         file_contents = []
+        deduplicator = ParagraphDeduplicator() if GRIPSBOX_DEDUPLICATION else None
         for gripsbox_entry in active_gripsboxes:
-            file_path = os.path.join(user_gripsbox_path, gripsbox_entry.name)
+            text_path = get_gripsbox_text_path(user_gripsbox_path, gripsbox_entry.name)
+
+            # Files in summary mode contribute their digest instead of the full text
+            if gripsbox_entry.summary_mode:
+                digest = await load_gripsbox_digest(user_uuid, gripsbox_entry)
+                if digest is not None:
+                    if deduplicator is not None:
+                        digest = deduplicator.deduplicate(gripsbox_entry.name, digest)
+                    if digest:
+                        file_contents.append(f"File: {gripsbox_entry.name} (type: {gripsbox_entry.type}, summary)\n{digest}")
+                    continue
 
             # If the file is a PDF, load the extracted text instead of the original file
             if gripsbox_entry.name.lower().endswith('.pdf'):
-                # Check for the existence of the extracted text file
-                extracted_text_filename = os.path.join(user_gripsbox_path, f"{os.path.splitext(gripsbox_entry.name)[0]}_extracted.txt")
-                if os.path.exists(extracted_text_filename):
-                    try:
-                        with open(extracted_text_filename, "r", encoding="utf-8", errors="ignore") as text_file:
-                            extracted_text = text_file.read()
-                        # Append content with file name and type
-                        file_contents.append(
-                            f"File: {gripsbox_entry.name} (type: PDF)\n{extracted_text}"
-                        )
-                        logger.info(f"Loaded extracted text for PDF: {gripsbox_entry.name}")
-                    except UnicodeDecodeError as e:
-                        logger.error(f"Error reading extracted text for PDF {gripsbox_entry.name}: {str(e)}")
-                        raise HTTPException(status_code=500, detail=f"Error reading extracted text for PDF {gripsbox_entry.name}.")
-                else:
+                try:
+                    content = await gripsbox_content_cache.read(text_path)
+                except FileNotFoundError:
                     logger.warning(f"Extracted text file not found for PDF: {gripsbox_entry.name}")
+                    continue
+                file_type = "PDF"
             else:
                 # For non-PDF files, load the content directly
-                if os.path.exists(file_path) and os.path.isfile(file_path):
-                    try:
-                        with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
-                            content = file.read()
-                        # Append content with file name and type
-                        file_contents.append(
-                            f"File: {gripsbox_entry.name} (type: {gripsbox_entry.type})\n{content}"
-                        )
-                    except UnicodeDecodeError as e:
-                        logger.error(f"Error reading file {gripsbox_entry.name}: {str(e)}")
-                        raise HTTPException(status_code=500, detail=f"Error reading file {gripsbox_entry.name}.")
-                else:
+                try:
+                    content = await gripsbox_content_cache.read(text_path)
+                except (FileNotFoundError, IsADirectoryError):
                     logger.error(f"File {gripsbox_entry.name} not found for user {user_uuid}.")
                     raise HTTPException(status_code=404, detail=f"File {gripsbox_entry.name} not found.")
+                file_type = gripsbox_entry.type
+
+            # Paragraphs already contained in an earlier active file are left out
+            if deduplicator is not None:
+                fingerprints = await load_gripsbox_fingerprints(user_uuid, gripsbox_entry.name)
+                content = deduplicator.deduplicate(gripsbox_entry.name, content, fingerprints)
+                if not content:
+                    continue
+
+            # Append content with file name and type
+            file_contents.append(f"File: {gripsbox_entry.name} (type: {file_type})\n{content}")
 
+        log_deduplication(user_uuid, deduplicator)
         return file_contents
 
 
 
 
 
-async def add_gripsbox_content_to_llm_context(user: User) -> List[Message]:
-    """Load the active Gripsbox file contents and add them to the LLM context."""
+async def load_relevant_gripsbox_chunks(user_uuid: str, prompt: str, k: int = GRIPSBOX_TOP_K,
+                                        db: Optional[AsyncSession] = None) -> List[str]:
+    """
+    Load the `k` chunks of the user's active Gripsbox files that are most similar to the prompt.
+    Files in summary mode contribute their digest instead of chunks.
+
+    Active files that are not in the vector index yet (just uploaded, or uploaded before indexing) are
+    indexed in the background and GripsboxIndexPending is raised: the request gets the full files
+    until the index is complete.
+    """
+    user_gripsbox_path = get_users_gripsbox_folder(user_uuid)
+
+    async with use_session(db) as db:
+        result = await db.execute(
+            select(Gripsbox).where(Gripsbox.user == user_uuid, Gripsbox.active == True)
+        )
+        active_gripsboxes = result.scalars().all()
+
+    if not active_gripsboxes:
+        logger.warning(f"No active Gripsbox files found for user {user_uuid}.")
+        raise HTTPException(status_code=404, detail=f"No active Gripsbox files found for user {user_uuid}")
+
+    # Files in summary mode always contribute their digest, retrieval covers the others
+    file_contents = []
+    retrieved_entries = []
+    deduplicator = ParagraphDeduplicator() if GRIPSBOX_DEDUPLICATION else None
+    for gripsbox_entry in active_gripsboxes:
+        digest = await load_gripsbox_digest(user_uuid, gripsbox_entry) if gripsbox_entry.summary_mode else None
+        if digest is None:
+            retrieved_entries.append(gripsbox_entry)
+            continue
+        if deduplicator is not None:
+            digest = deduplicator.deduplicate(gripsbox_entry.name, digest)
+        if digest:
+            file_contents.append(f"File: {gripsbox_entry.name} (type: {gripsbox_entry.type}, summary)\n{digest}")
+
+    if not retrieved_entries:
+        log_deduplication(user_uuid, deduplicator)
+        return file_contents
+
+    active_ids = [str(gripsbox_entry.id) for gripsbox_entry in retrieved_entries]
+    indexed = await gripsbox_index_service.indexed_documents(user_gripsbox_path)
+    missing = [gripsbox_entry for gripsbox_entry in retrieved_entries if str(gripsbox_entry.id) not in indexed]
+    if missing:
+        for gripsbox_entry in missing:
+            schedule_gripsbox_indexing(user_uuid, str(gripsbox_entry.id), gripsbox_entry.name,
+                                       get_gripsbox_text_path(user_gripsbox_path, gripsbox_entry.name))
+        raise GripsboxIndexPending(f"Indexing {', '.join(entry.name for entry in missing)}")
+
+    chunks = await gripsbox_index_service.search(user_gripsbox_path, prompt, k, active_ids)
+    # Abschnitte in Dokumentreihenfolge, damit benachbarte Abschnitte zusammenhängend lesbar bleiben
+    chunks.sort(key=lambda chunk: (chunk.name, chunk.index))
+    logger.debug(f"Retrieved {len(chunks)} Gripsbox chunks for user {user_uuid}")
+
+    # Mehrere Versionen eines Dokuments liefern sonst denselben Abschnitt mehrfach
+    for chunk in chunks:
+        text = deduplicator.deduplicate(chunk.name, chunk.text) if deduplicator is not None else chunk.text
+        if text:
+            file_contents.append(f"File: {chunk.name} (part {chunk.index + 1}/{chunk.count})\n{text}")
+
+    log_deduplication(user_uuid, deduplicator)
+    return file_contents
+
+
+async def add_gripsbox_content_to_llm_context(user: User, prompt: Optional[str] = None,
+                                              db: Optional[AsyncSession] = None) -> List[Message]:
+    """
+    Load the active Gripsbox file contents and add them to the LLM context.
+    With a prompt only the relevant chunks are added, otherwise (or if retrieval fails) the whole files.
+    """
     try:
         logger.debug(f"Loading active Gripsbox files for user {user.uuid}.")
 
-        # Load the content of active Gripsbox files
-        active_files_content = await load_active_gripsbox_files(user_uuid=str(user.uuid))
+        active_files_content = None
+        if prompt and GRIPSBOX_RETRIEVAL and gripsbox_index_service.available():
+            try:
+                active_files_content = await load_relevant_gripsbox_chunks(str(user.uuid), prompt, db=db)
+            except HTTPException:
+                raise
+            except GripsboxIndexPending as e:
+                logger.info(f"Gripsbox index incomplete, sending full files: {str(e)}")
+            except Exception as e:
+                logger.warning(f"Gripsbox retrieval failed, falling back to full files: {str(e)}")
+
+        if active_files_content is None:
+            # Load the content of active Gripsbox files
+            active_files_content = await load_active_gripsbox_files(user_uuid=str(user.uuid), db=db)
 
         # Create LLM context messages for each file
         llm_context = [
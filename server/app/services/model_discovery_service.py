@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List
+
+from diskcache import FanoutCache
+
+from server.app.clients.client_registry import ClientRegistry
+from server.app.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+# After MODELS_TTL the list is refreshed in the background, the last good list is served meanwhile.
+# Lists older than MODELS_MAX_STALE are dropped and fetched again before answering.
+MODELS_TTL = settings.get_int("default.APP_MODELS_TTL")
+MODELS_MAX_STALE = settings.get_int("default.APP_MODELS_MAX_STALE")
+
+# APP_ACTIVE_PROVIDER names -> ClientRegistry providers
+PROVIDERS = {
+    "OPEN_AI": "openai",
+    "ANTHROPIC": "anthropic",
+    "GOOGLE_AI": "google_ai",
+    "CEREBRAS": "cerebras",
+}
+
+
+class ModelDiscoveryService:
+    """
+    Lists the available models of the active providers.
+
+    The providers are asked concurrently, each in a worker thread because the SDK calls are synchronous.
+    Every provider is cached on its own, so a slow or failing provider never delays or breaks the others.
+    """
+
+    def __init__(self, cache: FanoutCache, clients: ClientRegistry, ttl: int = MODELS_TTL,
+                 max_stale: int = MODELS_MAX_STALE):
+        self.cache = cache
+        self.clients = clients
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.refreshing: Dict[str, asyncio.Task] = {}
+
+    async def get_models(self, active_providers: List[str]) -> list:
+        providers = [PROVIDERS[name] for name in active_providers if name in PROVIDERS]
+        results = await asyncio.gather(*(self.get_provider_models(provider) for provider in providers))
+        return [model for models in results for model in models]
+
+    async def get_provider_models(self, provider: str) -> list:
+        entry = self.cache.get(self.cache_key(provider))
+        if entry is not None:
+            if time.time() - entry["fetched"] > self.ttl:
+                # Stale-while-revalidate: answer with the last good list, refresh in the background
+                self.refresh(provider)
+            return entry["models"]
+
+        try:
+            # shield: a cancelled request must not cancel the refresh other requests are waiting for
+            return await asyncio.shield(self.refresh(provider))
+        except Exception:
+            # Already logged by finish_refresh, the other providers are listed anyway
+            return []
+
+    def refresh(self, provider: str) -> asyncio.Task:
+        """
+        Start fetching the models of a provider, unless a refresh for it is already running.
+        """
+        task = self.refreshing.get(provider)
+        if task is None:
+            task = asyncio.create_task(self.fetch(provider))
+            self.refreshing[provider] = task
+            task.add_done_callback(lambda done: self.finish_refresh(provider, done))
+        return task
+
+    def finish_refresh(self, provider: str, task: asyncio.Task) -> None:
+        self.refreshing.pop(provider, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error retrieving models from {provider}: {str(task.exception())}")
+
+    async def fetch(self, provider: str) -> list:
+        client = self.clients.get(provider)
+        # Clients with an async SDK list their models on the event loop, the others in a thread
+        if asyncio.iscoroutinefunction(client.get_available_models):
+            models = await client.get_available_models()
+        else:
+            models = await asyncio.to_thread(client.get_available_models)
+        self.cache.set(self.cache_key(provider), {"models": models, "fetched": time.time()}, expire=self.max_stale)
+        logger.debug(f"Fetched {len(models)} models from {provider}")
+        return models
+
+    @staticmethod
+    def cache_key(provider: str) -> str:
+        return f"models_list:{provider}"
+
+    async def close(self) -> None:
+        for task in list(self.refreshing.values()):
+            task.cancel()
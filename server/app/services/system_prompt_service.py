@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import Optional
+
+from diskcache import FanoutCache
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from server.app.models.model_parameter.models_parameter import ModelParameter
+from server.app.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+SYSTEM_PROMPT_TTL = settings.get_int("default.APP_SYSTEM_PROMPT_TTL")
+
+
+class SystemPromptService:
+    """
+    Per-user cache of the active 'systemprompt' model parameter.
+
+    Users without a system prompt are cached as well ({"prompt": None}), so a generation request
+    never queries the ModelParameter table once the entry exists. The models_parameter router
+    invalidates the entry whenever a parameter of the user changes.
+
+    diskcache reads and writes are file and SQLite I/O, they run in a worker thread.
+    """
+
+    def __init__(self, cache: FanoutCache, ttl: int = SYSTEM_PROMPT_TTL):
+        self.cache = cache
+        self.ttl = ttl
+
+    @staticmethod
+    def cache_key(user_uuid: str) -> str:
+        return f"system_prompt:{user_uuid}"
+
+    @staticmethod
+    def version_key(user_uuid: str) -> str:
+        return f"system_prompt_version:{user_uuid}"
+
+    async def get(self, db: AsyncSession, user_uuid: str) -> Optional[str]:
+        entry = await asyncio.to_thread(self.cache.get, self.cache_key(user_uuid))
+        if entry is not None:
+            return entry["prompt"]
+
+        # Changes during the query bump the version, the (then outdated) prompt is not stored
+        version = await asyncio.to_thread(self.cache.get, self.version_key(user_uuid), 0)
+        try:
+            result = await db.execute(
+                select(ModelParameter.value)
+                .filter_by(user=user_uuid, parameter="systemprompt", active=True)
+            )
+            prompt = result.scalar()
+        except Exception as e:
+            # Not cached, the next request tries again
+            logger.error(f"Error fetching system prompt for user {user_uuid}: {str(e)}")
+            return None
+
+        await asyncio.to_thread(self._store, user_uuid, version, prompt)
+        return prompt
+
+    def _store(self, user_uuid: str, version: int, prompt: Optional[str]) -> None:
+        with self.cache.transact():
+            if self.cache.get(self.version_key(user_uuid), 0) == version:
+                self.cache.set(self.cache_key(user_uuid), {"prompt": prompt}, expire=self.ttl)
+
+    async def invalidate(self, user_uuid: str) -> None:
+        await asyncio.to_thread(self._invalidate, user_uuid)
+
+    def _invalidate(self, user_uuid: str) -> None:
+        with self.cache.transact():
+            self.cache.incr(self.version_key(user_uuid))
+            self.cache.delete(self.cache_key(user_uuid))
+        logger.debug(f"Invalidated system prompt of user {user_uuid}")
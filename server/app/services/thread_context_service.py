@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from diskcache import FanoutCache
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.app.utils.user_context_util import format_context_turn, load_user_context_turns
+from server.app.config.settings import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+THREAD_CONTEXT_TTL = settings.get_int("default.APP_THREAD_CONTEXT_TTL")
+
+
+class ThreadContextService:
+    """
+    Materialized conversation context per user and thread.
+
+    The context string of a thread is kept in the FanoutCache together with its turns
+    ({context uuid: turn text}). Saving a turn updates the entry in place, so reading the context
+    for a generation request is a single cache lookup instead of rebuilding it from all rows.
+    On a cache miss the entry is built once from the database.
+
+    diskcache reads and writes are file and SQLite I/O, they run in a worker thread.
+    """
+
+    def __init__(self, cache: FanoutCache, ttl: int = THREAD_CONTEXT_TTL):
+        self.cache = cache
+        self.ttl = ttl
+
+    @staticmethod
+    def cache_key(user_uuid: str, thread_id: int) -> str:
+        return f"thread_context:{user_uuid}:{thread_id}"
+
+    @staticmethod
+    def version_key(user_uuid: str, thread_id: int) -> str:
+        return f"thread_context_version:{user_uuid}:{thread_id}"
+
+    @staticmethod
+    def build_entry(turns: Dict[str, str]) -> dict:
+        return {"turns": turns, "context": " ".join(text for text in turns.values() if text)}
+
+    async def get(self, db: AsyncSession, user_uuid: str, thread_id: int) -> str:
+        return (await self.get_entry(db, user_uuid, thread_id))["context"]
+
+    async def get_turns(self, db: AsyncSession, user_uuid: str, thread_id: int) -> List[str]:
+        """
+        The non-empty turns of the thread in order, joined with a space they are the context string.
+        """
+        entry = await self.get_entry(db, user_uuid, thread_id)
+        return [text for text in entry["turns"].values() if text]
+
+    async def get_entry(self, db: AsyncSession, user_uuid: str, thread_id: int) -> dict:
+        entry = await asyncio.to_thread(self.cache.get, self.cache_key(user_uuid, thread_id))
+        if entry is not None:
+            return entry
+
+        # Writes during the load bump the version, the (then outdated) entry is not stored
+        version = await asyncio.to_thread(self.cache.get, self.version_key(user_uuid, thread_id), 0)
+        entry = self.build_entry(await load_user_context_turns(db, user_uuid, thread_id))
+        await asyncio.to_thread(self._store, user_uuid, thread_id, version, entry)
+
+        logger.debug(f"Materialized context of thread {thread_id} for user {user_uuid}: {len(entry['turns'])} turns")
+        return entry
+
+    def _store(self, user_uuid: str, thread_id: int, version: int, entry: dict) -> None:
+        with self.cache.transact():
+            if self.cache.get(self.version_key(user_uuid, thread_id), 0) == version:
+                self.cache.add(self.cache_key(user_uuid, thread_id), entry, expire=self.ttl)
+
+    async def save_turn(self, user_uuid: str, thread_id: int, context_uuid: str, context_data) -> None:
+        """
+        Add or replace one turn in the materialized context. Call after the turn was committed.
+        """
+        await asyncio.to_thread(self._save_turn, user_uuid, thread_id, context_uuid, context_data)
+
+    def _save_turn(self, user_uuid: str, thread_id: int, context_uuid: str, context_data) -> None:
+        key = self.cache_key(user_uuid, thread_id)
+        text = format_context_turn(context_data)
+        with self.cache.transact():
+            self.cache.incr(self.version_key(user_uuid, thread_id))
+            entry: Optional[dict] = self.cache.get(key)
+            if entry is None:
+                # Not materialized yet, built on the next read
+                return
+
+            turns = entry["turns"]
+            if context_uuid in turns:
+                turns[context_uuid] = text
+                entry = self.build_entry(turns)
+            else:
+                turns[context_uuid] = text
+                if text:
+                    entry["context"] = f"{entry['context']} {text}" if entry["context"] else text
+
+            self.cache.set(key, entry, expire=self.ttl)
+
+    async def invalidate(self, user_uuid: str, thread_id: int) -> None:
+        await asyncio.to_thread(self._invalidate, user_uuid, thread_id)
+
+    def _invalidate(self, user_uuid: str, thread_id: int) -> None:
+        with self.cache.transact():
+            self.cache.incr(self.version_key(user_uuid, thread_id))
+            self.cache.delete(self.cache_key(user_uuid, thread_id))
@@ -1,18 +1,65 @@
+from typing import Optional
+from uuid import UUID
+
+from cachetools import TTLCache
 from server.app.utils.password_generator import generate_password
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from server.app.models.users.user import User
-from server.app.db.get_db import get_db
+from server.app.db.get_db import use_session
 import random
 import string
 import logging
+from server.app.config.settings import Settings
 
 logger = logging.getLogger(__name__)
+settings = Settings()
+
+# Users of browser sessions are kept in memory for a short time: a chat sends many small requests,
+# each would otherwise look the user up again. Updating or deleting a user drops the entry.
+SESSION_USER_CACHE_SIZE = settings.get_int("default.APP_SESSION_USER_CACHE_SIZE")
+SESSION_USER_CACHE_TTL = settings.get_int("default.APP_SESSION_USER_CACHE_TTL")
+
+
+class SessionUserCache:
+    """
+    Users of browser sessions by the user uuid stored in the session, bounded and with a TTL.
+
+    The cached users are detached from their session and must be treated as read only.
+    """
+
+    def __init__(self, maxsize: int = SESSION_USER_CACHE_SIZE, ttl: int = SESSION_USER_CACHE_TTL):
+        self.users = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Counts invalidations: a lookup that started before one must not put its result into the cache
+        self.generation = 0
+
+    def get(self, user_uuid: str) -> Optional[User]:
+        return self.users.get(str(user_uuid))
+
+    def set(self, user_uuid: str, user: User, generation: int) -> None:
+        if generation == self.generation:
+            self.users[str(user_uuid)] = user
+
+    def invalidate(self, user_uuid: UUID) -> None:
+        self.generation += 1
+        self.users.pop(str(user_uuid), None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.users.clear()
+
+
+session_user_cache = SessionUserCache()
+
 
 class UserService:
+    """
+    User lookups. Within a request the request's session is passed as `db`, so no further
+    connection is checked out; without one a session is opened for the call.
+    """
 
-    async def create_user(self, email: str, username: str = None):
-        # Get a session from get_db
-        async for db in get_db():
+    async def create_user(self, email: str, username: str = None, db: Optional[AsyncSession] = None):
+        async with use_session(db) as db:
             random_password = ''.join(random.choices(string.ascii_letters + string.digits, k=16))
             hashed_password = generate_password(random_password)
 
@@ -28,20 +75,19 @@ class UserService:
             logger.info(f"Created new user with email: {email}")
             return new_user
 
-    async def get_by_username(self, username: str) -> User:
-        # Get a session from get_db
-        async for db in get_db():
+    async def get_by_username(self, username: str, db: Optional[AsyncSession] = None) -> User:
+        async with use_session(db) as db:
             result = await db.execute(select(User).filter(User.username == username))
             return result.scalar_one_or_none()
 
-    async def get_all_users(self) -> list[dict]:
+    async def get_all_users(self, db: Optional[AsyncSession] = None) -> list[dict]:
         """
         Retrieve all users from the database.
 
         Returns:
             list[dict]: A list of user dictionaries containing username and email.
         """
-        async for db in get_db():
+        async with use_session(db) as db:
             result = await db.execute(select(User))
             users = result.scalars().all()
             return [{"username": user.username, "email": user.email} for user in users]
\ No newline at end of file
@@ -0,0 +1,75 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import AsyncGenerator, Callable, Iterable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+async def iterate_in_thread(open_stream: Callable[[], Iterable[T]], maxsize: int = 32,
+                            poll_interval: float = 0.1) -> AsyncGenerator[T, None]:
+    """
+    Consume a blocking (synchronous) stream from a dedicated worker thread without blocking the event loop.
+
+    - `open_stream` is called inside the worker thread, so the blocking request itself does not run on the loop.
+    - Items are handed over through a bounded queue: when the consumer is slower than the provider,
+      the worker thread waits (backpressure) instead of buffering the whole answer.
+    - When the consumer goes away (client disconnect, generator closed), the worker stops after the
+      current item and closes the underlying stream.
+
+    Exceptions raised by the stream are re-raised in the consumer.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+    cancelled = threading.Event()
+
+    def put(item) -> bool:
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=poll_interval)
+                return True
+            except concurrent.futures.TimeoutError:
+                if cancelled.is_set():
+                    future.cancel()
+                    return False
+
+    def produce() -> None:
+        stream = None
+        error = None
+        try:
+            stream = open_stream()
+            for item in stream:
+                if cancelled.is_set() or not put((item, None)):
+                    break
+        except BaseException as e:
+            error = e
+        finally:
+            close = getattr(stream, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.debug(f"Error while closing stream: {str(e)}")
+
+        if not cancelled.is_set():
+            put((_DONE, error))
+
+    worker = threading.Thread(target=produce, name="stream-bridge", daemon=True)
+    worker.start()
+
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        cancelled.set()
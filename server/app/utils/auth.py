@@ -17,10 +17,11 @@ async def auth(
     request: Request = None,
     db: AsyncSession = Depends(get_db)
 ):
+    # `db` is the request's session: handlers declaring Depends(get_db) get the same one
 
     if api_key:
         logger.debug(f"Received API key: {api_key[:4]}****")
         return await get_api_user(api_key, db)
     else:
         logger.debug(f"api_key_or_session_auth Check userSession")
-        return await get_user_by_session(request)
+        return await get_user_by_session(request, db)
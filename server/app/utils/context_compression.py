@@ -0,0 +1,166 @@
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from typing import List, Optional
+
+from server.app.utils.extractive_summary import SENTENCE_SPLIT, STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+WORD = re.compile(r"[^\W_]+", re.UNICODE)
+
+# Words that can be dropped from a sentence without changing what it says. Unlike STOPWORDS there are
+# no negations, quantifiers or pronouns in here: "not", "kein", "all" or "sie" change the meaning.
+# German articles are missing on purpose, "der", "die", "das" are relative pronouns as well.
+FILLER_WORDS = {
+    "the", "a", "an", "very", "really", "just", "quite", "basically", "actually", "simply", "rather",
+    "somewhat", "indeed", "certainly", "obviously", "please",
+    "sehr", "eigentlich", "halt", "eben", "wirklich", "ziemlich", "einfach", "quasi", "sozusagen", "natürlich",
+    "bitte",
+}
+
+# Sentences shorter than this keep all their words, they would become unreadable otherwise
+MIN_SENTENCE_WORDS = 4
+
+# Sentences are cut to this many tokens before the language model scores them
+LM_MAX_TOKENS = 64
+LM_BATCH_SIZE = 16
+
+
+class LexicalScorer:
+    """
+    Self-information of a sentence without a model: words that are rare in the text carry more
+    information than words the text repeats anyway. Numbers and names get a bonus, they are
+    usually what the answer depends on.
+    """
+    name = "lexical"
+
+    def score(self, sentences: List[str]) -> List[float]:
+        words = [[word for word in WORD.findall(sentence.lower()) if word not in STOPWORDS]
+                 for sentence in sentences]
+        frequencies = Counter(word for sentence_words in words for word in sentence_words)
+        total = sum(frequencies.values()) or 1
+
+        scores = []
+        for sentence, sentence_words in zip(sentences, words):
+            if not sentence_words:
+                scores.append(0.0)
+                continue
+            information = sum(-math.log(frequencies[word] / total) for word in sentence_words) / len(sentence_words)
+            facts = len(re.findall(r"\d+|\b[A-ZÄÖÜ][a-zäöüß]+\b", sentence))
+            scores.append(information * (1.0 + 0.1 * min(facts, 5)))
+        return scores
+
+
+class LanguageModelScorer:
+    """
+    Surprisal of a sentence under a small causal language model on the CPU (mean negative
+    log-likelihood per token): predictable sentences add little for the answering model.
+
+    The model is loaded on first use. Without transformers/torch or if the model cannot be loaded,
+    the lexical scorer is used instead.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.name = f"lm:{model_name}"
+        self.lock = threading.Lock()
+        self.model = None
+        self.tokenizer = None
+        self.fallback: Optional[LexicalScorer] = None
+
+    def _load(self) -> None:
+        with self.lock:
+            if self.model is not None or self.fallback is not None:
+                return
+            try:
+                from transformers import AutoModelForCausalLM, AutoTokenizer
+
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                if self.tokenizer.pad_token is None:
+                    self.tokenizer.pad_token = self.tokenizer.eos_token
+                self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
+                self.model.eval()
+                logger.info(f"Loaded compression model {self.model_name}")
+            except Exception as e:
+                logger.warning(f"Could not load compression model {self.model_name}, using lexical scoring: {str(e)}")
+                self.fallback = LexicalScorer()
+
+    def score(self, sentences: List[str]) -> List[float]:
+        self._load()
+        if self.fallback is not None:
+            return self.fallback.score(sentences)
+
+        import torch
+
+        scores = []
+        with torch.no_grad():
+            for start in range(0, len(sentences), LM_BATCH_SIZE):
+                batch = self.tokenizer(sentences[start:start + LM_BATCH_SIZE], return_tensors="pt",
+                                       padding=True, truncation=True, max_length=LM_MAX_TOKENS)
+                logits = self.model(**batch).logits[:, :-1]
+                targets = batch["input_ids"][:, 1:]
+                mask = batch["attention_mask"][:, 1:].float()
+                log_probs = torch.log_softmax(logits, dim=-1).gather(-1, targets.unsqueeze(-1)).squeeze(-1)
+                surprisal = -(log_probs * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                scores.extend(surprisal.tolist())
+        return scores
+
+
+def create_scorer(model_name: Optional[str] = None):
+    return LanguageModelScorer(model_name) if model_name else LexicalScorer()
+
+
+def _drop_filler(sentence: str) -> str:
+    words = sentence.split()
+    if len(words) < MIN_SENTENCE_WORDS:
+        return sentence
+    kept = [word for word in words if word.lower().strip(",;:") not in FILLER_WORDS]
+    if len(kept) < MIN_SENTENCE_WORDS:
+        return sentence
+    if kept[0] != words[0] and words[0][:1].isupper():
+        kept[0] = kept[0][:1].upper() + kept[0][1:]
+    return " ".join(kept)
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def compress(text: str, ratio: float, scorer) -> str:
+    """
+    Shorten `text` to about `ratio` of its words.
+
+    1. Filler words are dropped from every sentence.
+    2. If that is not enough, the sentences with the lowest score are dropped until the target is
+       reached. The remaining sentences keep their order and paragraphs.
+    """
+    target = math.ceil(count_words(text) * ratio)
+
+    paragraphs = []
+    for paragraph in PARAGRAPH_SPLIT.split(text):
+        paragraph = " ".join(paragraph.split())
+        if paragraph:
+            paragraphs.append([sentence for sentence in SENTENCE_SPLIT.split(paragraph) if sentence])
+
+    sentences = [(p, s) for p, paragraph in enumerate(paragraphs) for s in range(len(paragraph))]
+    originals = [paragraphs[p][s] for p, s in sentences]
+    shortened = {position: _drop_filler(sentence) for position, sentence in zip(sentences, originals)}
+    words = sum(count_words(sentence) for sentence in shortened.values())
+
+    if words > target:
+        scores = scorer.score(originals)
+        for position, _ in sorted(zip(sentences, scores), key=lambda item: item[1]):
+            if words <= target:
+                break
+            words -= count_words(shortened.pop(position))
+
+    result = []
+    for p, paragraph in enumerate(paragraphs):
+        kept = [shortened[(p, s)] for s in range(len(paragraph)) if (p, s) in shortened]
+        if kept:
+            result.append(" ".join(kept))
+    return "\n\n".join(result)
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from server.app.utils.usage_tracker import get_encoder, CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# Used for models without an entry in the MODEL_CONTEXT_WINDOWS of their client, by the longest matching
+# prefix: new snapshots of a family (e.g. gpt-4o-2024-11-20) have the window of the family
+MODEL_FAMILY_CONTEXT_WINDOWS = {
+    'gpt-4o': 128000,
+    'chatgpt-4o': 128000,
+    'gpt-4-turbo': 128000,
+    'gpt-4-1106': 128000,
+    'gpt-4-0125': 128000,
+    'gpt-4-32k': 32768,
+    'gpt-4': 8192,
+    'gpt-3.5-turbo-instruct': 4096,
+    'gpt-3.5-turbo': 16385,
+    'o1-mini': 128000,
+    'o1-preview': 128000,
+    'o1': 200000,
+    'o3': 200000,
+    'claude-': 200000,
+    'llama3.1-': 8192,
+    'llama-3.3-': 8192,
+}
+
+# Used for models of no known family
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Tokens kept free for the answer when the request sets no max_tokens (at most a quarter of the window)
+RESERVED_OUTPUT_TOKENS = 1024
+
+# Sources larger than this (characters in total) are tokenized in a worker thread, not on the event loop
+THREAD_TOKENIZE_CHARS = 20000
+
+
+@dataclass
+class ContextSource:
+    """
+    One part of the prompt.
+
+    - `required` sources (system prompt, user prompt) are never trimmed.
+    - Every other source gets `share` of the budget left after the required ones. Budget a source does
+      not need goes to the others in order of `priority` (lower first).
+    - `keep` decides which end survives trimming: "tail" for history (latest turns), "head" for documents.
+    """
+    name: str
+    text: str
+    priority: int = 0
+    share: float = 0.0
+    keep: str = "head"
+    required: bool = False
+
+
+@dataclass
+class PromptSegment:
+    name: str
+    text: str
+    # Providers with explicit prompt caching (Anthropic) cache the prompt up to and including this segment
+    cache_breakpoint: bool = False
+
+
+# Segments of the system message from most to least stable. Providers cache the longest unchanged
+# prefix, so anything that changes per request (the clock) has to come last.
+SEGMENT_ORDER = ("system_prompt", "gripsbox", "history", "clock")
+CACHE_BREAKPOINTS = ("gripsbox", "history")
+
+
+@dataclass
+class PackedContext:
+    texts: Dict[str, str]
+    budget: int
+    total_tokens: int
+    source_tokens: Dict[str, int] = field(default_factory=dict)
+    kept_tokens: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def trimmed_tokens(self) -> int:
+        return sum(self.source_tokens.values()) - sum(self.kept_tokens.values())
+
+    def segments(self) -> List[PromptSegment]:
+        """
+        Non-empty segments of the system message in SEGMENT_ORDER: system prompt, gripsbox content,
+        history (grows by appending turns) and finally the current date and time.
+        """
+        segments = []
+        for name in SEGMENT_ORDER:
+            text = self.texts.get(name, "")
+            if not text:
+                continue
+            if name == "gripsbox":
+                text = f"Gripsbox Content:\n{text}"
+            segments.append(PromptSegment(name, text, cache_breakpoint=name in CACHE_BREAKPOINTS))
+        return segments
+
+    def system_message(self) -> str:
+        """
+        System message of a generation request as a single string (automatic prefix caching, e.g. OpenAI).
+        """
+        return "\n\n".join(segment.text for segment in self.segments())
+
+    def system_blocks(self) -> List[dict]:
+        """
+        System message as text blocks with `cache_control` on the cache breakpoints (Anthropic format).
+        """
+        blocks = []
+        for segment in self.segments():
+            block = {"type": "text", "text": segment.text}
+            if segment.cache_breakpoint:
+                block["cache_control"] = {"type": "ephemeral"}
+            blocks.append(block)
+        return blocks
+
+    def metrics(self) -> dict:
+        return {
+            "budget": self.budget,
+            "total_tokens": self.total_tokens,
+            "trimmed_tokens": self.trimmed_tokens,
+            "sources": {name: {"tokens": tokens, "kept": self.kept_tokens[name]}
+                        for name, tokens in self.source_tokens.items()},
+        }
+
+
+class TokenCache:
+    """
+    Tokens of the sources of one request per encoding. The models of a request pack the same sources,
+    models that share an encoding tokenize each source only once.
+    """
+
+    def __init__(self):
+        self._tokens: Dict[tuple, list] = {}
+        self._locks: Dict[tuple, threading.Lock] = {}
+
+    def encode(self, encoder, text: str) -> list:
+        key = (encoder.name if encoder is not None else None, text)
+        tokens = self._tokens.get(key)
+        if tokens is not None:
+            return tokens
+        # Models are packed concurrently (in worker threads), the second one waits for the first
+        with self._locks.setdefault(key, threading.Lock()):
+            tokens = self._tokens.get(key)
+            if tokens is None:
+                tokens = self._tokens[key] = _encode(encoder, text)
+        return tokens
+
+
+def generation_sources(system_prompt: str, history: str, gripsbox: str, prompt: str,
+                       clock: str = "") -> List[ContextSource]:
+    """
+    The sources of a generation request: system prompt, clock and user prompt are always sent, history
+    and gripsbox files share the rest of the window.
+    """
+    return [
+        ContextSource("system_prompt", system_prompt, required=True),
+        ContextSource("clock", clock, required=True),
+        ContextSource("prompt", prompt, required=True),
+        ContextSource("history", history, priority=1, share=0.5, keep="tail"),
+        ContextSource("gripsbox", gripsbox, priority=2, share=0.5, keep="head"),
+    ]
+
+
+def resolve_context_window(model: str, context_window: Optional[int] = None) -> int:
+    """
+    `context_window` if the client knows the model, otherwise the window of the model's family.
+    """
+    if context_window:
+        return context_window
+    family = max((prefix for prefix in MODEL_FAMILY_CONTEXT_WINDOWS if model.startswith(prefix)), key=len, default=None)
+    if family is None:
+        logger.warning(f"Unknown context window for model {model}, using {DEFAULT_CONTEXT_WINDOW} tokens")
+        return DEFAULT_CONTEXT_WINDOW
+    return MODEL_FAMILY_CONTEXT_WINDOWS[family]
+
+
+def pack_context(model: str, sources: List[ContextSource], context_window: Optional[int] = None,
+                 reserved_output_tokens: Optional[int] = None,
+                 token_cache: Optional[TokenCache] = None) -> PackedContext:
+    """
+    Trim the sources so that the prompt fits the context window of the model, counting real tokens
+    with the encoder of the model.
+
+    `reserved_output_tokens` is the max_tokens the request sends (RESERVED_OUTPUT_TOKENS if it sends
+    none). Pass one `token_cache` for all models of a request.
+    """
+    context_window = resolve_context_window(model, context_window)
+    if reserved_output_tokens is None:
+        reserved_output_tokens = RESERVED_OUTPUT_TOKENS
+    budget = context_window - min(reserved_output_tokens, context_window // 4)
+    encoder = get_encoder(model)
+    token_cache = token_cache or TokenCache()
+
+    tokens = {source.name: token_cache.encode(encoder, source.text) for source in sources}
+    counts = {name: len(encoded) for name, encoded in tokens.items()}
+
+    required = sum(counts[source.name] for source in sources if source.required)
+    available = max(budget - required, 0)
+    optional = [source for source in sources if not source.required]
+
+    # 1. Every source gets up to its share of the available budget
+    allotted = {source.name: min(counts[source.name], int(available * source.share)) for source in optional}
+
+    # 2. Unused budget goes to the sources that need more, in order of priority
+    leftover = available - sum(allotted.values())
+    for source in sorted(optional, key=lambda s: s.priority):
+        if leftover <= 0:
+            break
+        extra = min(counts[source.name] - allotted[source.name], leftover)
+        allotted[source.name] += extra
+        leftover -= extra
+
+    texts = {}
+    kept = {}
+    for source in sources:
+        keep = counts[source.name] if source.required else allotted[source.name]
+        kept[source.name] = keep
+        if keep >= counts[source.name]:
+            texts[source.name] = source.text
+        else:
+            texts[source.name] = _trim(encoder, source.text, tokens[source.name], keep, source.keep)
+
+    packed = PackedContext(texts=texts, budget=budget, total_tokens=sum(kept.values()),
+                           source_tokens=counts, kept_tokens=kept)
+    if packed.trimmed_tokens:
+        logger.info(f"Context for {model} trimmed by {packed.trimmed_tokens} tokens: {packed.metrics()}")
+    return packed
+
+
+async def pack_context_async(model: str, sources: List[ContextSource], context_window: Optional[int] = None,
+                             reserved_output_tokens: Optional[int] = None,
+                             token_cache: Optional[TokenCache] = None) -> PackedContext:
+    """
+    pack_context for the event loop: large sources are tokenized in a worker thread.
+    """
+    if sum(len(source.text) for source in sources) < THREAD_TOKENIZE_CHARS:
+        return pack_context(model, sources, context_window, reserved_output_tokens, token_cache)
+    return await asyncio.to_thread(pack_context, model, sources, context_window, reserved_output_tokens,
+                                   token_cache)
+
+
+def _encode(encoder, text: str) -> list:
+    if not text:
+        return []
+    if encoder is None:
+        # Without an encoding every CHARS_PER_TOKEN characters count as one token
+        return [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)]
+    return encoder.encode_ordinary(text)
+
+
+def _trim(encoder, text: str, encoded: list, keep: int, side: str) -> str:
+    if keep <= 0:
+        return ""
+    kept = encoded[-keep:] if side == "tail" else encoded[:keep]
+    if encoder is None:
+        return "".join(kept)
+    return encoder.decode(kept)
@@ -0,0 +1,123 @@
+import math
+import re
+from collections import Counter
+from typing import List
+
+# Documents below this size are injected as they are, a digest would not be much shorter
+SUMMARY_MIN_WORDS = 600
+
+# Sentences kept in the summary: grows with the document, capped so the digest stays compact
+SUMMARY_MIN_SENTENCES = 5
+SUMMARY_MAX_SENTENCES = 25
+
+OUTLINE_MAX_ENTRIES = 40
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[\"'„(\[]?[A-ZÄÖÜ0-9])")
+WORD = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+
+NUMBERED_HEADING = re.compile(r"^(\d+(\.\d+)*\.?|[IVX]+\.|[A-Z]\.)\s+\S")
+MARKDOWN_HEADING = re.compile(r"^#{1,6}\s+\S")
+
+# Häufige Füllwörter (deutsch/englisch) tragen nichts zur Gewichtung eines Satzes bei
+STOPWORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "all", "any", "can", "had", "her", "was", "one", "our", "out",
+    "has", "have", "his", "how", "its", "may", "new", "now", "old", "see", "two", "way", "who", "did", "does",
+    "this", "that", "with", "from", "they", "will", "would", "there", "their", "what", "about", "which", "when",
+    "were", "been", "than", "then", "them", "these", "those", "into", "also", "more", "some", "such", "only",
+    "other", "could", "should", "each", "most", "very", "just", "over", "after", "before", "between", "because",
+    "der", "die", "das", "und", "ist", "nicht", "sich", "mit", "dem", "den", "des", "ein", "eine", "einer", "eines",
+    "einem", "einen", "auf", "für", "von", "wird", "werden", "auch", "als", "bei", "oder", "aus", "wie", "sind",
+    "dass", "nach", "noch", "nur", "über", "zum", "zur", "sie", "wir", "ihr", "hat", "haben", "kann", "können",
+    "wenn", "durch", "unter", "sowie", "diese", "dieser", "dieses", "mehr", "vom", "wurde", "wurden",
+}
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if paragraph:
+            sentences.extend(sentence for sentence in SENTENCE_SPLIT.split(paragraph) if sentence)
+    return sentences
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def summarize(text: str, max_sentences: int = None) -> str:
+    """
+    Extractive summary: the sentences with the most frequent content words of the document,
+    in their original order. Sentences near the start of the document get a small bonus,
+    documents usually introduce their subject there.
+    """
+    sentences = split_sentences(text)
+    if max_sentences is None:
+        max_sentences = min(max(SUMMARY_MIN_SENTENCES, int(math.sqrt(len(sentences)))), SUMMARY_MAX_SENTENCES)
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)
+
+    frequencies = Counter(_words(text))
+    if not frequencies:
+        return " ".join(sentences[:max_sentences])
+    top = frequencies.most_common(1)[0][1]
+
+    scores = []
+    for position, sentence in enumerate(sentences):
+        words = _words(sentence)
+        if len(words) < 4:
+            # Überschriften, Seitenzahlen und Satzfragmente
+            scores.append(0.0)
+            continue
+        score = sum(frequencies[word] / top for word in words) / math.sqrt(len(words))
+        score *= 1.0 + 0.5 * (1 - position / len(sentences))
+        scores.append(score)
+
+    # Wiederholte Sätze (Kopf- und Fußzeilen, Textbausteine) nur einmal aufnehmen
+    selected = []
+    seen = set()
+    for i in sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True):
+        if sentences[i] in seen:
+            continue
+        seen.add(sentences[i])
+        selected.append(i)
+        if len(selected) == max_sentences:
+            break
+    return " ".join(sentences[i] for i in sorted(selected))
+
+
+def outline(text: str, max_entries: int = OUTLINE_MAX_ENTRIES) -> List[str]:
+    """
+    Headings of the document: markdown headings, numbered headings ("2.1 Setup") and short lines
+    in capitals. Lines ending like a sentence are not headings.
+    """
+    headings = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or len(line) > 80 or line.endswith((".", ",", ";", ":")) and not MARKDOWN_HEADING.match(line):
+            continue
+        if MARKDOWN_HEADING.match(line):
+            headings.append(line.lstrip("#").strip())
+        elif NUMBERED_HEADING.match(line) and len(line.split()) <= 10:
+            headings.append(line)
+        elif line.isupper() and 1 <= len(line.split()) <= 8 and any(char.isalpha() for char in line):
+            headings.append(line)
+        if len(headings) >= max_entries:
+            break
+    return headings
+
+
+def build_digest(text: str) -> str:
+    """
+    Outline and summary of a document, injected instead of the full text in summary mode.
+    Short documents are returned unchanged.
+    """
+    if len(text.split()) < SUMMARY_MIN_WORDS:
+        return text.strip()
+
+    parts = []
+    headings = outline(text)
+    if headings:
+        parts.append("Outline:\n" + "\n".join(f"- {heading}" for heading in headings))
+    parts.append("Summary:\n" + summarize(text))
+    return "\n\n".join(parts)
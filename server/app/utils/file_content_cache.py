@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FileContentCache:
+    """
+    In-memory LRU cache for the text content of files.
+
+    Entries are keyed by path and only served while the file's mtime and size are unchanged, so a
+    replaced file is read again even without explicit invalidation. The sum of the cached file sizes
+    stays below `max_bytes`; the least recently used files are evicted first.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    async def read(self, path: str) -> str:
+        """
+        Return the content of a text file. Raises FileNotFoundError if it does not exist.
+        """
+        stat = os.stat(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry[2]
+
+        self.misses += 1
+        content = await asyncio.to_thread(self._read_file, path)
+        self.put(path, stat.st_mtime_ns, stat.st_size, content)
+        return content
+
+    def put(self, path: str, mtime_ns: int, size: int, content: str) -> None:
+        if size > self.max_bytes:
+            logger.debug(f"File {path} ({size} bytes) exceeds the cache budget, not cached")
+            return
+
+        with self.lock:
+            self._remove(path)
+            self.entries[path] = (mtime_ns, size, content)
+            self.size += size
+            while self.size > self.max_bytes:
+                evicted, (_, evicted_size, _) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                logger.debug(f"Evicted {evicted} from file content cache")
+
+    def invalidate(self, path: str) -> None:
+        with self.lock:
+            self._remove(path)
+
+    def _remove(self, path: str) -> None:
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    @staticmethod
+    def _read_file(path: str) -> str:
+        with open(path, "r", encoding="utf-8", errors="ignore") as file:
+            return file.read()
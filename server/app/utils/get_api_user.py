@@ -5,25 +5,43 @@ from fastapi import Depends, HTTPException, Security, status
 from fastapi.security import APIKeyHeader
 from server.app.models.api_key.api_key import ApiKey
 from server.app.db.get_db import get_db
+from server.app.services.api_key_service import api_key_cache, hash_api_key
 
 # Security header for API key
 api_key_header = APIKeyHeader(name="X-API-Key")
 
+
+def invalid_api_key() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or inactive API Key",
+        headers={"WWW-Authenticate": "API-Key"},
+    )
+
+
 # Function to validate API key and fetch the corresponding user
 async def get_api_user(api_key: str = Depends(api_key_header), db: AsyncSession = Depends(get_db)):
+    # Keys are stored as HMAC; known and recently rejected keys are answered without the database,
+    # the session then never checks out a connection
+    key_hash = hash_api_key(api_key)
+    user = api_key_cache.get(key_hash)
+    if user is not None:
+        return user
+    if api_key_cache.is_invalid(key_hash):
+        raise invalid_api_key()
+
+    generation = api_key_cache.generation
     result = await db.execute(
         select(ApiKey)
         .options(joinedload(ApiKey.user_relationship))  # Use user_relationship since user is a relationship
-        .filter(ApiKey.key == api_key, ApiKey.active == True)
+        .filter(ApiKey.key == key_hash, ApiKey.active == True)
     )
     api_key_entry = result.scalars().first()
 
     if not api_key_entry:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or inactive API Key",
-            headers={"WWW-Authenticate": "API-Key"},
-        )
+        api_key_cache.set_invalid(key_hash, generation)
+        raise invalid_api_key()
 
     # Return the associated user
+    api_key_cache.set(key_hash, api_key_entry.id, api_key_entry.user_relationship, generation)
     return api_key_entry.user_relationship
@@ -1,19 +1,14 @@
-from fastapi import HTTPException, Request, Depends
-from server.app.services.user_service import UserService
+from typing import Optional
+from fastapi import HTTPException, Request
+from server.app.services.user_service import UserService, session_user_cache
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import logging
 
 logger = logging.getLogger(__name__)
 
-from fastapi import HTTPException, Request, Depends
-from server.app.services.user_service import UserService
 
-import logging
-
-logger = logging.getLogger(__name__)
-
-async def get_user_by_session(request: Request):
+async def get_user_by_session(request: Request, db: Optional[AsyncSession] = None):
     access_token = request.session.get('access_token')
     user_info = request.session.get('user_info')
 
@@ -24,13 +19,23 @@ async def get_user_by_session(request: Request):
     # Extract the username from the session
     username = user_info.get('username')
 
+    # auth_google_callback stores the user's uuid in the session, known users come from the cache
+    user_uuid = user_info.get('uuid')
+    if user_uuid:
+        user = session_user_cache.get(user_uuid)
+        if user is not None and user.username == username:
+            return user
+
+    generation = session_user_cache.generation
     user_service = UserService()
-    user = await user_service.get_by_username(username)
+    user = await user_service.get_by_username(username, db)
 
     if not user:
         logger.debug(f"User with username {username} not found in the database")
         raise HTTPException(status_code=401, detail="User not found")
 
+    if user_uuid and str(user.uuid) == user_uuid:
+        session_user_cache.set(user_uuid, user, generation)
+
     # Return the user object
     return user
-
@@ -2,6 +2,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import Optional
+from datetime import datetime
 from server.app.models.model_parameter.models_parameter import ModelParameter
 
 import logging
@@ -19,20 +20,15 @@ async def fetch_hudini_systemprompt(db: AsyncSession, user_uuid: str) -> Optiona
         return None
 
 
-async def hudini_character(today: str, current_time: str, db: AsyncSession, user_uuid: str) -> str:
-    user_system_prompt = await fetch_hudini_systemprompt(db, user_uuid)
-    base_hudini_prompt = f"""
-        Today is {today} and its: {current_time}.
+def hudini_character(user_system_prompt: Optional[str] = None) -> str:
     """
-    if user_system_prompt:
-        return f"{user_system_prompt}\n\n{base_hudini_prompt}"
-
-    return base_hudini_prompt
+    The stable part of the HUDINI system prompt: the user's own system prompt, resolved by the caller
+    (SystemPromptService). The current time is a separate segment (hudini_clock) at the end of
+    the system message, so the prompt prefix stays the same between requests.
+    """
+    return user_system_prompt or ""
 
 
-def trim_context(self, context: str, max_tokens: int) -> str:
-    context_tokens = context.split()
-    if len(context_tokens) > max_tokens:
-        self.logger.debug(f"Trimming context to the last {max_tokens} tokens.")
-        return " ".join(context_tokens[-max_tokens:])
-    return context
\ No newline at end of file
+def hudini_clock(now: Optional[datetime] = None) -> str:
+    now = now or datetime.now()
+    return f"Today is {now.strftime('%Y-%m-%d')} and its: {now.strftime('%H:%M:%S')}."
@@ -0,0 +1,105 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+from server.app.utils.usage_tracker import CHARS_PER_TOKEN
+
+FINGERPRINT_BITS = 64
+
+# Paragraphs whose fingerprints differ in at most this many bits count as duplicates. Formatting
+# (line breaks, punctuation, case) does not change the fingerprint at all, unrelated paragraphs differ
+# in about half of the 64 bits. Edited paragraphs usually differ in more than 3 bits and are kept.
+MAX_HAMMING_DISTANCE = 3
+
+# Shingles of this many words; single words would make unrelated paragraphs on the same topic look alike
+SHINGLE_WORDS = 3
+
+# Very short paragraphs (headings, page numbers, "Yours sincerely") legitimately repeat across documents
+MIN_PARAGRAPH_WORDS = 8
+
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+WORD = re.compile(r"\w+", re.UNICODE)
+
+# Fingerprints are split into MAX_HAMMING_DISTANCE + 1 bands: two fingerprints within the distance
+# share at least one band exactly, so candidates are found without comparing against every paragraph
+BANDS = MAX_HAMMING_DISTANCE + 1
+BAND_BITS = FINGERPRINT_BITS // BANDS
+
+
+def split_paragraphs(text: str) -> List[str]:
+    return [paragraph.strip() for paragraph in PARAGRAPH_SPLIT.split(text) if paragraph.strip()]
+
+
+def simhash(text: str) -> int:
+    """64 bit SimHash over word shingles of the lower-cased text."""
+    words = WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+
+    weights = [0] * FINGERPRINT_BITS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def fingerprint_paragraphs(text: str) -> List[int]:
+    """Fingerprint of every paragraph of a document, 0 for paragraphs too short to be compared."""
+    return [simhash(paragraph) if len(paragraph.split()) >= MIN_PARAGRAPH_WORDS else 0
+            for paragraph in split_paragraphs(text)]
+
+
+@dataclass
+class ParagraphDeduplicator:
+    """
+    Remembers the paragraphs already put into the context of one request and drops near-duplicates
+    of them. Documents are processed in order, the first occurrence of a paragraph is kept.
+    """
+    bands: Dict[Tuple[int, int], List[int]] = field(default_factory=dict)
+    removed_paragraphs: int = 0
+    removed_tokens: int = 0
+    documents: Set[str] = field(default_factory=set)
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        mask = (1 << BAND_BITS) - 1
+        return [(band, fingerprint >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+    def is_duplicate(self, fingerprint: int) -> bool:
+        """True if a near-duplicate was seen before; otherwise the fingerprint is remembered."""
+        if not fingerprint:
+            return False
+        keys = self._band_keys(fingerprint)
+        for key in keys:
+            if any(hamming_distance(fingerprint, seen) <= MAX_HAMMING_DISTANCE for seen in self.bands.get(key, ())):
+                return True
+        for key in keys:
+            self.bands.setdefault(key, []).append(fingerprint)
+        return False
+
+    def deduplicate(self, name: str, text: str, fingerprints: List[int] = None) -> str:
+        """
+        `text` without the paragraphs already seen. `fingerprints` are the stored fingerprints of the
+        document; they are computed here if missing or if they do not match the paragraphs.
+        """
+        paragraphs = split_paragraphs(text)
+        if fingerprints is None or len(fingerprints) != len(paragraphs):
+            fingerprints = fingerprint_paragraphs(text)
+
+        kept = []
+        for paragraph, fingerprint in zip(paragraphs, fingerprints):
+            if self.is_duplicate(fingerprint):
+                self.removed_paragraphs += 1
+                self.removed_tokens += len(paragraph) // CHARS_PER_TOKEN
+                self.documents.add(name)
+            else:
+                kept.append(paragraph)
+        return "\n\n".join(kept)
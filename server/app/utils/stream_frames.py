@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+from server.app.models.generation.success_generation_model import SuccessGenerationModel, Completion, Choice, Message, \
+    Usage
+from server.app.models.generation.delta_generation_model import DeltaGenerationModel
+
+
+@dataclass(frozen=True)
+class StreamFrame:
+    """
+    A frame handed from a provider client to a streaming router.
+
+    `data` is the NDJSON line (including the trailing newline) and is encoded exactly once by the client,
+    routers write it to the response as is.
+    """
+    model: str
+    data: bytes
+
+    @classmethod
+    def from_model(cls, frame: BaseModel, model: str) -> "StreamFrame":
+        return cls(model=model, data=frame.model_dump_json().encode('utf-8') + b'\n')
+
+
+# The builders below use model_construct: all values come from our own clients, so pydantic validation
+# would only cost CPU on every streamed chunk.
+
+def build_success_frame(id: str, model: str, content: str, usage: Usage, completion_id: str, created: int,
+                        object: str, finish_reason: str = "null", index: int = 0,
+                        role: str = "assistant", seq: Optional[int] = None) -> SuccessGenerationModel:
+    """
+    Build a cumulative frame carrying the full text generated so far.
+
+    `usage` comes from the UsageTracker of the stream, it is not recomputed from the content.
+    """
+    completion = Completion.model_construct(
+        id=completion_id,
+        choices=[Choice.model_construct(
+            finish_reason=finish_reason or "null",
+            index=index,
+            logprobs=None,
+            message=Message.model_construct(
+                content=content,
+                refusal=None,
+                role=role or "assistant"
+            )
+        )],
+        created=created,
+        model=model,
+        object=object,
+        system_fingerprint=None,
+        usage=usage
+    )
+
+    return SuccessGenerationModel.model_construct(
+        id=id,
+        model=model,
+        seq=seq,
+        completion=completion
+    )
+
+
+def build_delta_frame(id: str, model: str, seq: int, delta: str) -> DeltaGenerationModel:
+    """
+    Build a delta frame carrying only the text generated since the previous frame.
+    """
+    return DeltaGenerationModel.model_construct(type="delta", id=id, model=model, seq=seq, delta=delta)
+
+
+def build_error_frame(id: str, model: str, error: Exception) -> SuccessGenerationModel:
+    """
+    Build the frame that ends the stream of a model that failed, so the other models of the request can go on.
+    """
+    now = int(datetime.utcnow().timestamp())
+    completion = Completion.model_construct(
+        id="error",
+        choices=[Choice.model_construct(
+            finish_reason="error",
+            index=0,
+            logprobs=None,
+            message=Message.model_construct(content=f"Error occurred: {str(error)}", refusal=None, role="system")
+        )],
+        created=now,
+        model=model,
+        object="error",
+        system_fingerprint=None,
+        usage=Usage.model_construct(completion_tokens=0, prompt_tokens=0, total_tokens=0, cached_tokens=None,
+                                    started=now, ended=now)
+    )
+    return SuccessGenerationModel.model_construct(id=id, model=model, seq=None, completion=completion)
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import AsyncGenerator, AsyncIterator, Callable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+# Frames buffered per stream before its producer has to wait for the consumer
+DEFAULT_STREAM_BUFFER = 16
+
+
+async def merge_streams(streams: List[AsyncIterator[T]], maxsize: int = DEFAULT_STREAM_BUFFER,
+                        on_error: Optional[Callable[[int, Exception], Optional[T]]] = None) -> AsyncGenerator[T, None]:
+    """
+    Consume several async streams at the same time and merge them into one stream.
+
+    - Every stream is read by its own task, so a slow stream never delays the first bytes of another one.
+    - Every stream has its own bounded buffer: a fast stream waits for the consumer (backpressure)
+      instead of buffering its whole answer in memory.
+    - Ready streams are served round-robin, so no stream can starve the others (fairness). The order of
+      the items within a stream is kept.
+
+    A failing stream ends on its own and the other streams keep running: the exception is logged and
+    `on_error(index, exception)` may turn it into a last item of that stream (e.g. the model's error
+    frame). When the consumer stops, all streams that are still running are cancelled.
+    """
+    queues = [asyncio.Queue(maxsize=maxsize) for _ in streams]
+    ready = asyncio.Event()
+
+    async def pump(stream: AsyncIterator[T], queue: asyncio.Queue) -> None:
+        try:
+            async for item in stream:
+                await queue.put((item, None))
+                ready.set()
+        except Exception as e:
+            await queue.put((_DONE, e))
+        else:
+            await queue.put((_DONE, None))
+        ready.set()
+
+    tasks = [asyncio.create_task(pump(stream, queue)) for stream, queue in zip(streams, queues)]
+    try:
+        active = list(range(len(queues)))
+        position = 0
+        while active:
+            # Round-robin: start with the stream after the one served last
+            for offset in range(len(active)):
+                index = active[(position + offset) % len(active)]
+                if not queues[index].empty():
+                    break
+            else:
+                await ready.wait()
+                ready.clear()
+                continue
+
+            item, error = queues[index].get_nowait()
+            if item is _DONE:
+                slot = active.index(index)
+                active.remove(index)
+                position = slot % len(active) if active else 0
+                if error is not None:
+                    logger.error(f"Stream {index} failed: {str(error)}")
+                    item = on_error(index, error) if on_error is not None else None
+                    if item is not None:
+                        yield item
+                continue
+
+            position = (active.index(index) + 1) % len(active)
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
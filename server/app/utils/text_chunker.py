@@ -0,0 +1,60 @@
+import re
+from dataclasses import dataclass
+from typing import List
+
+# Chunks stay well below the 256 word pieces all-MiniLM-L6-v2 embeds, longer input is truncated by the model
+CHUNK_WORDS = 160
+CHUNK_OVERLAP_WORDS = 30
+
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+
+
+@dataclass
+class TextChunk:
+    index: int
+    text: str
+
+
+def chunk_text(text: str, max_words: int = CHUNK_WORDS, overlap_words: int = CHUNK_OVERLAP_WORDS) -> List[TextChunk]:
+    """
+    Split a document into chunks of at most `max_words` words.
+
+    Paragraphs are kept together and packed into one chunk as long as they fit. Paragraphs longer than a
+    chunk are split into windows that overlap by `overlap_words`, so a sentence on a window border is
+    found from both sides.
+    """
+    if overlap_words >= max_words:
+        raise ValueError("overlap_words must be smaller than max_words")
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_words = 0
+
+    def flush():
+        nonlocal current_words
+        if current:
+            chunks.append("\n\n".join(current))
+            current.clear()
+            current_words = 0
+
+    for paragraph in PARAGRAPH_SPLIT.split(text):
+        words = paragraph.split()
+        if not words:
+            continue
+
+        if len(words) > max_words:
+            flush()
+            step = max_words - overlap_words
+            for start in range(0, len(words), step):
+                chunks.append(" ".join(words[start:start + max_words]))
+                if start + max_words >= len(words):
+                    break
+            continue
+
+        if current_words + len(words) > max_words:
+            flush()
+        current.append(" ".join(words))
+        current_words += len(words)
+
+    flush()
+    return [TextChunk(index=i, text=chunk) for i, chunk in enumerate(chunks)]
@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+from server.app.models.generation.success_generation_model import Usage
+
+logger = logging.getLogger(__name__)
+
+# Encoding used for models tiktoken does not know (Anthropic, Google, Llama on Cerebras).
+# The counts are an estimate until the provider reports its own usage at the end of the stream.
+FALLBACK_ENCODING = "cl100k_base"
+
+# Rough characters per token, only used when no encoding can be loaded at all
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=64)
+def get_encoder(model: str) -> Optional[tiktoken.Encoding]:
+    """
+    Return the tiktoken encoding for a model. Encoders are loaded once per model and cached,
+    loading one parses a large BPE file.
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding for model {model}: {str(e)}")
+        return None
+
+    try:
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding {FALLBACK_ENCODING}: {str(e)}")
+        return None
+
+
+class UsageTracker:
+    """
+    Incremental token accounting for one streamed answer.
+
+    Every delta is counted once when it arrives, so building the usage of a frame is O(1) instead of
+    re-counting the whole answer. The running count is an estimate; as soon as the provider reports
+    its usage (usually with the last chunk), the reported numbers are used for the final frame.
+    """
+
+    def __init__(self, model: str, prompt: str, prompt_tokens: Optional[int] = None):
+        self.encoder = get_encoder(model)
+        # Callers that already counted the prompt (e.g. the context packer) pass the count
+        self.prompt_tokens = self.count(prompt) if prompt_tokens is None else prompt_tokens
+        self.completion_tokens = 0
+        # Only known once the provider reports it
+        self.cached_tokens: Optional[int] = None
+        self.started = int(datetime.utcnow().timestamp())
+        self.reported = False
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoder is None:
+            return -(-len(text) // CHARS_PER_TOKEN)
+        return len(self.encoder.encode_ordinary(text))
+
+    def add(self, delta: str) -> None:
+        """Count the tokens of a newly streamed delta."""
+        if not self.reported:
+            self.completion_tokens += self.count(delta)
+
+    def report(self, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None,
+               cached_tokens: Optional[int] = None) -> None:
+        """Take over the usage reported by the provider. Later deltas no longer change the counts."""
+        if prompt_tokens is not None:
+            self.prompt_tokens = prompt_tokens
+        if completion_tokens is not None:
+            self.completion_tokens = completion_tokens
+        if cached_tokens is not None:
+            self.cached_tokens = cached_tokens
+        self.reported = True
+
+    def usage(self) -> Usage:
+        return Usage.model_construct(
+            completion_tokens=self.completion_tokens,
+            prompt_tokens=self.prompt_tokens,
+            total_tokens=self.prompt_tokens + self.completion_tokens,
+            cached_tokens=self.cached_tokens,
+            started=self.started,
+            ended=int(datetime.utcnow().timestamp())
+        )
+
+
+def reported_cached_tokens(usage) -> Optional[int]:
+    """
+    Cached prompt tokens of an OpenAI-compatible usage object (`prompt_tokens_details.cached_tokens`).
+    Older SDK versions keep the details as an untyped dict.
+    """
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens")
+    return getattr(details, "cached_tokens", None)
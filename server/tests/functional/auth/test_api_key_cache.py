@@ -0,0 +1,154 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import unittest
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+from server.app.services.api_key_service import (ApiKeyCache, api_key_cache, deactivate_api_key, delete_api_key,
+                                                  hash_api_key)
+from server.app.utils.get_api_user import get_api_user
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../.."))
+USER = SimpleNamespace(uuid="00000000-0000-0000-0000-000000000001", username="hudini")
+KEY_ID = "00000000-0000-0000-0000-0000000000aa"
+
+
+class FakeSession:
+    """Answers the API key lookup for the keys in `valid` (by hash) and counts the statements."""
+
+    def __init__(self, valid=(), delay: float = 0.0):
+        self.valid = {hash_api_key(key) for key in valid}
+        self.delay = delay
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        await asyncio.sleep(self.delay)
+        if statement.is_select:
+            key_hash = statement.compile().params["key_1"]
+            entry = SimpleNamespace(id=KEY_ID, user_relationship=USER) if key_hash in self.valid else None
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(first=lambda: entry))
+        return SimpleNamespace(rowcount=1)
+
+    async def commit(self):
+        pass
+
+
+class TestApiKeyHash(unittest.TestCase):
+    def test_hash_is_keyed_and_fits_the_column(self):
+        key_hash = hash_api_key("key", secret="secret")
+
+        self.assertEqual(len(key_hash), 64)
+        self.assertEqual(key_hash, hash_api_key("key", secret="secret"))
+        self.assertNotEqual(key_hash, hash_api_key("key", secret="other"))
+        self.assertNotIn("key", key_hash)
+
+    def import_service(self, secret: str, testing: str) -> subprocess.CompletedProcess:
+        env = dict(os.environ, APP_API_KEY_SECRET=secret, APP_TESTING=testing)
+        return subprocess.run([sys.executable, "-c", "import server.app.services.api_key_service"],
+                              cwd=ROOT, env=env, capture_output=True, text=True)
+
+    def test_service_refuses_to_start_without_a_secret(self):
+        result = self.import_service(secret="", testing="False")
+
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("APP_API_KEY_SECRET is not set", result.stderr)
+
+    def test_service_starts_with_a_secret_or_in_tests(self):
+        self.assertEqual(self.import_service(secret="secret", testing="False").returncode, 0)
+        self.assertEqual(self.import_service(secret="", testing="True").returncode, 0)
+
+
+class TestApiKeyCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        api_key_cache.clear()
+        self.addCleanup(api_key_cache.clear)
+
+    async def test_verified_key_is_served_without_the_database(self):
+        db = FakeSession(valid=["good"])
+
+        users = [await get_api_user("good", db) for _ in range(5)]
+
+        self.assertEqual(users, [USER] * 5)
+        self.assertEqual(len(db.statements), 1)
+        # The stored value is the hash, the plain key never reaches the database
+        self.assertNotIn("good", str(db.statements[0].compile().params))
+
+    async def test_bad_key_is_cached_negatively(self):
+        db = FakeSession()
+
+        for _ in range(5):
+            with self.assertRaises(HTTPException) as error:
+                await get_api_user("bad", db)
+            self.assertEqual(error.exception.status_code, 401)
+
+        self.assertEqual(len(db.statements), 1)
+
+    async def test_deactivated_key_is_rejected_immediately(self):
+        db = FakeSession(valid=["good"])
+        await get_api_user("good", db)
+
+        self.assertTrue(await deactivate_api_key(KEY_ID, USER.uuid, db=db))
+        db.valid.clear()
+
+        with self.assertRaises(HTTPException):
+            await get_api_user("good", db)
+
+    async def test_deleted_key_is_rejected_immediately(self):
+        db = FakeSession(valid=["good"])
+        await get_api_user("good", db)
+
+        self.assertTrue(await delete_api_key(KEY_ID, USER.uuid, db=db))
+        db.valid.clear()
+
+        with self.assertRaises(HTTPException):
+            await get_api_user("good", db)
+
+    async def test_lookup_running_during_invalidation_is_not_cached(self):
+        db = FakeSession(valid=["good"], delay=0.05)
+
+        lookup = asyncio.create_task(get_api_user("good", db))
+        await asyncio.sleep(0.01)
+        api_key_cache.invalidate(key_id=KEY_ID)
+
+        self.assertIs(await lookup, USER)
+        self.assertIsNone(api_key_cache.get(hash_api_key("good")))
+
+    def test_entries_expire(self):
+        cache = ApiKeyCache(maxsize=10, ttl=0.05, negative_ttl=0.05)
+        cache.set("hash", KEY_ID, USER, cache.generation)
+        cache.set_invalid("other", cache.generation)
+
+        self.assertIs(cache.get("hash"), USER)
+        self.assertTrue(cache.is_invalid("other"))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("hash"))
+        self.assertFalse(cache.is_invalid("other"))
+
+    def test_cache_is_bounded(self):
+        cache = ApiKeyCache(maxsize=10, ttl=60, negative_ttl=60)
+        for i in range(100):
+            cache.set_invalid(f"hash-{i}", cache.generation)
+
+        self.assertEqual(len(cache.invalid), 10)
+
+    def test_user_invalidation_drops_all_keys_of_the_user(self):
+        cache = ApiKeyCache(maxsize=10, ttl=60, negative_ttl=60)
+        other = SimpleNamespace(uuid="other")
+        cache.set("first", "key-1", USER, cache.generation)
+        cache.set("second", "key-2", USER, cache.generation)
+        cache.set("third", "key-3", other, cache.generation)
+
+        cache.invalidate(user_uuid=USER.uuid)
+
+        self.assertIsNone(cache.get("first"))
+        self.assertIsNone(cache.get("second"))
+        self.assertIs(cache.get("third"), other)
+
+
+if __name__ == '__main__':
+    unittest.main()
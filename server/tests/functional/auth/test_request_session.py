@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+from server.app.routers.prompts.prompts_router import router as prompts_router
+from server.app.routers.usercontext.usercontext_router import router as usercontext_router
+from server.app.services.api_key_service import api_key_cache
+from server.app.services.user_service import session_user_cache
+from server.app.utils.auth import auth
+
+USER = SimpleNamespace(uuid="00000000-0000-0000-0000-000000000001", username="hudini")
+
+
+class FakeResult:
+    def scalars(self):
+        return SimpleNamespace(first=lambda: SimpleNamespace(id="key-id", user_relationship=USER), all=lambda: [])
+
+    def scalar_one_or_none(self):
+        return USER
+
+
+class FakeSession:
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+        self.statements = 0
+
+    async def __aenter__(self):
+        self.pool.checked_out += 1
+        self.pool.max_checked_out = max(self.pool.max_checked_out, self.pool.checked_out)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.pool.checked_out -= 1
+        return False
+
+    async def execute(self, statement):
+        self.statements += 1
+        # Hold the connection for a moment, so the requests overlap
+        await asyncio.sleep(0.01)
+        return FakeResult()
+
+
+class FakePool:
+    """Stands in for async_session_maker and counts the connections checked out at the same time."""
+
+    def __init__(self):
+        self.sessions = []
+        self.checked_out = 0
+        self.max_checked_out = 0
+
+    def __call__(self):
+        session = FakeSession(self)
+        self.sessions.append(session)
+        return session
+
+
+class TestRequestSession(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pool = FakePool()
+        patcher = patch("server.app.db.get_db.async_session_maker", new=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        api_key_cache.clear()
+        self.addCleanup(api_key_cache.clear)
+        session_user_cache.clear()
+        self.addCleanup(session_user_cache.clear)
+
+        self.app = FastAPI()
+        self.app.include_router(prompts_router)
+        self.app.include_router(usercontext_router)
+
+    async def test_auth_and_handler_share_one_session_under_load(self):
+        requests = 60
+        transport = httpx.ASGITransport(app=self.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(
+                # A key per request, a cached key would not need the session for authentication
+                client.get("/prompts" if i % 2 else "/usercontext", params={"api_key": f"key-{i}"})
+                for i in range(requests)
+            ))
+
+        # /usercontext answers 404 for a user without contexts
+        self.assertEqual([response.status_code for response in responses],
+                         [200 if i % 2 else 404 for i in range(requests)])
+        # One session per request, used for the API key lookup and the handler's query
+        self.assertEqual(len(self.pool.sessions), requests)
+        self.assertTrue(all(session.statements == 2 for session in self.pool.sessions))
+        self.assertLessEqual(self.pool.max_checked_out, requests)
+        self.assertEqual(self.pool.checked_out, 0)
+
+    async def test_session_auth_uses_the_request_session(self):
+        db = FakeSession(self.pool)
+        request = SimpleNamespace(session={"access_token": "token", "user_info": {"username": "hudini"}})
+
+        user = await auth(request=request, db=db)
+
+        self.assertIs(user, USER)
+        self.assertEqual(db.statements, 1)
+        self.assertEqual(self.pool.sessions, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+from server.app.services.user_service import SessionUserCache, session_user_cache
+from server.app.utils.get_user_by_session import get_user_by_session
+
+USER_UUID = "00000000-0000-0000-0000-000000000001"
+USER = SimpleNamespace(uuid=USER_UUID, username="hudini")
+
+
+class FakeSession:
+    def __init__(self, user=USER, delay: float = 0.0):
+        self.user = user
+        self.delay = delay
+        self.statements = 0
+
+    async def execute(self, statement):
+        self.statements += 1
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(scalar_one_or_none=lambda: self.user)
+
+
+def session_request(username: str = "hudini", uuid: str = USER_UUID):
+    user_info = {"username": username}
+    if uuid:
+        user_info["uuid"] = uuid
+    return SimpleNamespace(session={"access_token": {"token": "token"}, "user_info": user_info})
+
+
+class TestSessionUserCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        session_user_cache.clear()
+        self.addCleanup(session_user_cache.clear)
+
+    async def test_follow_up_requests_are_served_from_the_cache(self):
+        db = FakeSession()
+
+        users = [await get_user_by_session(session_request(), db) for _ in range(10)]
+
+        self.assertEqual(users, [USER] * 10)
+        self.assertEqual(db.statements, 1)
+
+    async def test_invalidated_user_is_loaded_again(self):
+        db = FakeSession()
+        await get_user_by_session(session_request(), db)
+
+        session_user_cache.invalidate(USER_UUID)
+        await get_user_by_session(session_request(), db)
+
+        self.assertEqual(db.statements, 2)
+
+    async def test_deleted_user_is_rejected(self):
+        db = FakeSession()
+        await get_user_by_session(session_request(), db)
+
+        session_user_cache.invalidate(USER_UUID)
+        db.user = None
+
+        with self.assertRaises(HTTPException) as error:
+            await get_user_by_session(session_request(), db)
+        self.assertEqual(error.exception.status_code, 401)
+
+    async def test_session_of_another_user_is_not_served_from_the_cache(self):
+        db = FakeSession()
+        await get_user_by_session(session_request(), db)
+
+        db.user = SimpleNamespace(uuid="other", username="other")
+        await get_user_by_session(session_request(username="other"), db)
+
+        self.assertEqual(db.statements, 2)
+
+    async def test_sessions_without_uuid_are_not_cached(self):
+        db = FakeSession()
+
+        for _ in range(3):
+            await get_user_by_session(session_request(uuid=None), db)
+
+        self.assertEqual(db.statements, 3)
+
+    async def test_lookup_running_during_invalidation_is_not_cached(self):
+        db = FakeSession(delay=0.05)
+
+        lookup = asyncio.create_task(get_user_by_session(session_request(), db))
+        await asyncio.sleep(0.01)
+        session_user_cache.invalidate(USER_UUID)
+
+        self.assertIs(await lookup, USER)
+        self.assertIsNone(session_user_cache.get(USER_UUID))
+
+    def test_entries_expire_and_cache_is_bounded(self):
+        cache = SessionUserCache(maxsize=10, ttl=0.05)
+        for i in range(100):
+            cache.set(f"user-{i}", USER, cache.generation)
+
+        self.assertEqual(len(cache.users), 10)
+        time.sleep(0.1)
+        self.assertEqual(len(cache.users), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
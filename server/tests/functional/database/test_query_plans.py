@@ -0,0 +1,107 @@
+import hashlib
+import json
+import unittest
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from server.app.db.base import async_engine
+from server.app.models.users.user import User  # noqa: F401, resolves the relationships of the models below
+from server.app.models.api_key.api_key import ApiKey
+from server.app.models.gripsbox.gripsbox_model import Gripsbox
+from server.app.models.model_parameter.models_parameter import ModelParameter
+from server.app.models.prompts.prompts import Prompt
+from server.app.models.usercontext.user_context import UserContextModel
+
+USERS = 500
+THREAD_ID_OFFSET = 900000000
+
+# Enough rows that a sequential scan is clearly the wrong plan. Everything is inserted in a transaction
+# that is rolled back, the database is left as it was.
+SEED = [
+    f"""INSERT INTO users (uuid, username, email, password)
+        SELECT md5('query-plan-user-' || i)::uuid, 'query-plan-user-' || i, 'query-plan-user-' || i || '@example.com', 'x'
+        FROM generate_series(0, {USERS - 1}) AS i""",
+    f"""INSERT INTO user_context (uuid, context_data, "user", thread_id, created)
+        SELECT md5('query-plan-context-' || i)::uuid, '{{}}'::jsonb, md5('query-plan-user-' || mod(i / 10, {USERS}))::uuid,
+               {THREAD_ID_OFFSET} + i / 10, now() - i * interval '1 second'
+        FROM generate_series(0, 49999) AS i""",
+    f"""INSERT INTO gripsbox (id, name, size, type, active, tags, models, "user")
+        SELECT md5('query-plan-gripsbox-' || i)::uuid, 'file-' || i, 1, 'pdf', mod(i, 4) <> 0, '[]', '[]',
+               md5('query-plan-user-' || mod(i, {USERS}))::uuid
+        FROM generate_series(0, 19999) AS i""",
+    f"""INSERT INTO model_parameter (uuid, "user", parameter, model, value, active)
+        SELECT md5('query-plan-parameter-' || i)::uuid, md5('query-plan-user-' || mod(i, {USERS}))::uuid,
+               CASE WHEN mod(i, 40) = 0 THEN 'systemprompt' ELSE 'parameter-' || mod(i, 40) END, 'gpt-4o', '{{}}', mod(i, 2) = 0
+        FROM generate_series(0, 19999) AS i""",
+    f"""INSERT INTO prompts (uuid, prompt, status, "user")
+        SELECT md5('query-plan-prompt-' || i)::uuid, 'Query plan prompt number ' || i, 'done',
+               md5('query-plan-user-' || mod(i, {USERS}))::uuid
+        FROM generate_series(0, 49999) AS i""",
+    f"""INSERT INTO api_keys (id, "user", key, active)
+        SELECT md5('query-plan-key-' || i)::uuid, md5('query-plan-user-' || mod(i, {USERS}))::uuid,
+               md5('key-' || i) || md5('hash-' || i), true
+        FROM generate_series(0, 19999) AS i""",
+]
+TABLES = ["users", "user_context", "gripsbox", "model_parameter", "prompts", "api_keys"]
+
+
+def seeded_uuid(value: str) -> uuid.UUID:
+    # md5(...)::uuid in Postgres
+    return uuid.UUID(hashlib.md5(value.encode("utf-8")).hexdigest())
+
+
+USER_UUID = seeded_uuid("query-plan-user-7")
+
+# The hot queries as the services and routers issue them, with the table that must not be scanned
+HOT_QUERIES = {
+    "thread history": ("user_context", select(UserContextModel.uuid, UserContextModel.context_data)
+                       .where(UserContextModel.user == USER_UUID, UserContextModel.thread_id == THREAD_ID_OFFSET + 7)
+                       .order_by(UserContextModel.created.asc())),
+    "user contexts": ("user_context", select(UserContextModel)
+                      .where(UserContextModel.user == USER_UUID)
+                      .order_by(UserContextModel.created.desc())),
+    "active gripsbox files": ("gripsbox", select(Gripsbox).where(Gripsbox.user == USER_UUID, Gripsbox.active == True)),
+    "system prompt": ("model_parameter", select(ModelParameter.value)
+                      .filter_by(user=USER_UUID, parameter="systemprompt", active=True)),
+    "prompt dedup": ("prompts", select(Prompt).filter_by(prompt="Query plan prompt number 7", user=USER_UUID)),
+    "api key": ("api_keys", select(ApiKey).filter(ApiKey.key == "0" * 64, ApiKey.active == True)),
+}
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+class TestQueryPlans(unittest.IsolatedAsyncioTestCase):
+    """Fails if one of the hot queries falls back to a sequential scan, i.e. an index is missing or unusable."""
+
+    async def test_hot_queries_use_an_index(self):
+        async with async_engine.connect() as connection:
+            transaction = await connection.begin()
+            try:
+                for statement in SEED:
+                    await connection.exec_driver_sql(statement)
+                for table in TABLES:
+                    await connection.exec_driver_sql(f"ANALYZE {table}")
+
+                for name, (table, query) in HOT_QUERIES.items():
+                    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+                    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")
+                    plan = result.scalar()
+                    plan = json.loads(plan) if isinstance(plan, str) else plan
+
+                    scans = [node["Node Type"] for node in plan_nodes(plan[0]["Plan"])
+                             if node.get("Relation Name") == table]
+                    with self.subTest(query=name):
+                        self.assertTrue(scans, f"{name} does not read {table}")
+                        self.assertNotIn("Seq Scan", scans, f"{name} scans {table} sequentially")
+            finally:
+                await transaction.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
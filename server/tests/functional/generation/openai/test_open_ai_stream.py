@@ -2,8 +2,10 @@ import unittest
 import requests
 import uuid
 import asyncio
+import json
 from server.app.config.settings import Settings
-from server.app.models.generation.generation_request import GenerationRequest, ModelConfig, ModelCategory, Platform
+from server.app.models.generation.generation_request import GenerationRequest, ModelConfig, ModelCategory, Platform, \
+    StreamMode
 from server.tests.test_abstract import TestAbstract
 
 
@@ -53,6 +55,53 @@ class TestGenerateAndStream(TestAbstract):
         except requests.RequestException as e:
             self.fail(f"Request failed: {str(e)}")
 
+    def test_stream_delta_mode(self):
+        """Test that stream_mode=delta sends only new text per frame and ends with the full text."""
+        model_config = ModelConfig(
+            id='gpt-4o-mini',
+            platform=Platform.OPENAI,
+            model="gpt-4o-mini",
+            temperature=0.7,
+            max_tokens=100,
+            object="chat.completion",
+            category=ModelCategory.TEXT_COMPLETION,
+            description="A language model for text completions"
+        )
+
+        stream_payload = GenerationRequest(
+            models=[model_config],
+            prompt="Count from one to ten in words.",
+            id=str(uuid.uuid4()),
+            method_name="fetch_completion",
+            stream_mode=StreamMode.DELTA
+        ).model_dump_json()
+
+        try:
+            response = requests.post(
+                f"{self.SERVER_URL}/stream/openai?api_key={self.api_key}",
+                data=stream_payload,
+                headers={"Content-Type": "application/json"},
+                stream=True,
+                timeout=30
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+
+            frames = [json.loads(line) for line in response.iter_lines() if line]
+        except requests.RequestException as e:
+            self.fail(f"Request failed: {str(e)}")
+
+        delta_frames = [frame for frame in frames if frame.get("type") == "delta"]
+        final_frame = frames[-1]
+
+        self.assertTrue(delta_frames, "Expected at least one delta frame")
+        self.assertEqual([frame["seq"] for frame in delta_frames], list(range(len(delta_frames))))
+        self.assertNotIn("type", final_frame)
+        self.assertEqual(
+            final_frame["completion"]["choices"][0]["message"]["content"],
+            "".join(frame["delta"] for frame in delta_frames)
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
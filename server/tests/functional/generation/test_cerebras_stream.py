@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from server.app.clients.cerebras.cerebras_client import CerebrasClient
+from server.app.models.generation.cerebras_model import CerebrasModel
+
+
+class BlockingCerebrasStream:
+    """Mimics the synchronous Cerebras SDK stream: every chunk blocks the calling thread."""
+
+    def __init__(self, chunks: int, delay: float):
+        self.chunks = chunks
+        self.delay = delay
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        for i in range(self.chunks):
+            time.sleep(self.delay)
+            self.produced += 1
+            yield SimpleNamespace(
+                id="chatcmpl-test",
+                created=0,
+                object="chat.completion.chunk",
+                choices=[SimpleNamespace(
+                    delta=SimpleNamespace(content=f" token{i}", role="assistant"),
+                    finish_reason="stop" if i == self.chunks - 1 else None,
+                    index=0
+                )]
+            )
+
+    def close(self):
+        self.closed.set()
+
+
+class TestCerebrasStream(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = CerebrasClient(api_key="test-key")
+        self.model = CerebrasModel(id="llama3.1-8b", object="model", model="llama3.1-8b")
+
+    def use_stream(self, stream: BlockingCerebrasStream):
+        self.client.client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: stream))
+        )
+
+    async def test_event_loop_is_not_blocked_while_streaming(self):
+        """Other coroutines (i.e. other users' requests) keep being served while a Cerebras stream runs."""
+        stream = BlockingCerebrasStream(chunks=20, delay=0.05)
+        self.use_stream(stream)
+
+        async def consume():
+            frames = []
+            async for frame in await self.client.fetch_completion(self.model, "prompt", "id", context=""):
+                frames.append(frame)
+            return frames
+
+        async def serve_other_requests(done: asyncio.Event):
+            ticks = 0
+            max_gap = 0.0
+            last = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                max_gap = max(max_gap, now - last)
+                last = now
+                ticks += 1
+            return ticks, max_gap
+
+        done = asyncio.Event()
+        other = asyncio.create_task(serve_other_requests(done))
+        frames = await consume()
+        done.set()
+        ticks, max_gap = await other
+
+        self.assertEqual(len(frames), 20)
+        content = json.loads(frames[-1].data)["completion"]["choices"][0]["message"]["content"]
+        self.assertEqual(content, "".join(f" token{i}" for i in range(20)))
+        self.assertGreater(ticks, 30, "Event loop was starved while the stream was running")
+        self.assertLess(max_gap, 0.04, f"Event loop was blocked for {max_gap:.3f}s")
+
+    async def test_stream_is_cancelled_when_consumer_goes_away(self):
+        """Closing the response stops the worker thread and closes the provider stream."""
+        stream = BlockingCerebrasStream(chunks=200, delay=0.01)
+        self.use_stream(stream)
+
+        generator = await self.client.fetch_completion(self.model, "prompt", "id", context="")
+        await generator.__anext__()
+        await generator.aclose()
+
+        closed = await asyncio.to_thread(stream.closed.wait, 2)
+        self.assertTrue(closed, "Provider stream was not closed after the consumer went away")
+        self.assertLess(stream.produced, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
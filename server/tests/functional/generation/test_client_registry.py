@@ -0,0 +1,55 @@
+import logging
+import unittest
+
+from server.app.clients.client_registry import ClientRegistry
+from server.app.clients.openai.openai_client import OpenAIClient
+
+
+class FakeSettings:
+    def get(self, section):
+        return {
+            "API_KEY_OPEN_AI": "sk-test-openai",
+            "API_KEY_ANTHROPIC": "sk-test-anthropic",
+            "API_KEY_GOOGLE_AI": "test-google",
+            "API_KEY_CEREBRAS": "test-cerebras",
+        }
+
+
+class TestClientRegistry(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.registry = ClientRegistry(FakeSettings())
+
+    async def asyncTearDown(self):
+        await self.registry.close()
+
+    async def test_one_client_per_provider_and_api_key(self):
+        self.assertIs(self.registry.openai, self.registry.openai)
+        self.assertIs(self.registry.anthropic, self.registry.get("anthropic"))
+        self.assertIsNot(self.registry.get("openai", api_key="sk-other"), self.registry.openai)
+
+    async def test_clients_share_tuned_connection_pool(self):
+        http_client = self.registry.openai.client._client
+        self.assertEqual(http_client.timeout.connect, 5.0)
+
+    async def test_close_releases_connection_pools(self):
+        http_client = self.registry.anthropic.client._client
+        await self.registry.close()
+
+        self.assertTrue(http_client.is_closed)
+        self.assertEqual(self.registry.clients, {})
+
+    async def test_unknown_provider_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.registry.get("unknown")
+
+    async def test_logger_handlers_do_not_grow(self):
+        OpenAIClient(api_key="sk-test")
+        handlers = len(logging.getLogger(OpenAIClient.__module__).handlers)
+        for _ in range(3):
+            OpenAIClient(api_key="sk-test")
+
+        self.assertEqual(len(logging.getLogger(OpenAIClient.__module__).handlers), handlers)
+
+
+if __name__ == '__main__':
+    unittest.main()
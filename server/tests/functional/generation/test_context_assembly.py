@@ -0,0 +1,127 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from server.app.db.get_db import SerializedSession
+from server.app.services.context_assembly_service import assemble_context, assemble_generation_context
+
+
+def slow(value, delay: float):
+    async def load():
+        await asyncio.sleep(delay)
+        return value
+    return load
+
+
+class FakeSession:
+    """Records how many statements run at the same time on the session."""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.statements = 0
+
+    async def execute(self, statement):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        self.statements += 1
+        return statement
+
+    async def get(self, entity, ident):
+        return await self.execute((entity, ident))
+
+    async def flush(self):
+        await self.execute("flush")
+
+    async def stream(self, statement):
+        return await self.execute(statement)
+
+
+class TestContextAssembly(unittest.IsolatedAsyncioTestCase):
+    async def test_sources_run_concurrently(self):
+        started = time.perf_counter()
+
+        context = await assemble_context({"a": slow(1, 0.2), "b": slow(2, 0.2), "c": slow(3, 0.2)})
+
+        self.assertLess(time.perf_counter() - started, 0.4)
+        self.assertEqual(context.values, {"a": 1, "b": 2, "c": 3})
+
+    async def test_latency_is_recorded_per_source(self):
+        context = await assemble_context({"fast": slow("x", 0.0), "slow": slow("y", 0.1)})
+
+        self.assertEqual(list(context.timings), ["fast", "slow"])
+        self.assertGreaterEqual(context.timings["slow"], 90)
+        self.assertLess(context.timings["fast"], context.timings["slow"])
+        self.assertGreaterEqual(context.total, context.timings["slow"])
+
+        header = context.server_timing()
+        self.assertRegex(header, r"^fast;dur=[\d.]+, slow;dur=[\d.]+, context;dur=[\d.]+$")
+
+    async def test_failing_source_fails_the_stage(self):
+        async def broken():
+            raise RuntimeError("database down")
+
+        with self.assertRaises(RuntimeError):
+            await assemble_context({"ok": slow(1, 0.0), "broken": broken})
+
+    async def test_generation_context_shares_the_request_session(self):
+        db = FakeSession()
+        user = SimpleNamespace(uuid="user")
+        request = SimpleNamespace(prompt="Hello?", thread_id=3)
+
+        def lookup(value):
+            async def load(session, *args):
+                await session.execute("SELECT")
+                return value
+            return load
+
+        thread_context = SimpleNamespace(get_turns=AsyncMock(side_effect=lookup(["prompt: Hi answer: Hello"])))
+        system_prompts = SimpleNamespace(get=AsyncMock(side_effect=lookup("You are Hudini.")))
+        generation_cache = SimpleNamespace(get_user_setting=AsyncMock(side_effect=lookup(True)))
+
+        with patch("server.app.services.context_assembly_service.add_gripsbox_content_to_llm_context",
+                   new=AsyncMock(side_effect=Exception("No active Gripsbox files"))):
+            context = await assemble_generation_context(request, user, db, thread_context, system_prompts,
+                                                        generation_cache)
+
+        self.assertEqual(context.values, {"thread_context": "prompt: Hi answer: Hello", "gripsbox": "",
+                                          "system_prompt": "You are Hudini.", "generation_cache": True})
+        self.assertEqual(context.segments, {"thread_context": ["prompt: Hi answer: Hello"]})
+        self.assertEqual(thread_context.get_turns.call_args.args[1:], ("user", 3))
+        used = {thread_context.get_turns.call_args.args[0], system_prompts.get.call_args.args[0],
+                generation_cache.get_user_setting.call_args.args[0]}
+        self.assertEqual(len(used), 1)
+        self.assertIs(used.pop().session, db)
+        # The lookups run concurrently, their statements one after another on the one connection
+        self.assertEqual(db.statements, 3)
+        self.assertEqual(db.max_running, 1)
+
+
+class TestSerializedSession(unittest.IsolatedAsyncioTestCase):
+    async def test_every_awaitable_method_takes_the_lock(self):
+        db = FakeSession()
+        session = SerializedSession(db)
+
+        results = await asyncio.gather(session.execute("a"), session.get("Model", 1), session.flush(),
+                                       session.execute("b"))
+
+        self.assertEqual(results, ["a", ("Model", 1), None, "b"])
+        self.assertEqual(db.statements, 4)
+        self.assertEqual(db.max_running, 1)
+
+    async def test_other_attributes_come_from_the_session(self):
+        db = FakeSession()
+
+        self.assertEqual(SerializedSession(db).statements, 0)
+
+    def test_streaming_is_rejected(self):
+        with self.assertRaises(AttributeError):
+            SerializedSession(FakeSession()).stream
+
+
+if __name__ == '__main__':
+    unittest.main()
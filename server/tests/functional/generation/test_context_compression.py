@@ -0,0 +1,195 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from diskcache import FanoutCache
+
+from server.app.services.context_assembly_service import AssembledContext, compress_context
+from server.app.services.context_compression_service import BASELINE, COMPRESSED, ContextCompressionService
+from server.app.utils.context_compression import LexicalScorer, compress
+
+FACTS = [
+    "Our drone depot in Hamburg opens at 06:30 and closes at 22:00.",
+    "Battery packs of type LX-40 must not be charged below 5 degrees.",
+    "Flights over Elbe need permit from harbour authority.",
+]
+FILLER = "It is really quite a nice day and the team just basically talked about the weather again."
+
+
+def document(repetitions: int = 40) -> str:
+    sentences = []
+    for i in range(repetitions):
+        sentences.append(FACTS[i % len(FACTS)] if i % 4 == 0 else FILLER)
+    return "\n\n".join(" ".join(sentences[i:i + 4]) for i in range(0, len(sentences), 4))
+
+
+class CountingScorer(LexicalScorer):
+    def __init__(self, delay: float = 0.0):
+        self.calls = 0
+        self.delay = delay
+
+    def score(self, sentences):
+        self.calls += 1
+        time.sleep(self.delay)
+        return super().score(sentences)
+
+
+class TestCompression(unittest.TestCase):
+    def test_text_is_compressed_to_the_target_ratio(self):
+        text = document()
+
+        compressed = compress(text, 0.5, LexicalScorer())
+
+        self.assertLessEqual(len(compressed.split()), len(text.split()) * 0.5)
+        for fact in FACTS:
+            self.assertIn(fact, compressed)
+
+    def test_filler_words_are_dropped_but_negations_kept(self):
+        compressed = compress("The test is really just a very simple one that is not optional.", 0.9, LexicalScorer())
+
+        self.assertEqual(compressed, "Test is simple one that is not optional.")
+
+    def test_paragraphs_and_order_are_kept(self):
+        compressed = compress(document(), 0.3, LexicalScorer())
+
+        positions = [compressed.find(fact) for fact in FACTS]
+        self.assertEqual(positions, sorted(positions))
+        self.assertIn("\n\n", compressed)
+
+
+class TestContextCompressionService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = FanoutCache(directory=directory.name, shards=2)
+        self.addCleanup(self.cache.close)
+
+    def service(self, **kwargs) -> ContextCompressionService:
+        kwargs.setdefault("mode", "on")
+        kwargs.setdefault("min_words", 50)
+        service = ContextCompressionService(self.cache, **kwargs)
+        self.addCleanup(service.close)
+        return service
+
+    async def test_short_text_is_not_compressed(self):
+        self.assertEqual(await self.service().compress(FACTS[0]), FACTS[0])
+
+    async def test_result_is_cached_by_content(self):
+        scorer = CountingScorer()
+        service = self.service(scorer=scorer)
+
+        first = await service.compress(document())
+        second = await service.compress(document())
+
+        self.assertEqual(first, second)
+        self.assertLess(len(first), len(document()))
+        self.assertEqual(scorer.calls, 1)
+
+    async def test_slow_compression_is_not_waited_for(self):
+        scorer = CountingScorer(delay=0.3)
+        service = self.service(scorer=scorer, budget_ms=50)
+
+        started = time.perf_counter()
+        result = await service.compress(document())
+
+        self.assertLess(time.perf_counter() - started, 0.2)
+        self.assertEqual(result, document())
+
+        # The compression finishes in the background and serves the next request
+        time.sleep(0.4)
+        self.assertNotEqual(await service.compress(document()), document())
+
+    async def test_segments_are_compressed_and_cached_one_by_one(self):
+        scorer = CountingScorer()
+        service = self.service(scorer=scorer)
+        turns = [f"Turn {i}. " + document(20) for i in range(3)]
+
+        first = await service.compress_segments(turns[:2])
+        second = await service.compress_segments(turns)
+
+        # Only the new turn is compressed, the earlier ones come back exactly as they were sent
+        self.assertEqual(scorer.calls, 3)
+        self.assertEqual(second[:2], first)
+        self.assertLess(len(second[2]), len(turns[2]))
+
+    async def test_busy_workers_are_not_waited_for(self):
+        scorer = CountingScorer(delay=0.3)
+        service = self.service(scorer=scorer, budget_ms=1000, workers=1)
+
+        slow = asyncio.create_task(service.compress(document()))
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        result = await service.compress(document(36))
+
+        self.assertLess(time.perf_counter() - started, 0.1)
+        self.assertEqual(result, document(36))
+        self.assertNotEqual(await slow, document())
+        self.assertEqual(scorer.calls, 1)
+
+    async def test_closed_service_sends_the_text_uncompressed(self):
+        scorer = CountingScorer()
+        service = self.service(scorer=scorer)
+
+        service.close()
+
+        self.assertEqual(await service.compress(document()), document())
+        self.assertEqual(scorer.calls, 0)
+
+    async def test_cache_lookups_run_in_a_thread(self):
+        service = self.service()
+        await service.compress(document())
+
+        with patch.object(asyncio, "to_thread", wraps=asyncio.to_thread) as to_thread:
+            await service.compress(document())
+
+        to_thread.assert_awaited_once_with(service.cached, [document()])
+
+    def test_variants(self):
+        self.assertEqual(self.service(mode="off").variant("user"), BASELINE)
+        self.assertEqual(self.service(mode="on").variant("user"), COMPRESSED)
+
+        service = self.service(mode="ab", ab_share=0.5)
+        variants = [service.variant(f"user-{i}") for i in range(1000)]
+        self.assertEqual(variants, [service.variant(f"user-{i}") for i in range(1000)])
+        self.assertTrue(400 < variants.count(COMPRESSED) < 600)
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.service(mode="sometimes")
+
+    async def test_generation_context_is_compressed_for_the_compressed_variant(self):
+        context = AssembledContext(values={"thread_context": document(), "gripsbox": "", "system_prompt": None},
+                                   timings={"thread_context": 1.0}, total=1.0)
+
+        await compress_context(context, self.service(), "user")
+
+        self.assertEqual(context.variant, COMPRESSED)
+        self.assertLess(len(context["thread_context"]), len(document()))
+        self.assertEqual(context["gripsbox"], "")
+        self.assertIn("compression", context.timings)
+        self.assertTrue(context.server_timing().endswith('variant;desc="compressed"'))
+
+    async def test_generation_context_is_compressed_per_segment(self):
+        turns = [f"Turn {i}. " + document(20) for i in range(2)]
+        context = AssembledContext(values={"thread_context": " ".join(turns), "gripsbox": ""},
+                                   segments={"thread_context": turns})
+        service = self.service()
+
+        await compress_context(context, service, "user")
+
+        self.assertEqual(context["thread_context"], " ".join([await service.compress(turn) for turn in turns]))
+
+    async def test_baseline_variant_is_left_unchanged(self):
+        context = AssembledContext(values={"thread_context": document(), "gripsbox": ""})
+
+        await compress_context(context, self.service(mode="off"), "user")
+
+        self.assertEqual(context.variant, BASELINE)
+        self.assertEqual(context["thread_context"], document())
+        self.assertNotIn("compression", context.timings)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+from unittest.mock import patch
+
+from server.app.clients.openai.openai_client import OpenAIClient
+from server.app.clients.openai.openai_client_tool_calling import OpenAIClient as OpenAIClientToolCalling
+from server.app.utils import context_packer
+from server.app.utils.context_packer import (pack_context, pack_context_async, generation_sources,
+                                             resolve_context_window, ContextSource, TokenCache,
+                                             DEFAULT_CONTEXT_WINDOW, RESERVED_OUTPUT_TOKENS)
+
+
+def turns(count: int) -> str:
+    return " ".join(f"prompt: question {i} answer: answer number {i}." for i in range(count))
+
+
+class FakeEncoder:
+    def __init__(self, name: str):
+        self.name = name
+
+    def encode_ordinary(self, text: str) -> list:
+        return text.split()
+
+
+class TestContextPacker(unittest.TestCase):
+    def test_small_context_is_kept_completely(self):
+        sources = generation_sources("You are Hudini.", turns(3), "A small document.", "Hello?")
+
+        packed = pack_context("gpt-4o", sources, context_window=128000)
+
+        self.assertEqual(packed.trimmed_tokens, 0)
+        self.assertEqual(packed.texts["history"], turns(3))
+        self.assertIn("Gripsbox Content:\nA small document.", packed.system_message())
+
+    def test_packed_context_fits_the_window(self):
+        sources = generation_sources("You are Hudini.", turns(2000), "document " * 5000, "Hello?")
+
+        packed = pack_context("gpt-3.5-turbo", sources, context_window=4096, reserved_output_tokens=1024)
+
+        self.assertEqual(packed.budget, 3072)
+        self.assertLessEqual(packed.total_tokens, packed.budget)
+        self.assertGreater(packed.trimmed_tokens, 0)
+        # Required sources are never trimmed
+        self.assertEqual(packed.texts["system_prompt"], "You are Hudini.")
+        self.assertEqual(packed.texts["prompt"], "Hello?")
+        # History keeps the latest turns, documents their beginning
+        self.assertTrue(turns(2000).endswith(packed.texts["history"].strip()))
+        self.assertTrue(("document " * 5000).startswith(packed.texts["gripsbox"].strip()))
+
+    def test_unused_share_goes_to_other_sources(self):
+        sources = generation_sources("", turns(2000), "short", "")
+
+        packed = pack_context("gpt-4", sources, context_window=8192, reserved_output_tokens=1024)
+
+        self.assertEqual(packed.texts["gripsbox"], "short")
+        self.assertEqual(packed.total_tokens, packed.budget)
+
+    def test_priority_decides_who_gets_the_leftover(self):
+        sources = [
+            ContextSource("first", "a " * 1000, priority=1, share=0.0),
+            ContextSource("second", "b " * 1000, priority=2, share=0.0),
+        ]
+
+        packed = pack_context("gpt-4", sources, context_window=1000, reserved_output_tokens=0)
+
+        self.assertEqual(packed.kept_tokens["first"], min(packed.source_tokens["first"], packed.budget))
+        self.assertEqual(packed.kept_tokens["second"], packed.budget - packed.kept_tokens["first"])
+
+    def test_segments_are_ordered_from_stable_to_volatile(self):
+        sources = generation_sources("You are Hudini.", turns(2), "A document.", "Hello?",
+                                     clock="Today is 2024-10-01 and its: 12:00:00.")
+
+        packed = pack_context("gpt-4o", sources, context_window=128000)
+
+        self.assertEqual([segment.name for segment in packed.segments()],
+                         ["system_prompt", "gripsbox", "history", "clock"])
+        self.assertTrue(packed.system_message().startswith("You are Hudini.\n\nGripsbox Content:\nA document."))
+        self.assertTrue(packed.system_message().endswith("Today is 2024-10-01 and its: 12:00:00."))
+
+    def test_prefix_is_stable_between_requests(self):
+        first = pack_context("gpt-4o", generation_sources("You are Hudini.", turns(2), "A document.", "Hello?",
+                                                          clock="Today is 2024-10-01 and its: 12:00:00."), 128000)
+        second = pack_context("gpt-4o", generation_sources("You are Hudini.", turns(3), "A document.", "And?",
+                                                           clock="Today is 2024-10-01 and its: 12:00:07."), 128000)
+
+        # Only the appended turn and the clock differ, everything before is a shared prefix
+        prefix = first.system_message().rsplit("\n\n", 1)[0]
+        self.assertTrue(second.system_message().startswith(prefix))
+
+    def test_system_blocks_mark_cache_breakpoints(self):
+        packed = pack_context("claude-3-haiku-20240307",
+                              generation_sources("You are Hudini.", turns(2), "A document.", "Hello?", clock="now"),
+                              context_window=200000)
+
+        blocks = packed.system_blocks()
+
+        self.assertEqual([block.get("cache_control") for block in blocks],
+                         [None, {"type": "ephemeral"}, {"type": "ephemeral"}, None])
+        self.assertEqual("\n\n".join(block["text"] for block in blocks), packed.system_message())
+
+    def test_requested_max_tokens_are_reserved(self):
+        sources = generation_sources("", turns(2000), "", "")
+
+        self.assertEqual(pack_context("gpt-4", sources, context_window=8192).budget, 8192 - RESERVED_OUTPUT_TOKENS)
+        self.assertEqual(pack_context("gpt-4", sources, context_window=8192, reserved_output_tokens=100).budget, 8092)
+
+    def test_sources_are_tokenized_once_per_encoding(self):
+        sources = generation_sources("You are Hudini.", turns(20), "A document.", "Hello?")
+        token_cache = TokenCache()
+
+        encodings = {"gpt-4o": "o200k_base", "gpt-4o-mini": "o200k_base", "gpt-4": "cl100k_base"}
+
+        with patch.object(context_packer, "get_encoder", lambda model: FakeEncoder(encodings[model])), \
+                patch.object(context_packer, "_encode", wraps=context_packer._encode) as encode:
+            first = pack_context("gpt-4o", sources, 128000, token_cache=token_cache)
+            second = pack_context("gpt-4o-mini", sources, 128000, token_cache=token_cache)
+            pack_context("gpt-4", sources, 8192, token_cache=token_cache)
+
+        # gpt-4o and gpt-4o-mini share an encoding, gpt-4 has its own
+        self.assertEqual(encode.call_count, 2 * len(sources))
+        self.assertEqual(first.source_tokens, second.source_tokens)
+
+
+class TestPackContextAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_large_sources_are_tokenized_in_a_thread(self):
+        sources = generation_sources("You are Hudini.", turns(2000), "", "Hello?")
+
+        with patch.object(context_packer.asyncio, "to_thread", wraps=context_packer.asyncio.to_thread) as to_thread:
+            packed = await pack_context_async("gpt-4o", sources, 128000)
+
+        to_thread.assert_called_once()
+        self.assertEqual(packed.source_tokens, pack_context("gpt-4o", sources, 128000).source_tokens)
+
+    async def test_small_sources_are_packed_inline(self):
+        sources = generation_sources("You are Hudini.", turns(2), "", "Hello?")
+
+        with patch.object(context_packer.asyncio, "to_thread") as to_thread:
+            await pack_context_async("gpt-4o", sources, 128000)
+
+        to_thread.assert_not_called()
+
+
+class TestContextWindows(unittest.TestCase):
+    def test_every_chat_model_has_a_window(self):
+        for client in (OpenAIClient, OpenAIClientToolCalling):
+            for model in client.CHAT_MODELS:
+                with self.subTest(client=client.__name__, model=model):
+                    self.assertIn(model, client.MODEL_CONTEXT_WINDOWS)
+
+    def test_turbo_models_have_the_large_window(self):
+        for model in ('gpt-4-turbo', 'gpt-4-turbo-preview', 'gpt-4-1106-preview', 'gpt-4-turbo-2024-04-09'):
+            self.assertEqual(OpenAIClient.MODEL_CONTEXT_WINDOWS[model], 128000, model)
+
+    def test_unknown_models_get_the_window_of_their_family(self):
+        self.assertEqual(resolve_context_window('gpt-4o-2024-11-20'), 128000)
+        self.assertEqual(resolve_context_window('gpt-4-turbo-2025'), 128000)
+        self.assertEqual(resolve_context_window('gpt-4-0314'), 8192)
+        self.assertEqual(resolve_context_window('gpt-3.5-turbo-0613'), 16385)
+        self.assertEqual(resolve_context_window('claude-3-5-haiku-20241022'), 200000)
+        self.assertEqual(resolve_context_window('unknown-model'), DEFAULT_CONTEXT_WINDOW)
+        self.assertEqual(resolve_context_window('gpt-4o', 1000), 1000)
+
+    def test_packing_uses_the_family_window(self):
+        sources = generation_sources("You are Hudini.", turns(3000), "", "Hello?")
+
+        packed = pack_context('gpt-4o-2024-11-20', sources)
+
+        self.assertGreater(packed.total_tokens, DEFAULT_CONTEXT_WINDOW)
+        self.assertLessEqual(packed.total_tokens, 128000)
+
+
+if __name__ == '__main__':
+    unittest.main()
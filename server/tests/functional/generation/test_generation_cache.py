@@ -0,0 +1,132 @@
+import json
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from diskcache import FanoutCache
+
+from datetime import datetime
+
+from server.app.services.generation_cache_service import GenerationCacheService, clock_bucket
+from server.app.utils.stream_frames import StreamFrame, build_success_frame
+from server.app.utils.usage_tracker import UsageTracker
+
+
+def frames_for(content: str, finish_reason: str, request_id: str = "id") -> list:
+    usage = UsageTracker("gpt-4o", "prompt")
+    frames = []
+    for end in range(1, len(content) + 1):
+        frames.append(StreamFrame.from_model(build_success_frame(
+            id=request_id, model="gpt-4o", content=content[:end], usage=usage.usage(), completion_id="chatcmpl-test",
+            created=0, object="chat.completion.chunk",
+            finish_reason=finish_reason if end == len(content) else None, seq=end - 1
+        ), "gpt-4o"))
+    return frames
+
+
+class TestGenerationCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        fanout = FanoutCache(directory=directory.name, shards=2)
+        self.addCleanup(fanout.close)
+        self.service = GenerationCacheService(fanout, enabled=True, ttl=60)
+        self.key = GenerationCacheService.build_key("gpt-4o", 0.7, "system", "context", "prompt", "cumulative")
+
+    def provider(self, frames: list) -> AsyncMock:
+        async def stream():
+            for frame in frames:
+                yield frame
+
+        return AsyncMock(side_effect=lambda: stream())
+
+    async def collect(self, fetch, request_id: str = "id") -> list:
+        return [frame.data async for frame in self.service.stream(self.key, "gpt-4o", request_id, fetch)]
+
+    async def test_cached_answer_is_replayed_as_same_frame_stream(self):
+        frames = frames_for("Hello", "stop")
+        fetch = self.provider(frames)
+
+        first = await self.collect(fetch)
+        second = await self.collect(fetch)
+
+        self.assertEqual(fetch.await_count, 1)
+        self.assertEqual(first, [frame.data for frame in frames])
+        self.assertEqual([json.loads(data)["completion"]["choices"] for data in second],
+                         [json.loads(data)["completion"]["choices"] for data in first])
+        self.assertEqual(self.service.stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    async def test_replayed_frames_belong_to_the_current_request(self):
+        fetch = self.provider(frames_for("Hello", "stop", request_id="first-prompt"))
+        await self.collect(fetch, request_id="first-prompt")
+
+        replayed = [json.loads(data) for data in await self.collect(fetch, request_id="second-prompt")]
+
+        self.assertEqual(fetch.await_count, 1)
+        self.assertEqual([frame["id"] for frame in replayed], ["second-prompt"] * 5)
+        self.assertEqual([frame["seq"] for frame in replayed], list(range(5)))
+        self.assertEqual(replayed[-1]["completion"]["choices"][0]["message"]["content"], "Hello")
+        # created was 0 when the answer was generated
+        self.assertGreater(replayed[0]["completion"]["created"], 0)
+        self.assertGreater(replayed[0]["completion"]["usage"]["started"], 0)
+
+    async def test_answers_that_ran_a_tool_are_not_cached(self):
+        # The tool call finishes in the middle of the stream, the answer after it ends normally
+        frames = frames_for("Hi", "function_call") + frames_for("Sunny, 21 degrees", "stop")
+        fetch = self.provider(frames)
+
+        await self.collect(fetch)
+        await self.collect(fetch)
+
+        self.assertEqual(fetch.await_count, 2)
+
+    async def test_incomplete_answers_are_not_cached(self):
+        for finish_reason in ("error", "function_call"):
+            fetch = self.provider(frames_for("Hello", finish_reason))
+            await self.collect(fetch)
+            await self.collect(fetch)
+            self.assertEqual(fetch.await_count, 2, finish_reason)
+
+    async def test_answers_above_entry_limit_are_not_cached(self):
+        self.service.max_entry_bytes = 100
+        fetch = self.provider(frames_for("Hello", "stop"))
+
+        await self.collect(fetch)
+        await self.collect(fetch)
+
+        self.assertEqual(fetch.await_count, 2)
+
+    def test_key_depends_on_context_and_temperature(self):
+        other_context = GenerationCacheService.build_key("gpt-4o", 0.7, "system", "other", "prompt", "cumulative")
+        other_temperature = GenerationCacheService.build_key("gpt-4o", 0.2, "system", "context", "prompt", "cumulative")
+        other_max_tokens = GenerationCacheService.build_key("gpt-4o", 0.7, "system", "context", "prompt", "cumulative",
+                                                            max_tokens=100)
+        self.assertEqual(len({self.key, other_context, other_temperature, other_max_tokens}), 4)
+
+    def test_key_depends_on_the_clock(self):
+        def key_at(hour: int, minute: int, second: int) -> str:
+            clock = clock_bucket(datetime(2024, 12, 20, hour, minute, second), granularity=60)
+            return GenerationCacheService.build_key("gpt-4o", 0.7, "system", "context", "prompt", "cumulative",
+                                                    clock=clock)
+
+        self.assertEqual(key_at(10, 15, 1), key_at(10, 15, 59))
+        self.assertNotEqual(key_at(10, 15, 59), key_at(10, 16, 0))
+
+    async def test_user_setting(self):
+        for value, setting in ((False, False), ("true", True), (None, None)):
+            db = SimpleNamespace(execute=AsyncMock(return_value=SimpleNamespace(scalar=lambda: value)))
+            self.assertIs(await self.service.get_user_setting(db, "user"), setting)
+
+    def test_only_deterministic_or_opted_in_answers_are_cached(self):
+        self.assertTrue(self.service.should_cache(None, 0))
+        self.assertFalse(self.service.should_cache(None, 0.7))
+        self.assertTrue(self.service.should_cache(True, 0.7))
+        self.assertFalse(self.service.should_cache(False, 0))
+
+        self.service.enabled = False
+        self.assertFalse(self.service.should_cache(True, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
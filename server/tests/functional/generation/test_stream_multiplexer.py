@@ -0,0 +1,89 @@
+import asyncio
+import time
+import unittest
+
+from server.app.utils.stream_multiplexer import merge_streams
+
+
+async def model_stream(name: str, frames: int, first_byte_delay: float, frame_delay: float, produced: list = None):
+    await asyncio.sleep(first_byte_delay)
+    for seq in range(frames):
+        if seq:
+            await asyncio.sleep(frame_delay)
+        if produced is not None:
+            produced.append(seq)
+        yield name, seq
+
+
+class TestStreamMultiplexer(unittest.IsolatedAsyncioTestCase):
+    async def test_time_to_first_byte_is_independent_of_other_models(self):
+        """A slow model must not delay the first frame of the other models."""
+        started = time.perf_counter()
+        first_byte = {}
+        received = {"slow": [], "fast": [], "long": []}
+
+        streams = [
+            model_stream("slow", frames=3, first_byte_delay=0.5, frame_delay=0.1),
+            model_stream("fast", frames=3, first_byte_delay=0.02, frame_delay=0.01),
+            model_stream("long", frames=50, first_byte_delay=0.05, frame_delay=0.01),
+        ]
+        async for name, seq in merge_streams(streams):
+            first_byte.setdefault(name, time.perf_counter() - started)
+            received[name].append(seq)
+
+        self.assertLess(first_byte["fast"], 0.15)
+        self.assertLess(first_byte["long"], 0.15)
+        self.assertGreaterEqual(first_byte["slow"], 0.5)
+
+        # Order within every model is kept
+        self.assertEqual(received["slow"], list(range(3)))
+        self.assertEqual(received["fast"], list(range(3)))
+        self.assertEqual(received["long"], list(range(50)))
+
+    async def test_ready_models_are_served_round_robin(self):
+        """When every model has frames ready, no model can starve the others."""
+        streams = [model_stream(name, frames=4, first_byte_delay=0, frame_delay=0) for name in ("a", "b", "c")]
+        await asyncio.sleep(0)
+
+        order = [name async for name, seq in merge_streams(streams)]
+
+        for window in range(0, 12, 3):
+            self.assertEqual(sorted(order[window:window + 3]), ["a", "b", "c"], order)
+
+    async def test_fast_model_is_backpressured_per_model(self):
+        """A model whose frames are not consumed stops producing once its buffer is full."""
+        produced = []
+        merged = merge_streams([model_stream("fast", frames=100, first_byte_delay=0, frame_delay=0, produced=produced)],
+                               maxsize=4)
+
+        await merged.__anext__()
+        await asyncio.sleep(0.1)
+        await merged.aclose()
+
+        self.assertLessEqual(len(produced), 4 + 2)
+
+    async def test_error_in_one_model_does_not_abort_the_others(self):
+        async def failing_stream():
+            yield "failing", 0
+            raise RuntimeError("provider failed")
+
+        merged = merge_streams([failing_stream(), model_stream("ok", 3, 0, 0.01)],
+                               on_error=lambda index, error: ("error", str(error)))
+        items = [item async for item in merged]
+
+        self.assertIn(("failing", 0), items)
+        self.assertIn(("error", "provider failed"), items)
+        self.assertEqual([seq for name, seq in items if name == "ok"], [0, 1, 2])
+
+    async def test_error_without_handler_ends_only_the_failing_stream(self):
+        async def failing_stream():
+            raise RuntimeError("provider failed")
+            yield
+
+        items = [item async for item in merge_streams([failing_stream(), model_stream("ok", 3, 0, 0.01)])]
+
+        self.assertEqual(items, [("ok", 0), ("ok", 1), ("ok", 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
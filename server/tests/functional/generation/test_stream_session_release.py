@@ -0,0 +1,151 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+from server.app.routers.generation.anthropic_generation_router import router as anthropic_router
+from server.app.routers.generation.google_ai_generation_router import router as google_ai_router
+from server.app.services.api_key_service import api_key_cache
+from server.app.utils.stream_frames import StreamFrame
+
+USER = SimpleNamespace(uuid="00000000-0000-0000-0000-000000000001", username="hudini")
+
+MODEL = {
+    "id": "model-1",
+    "platform": "test",
+    "model": "test-model",
+    "object": "model",
+    "category": "text_completion",
+    "description": "Test model",
+}
+
+
+class FakeResult:
+    def scalars(self):
+        return SimpleNamespace(first=lambda: SimpleNamespace(id="key-id", user_relationship=USER))
+
+
+class FakeSession:
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+        self.holds_connection = False
+        self.closed_by_handler = False
+
+    async def __aenter__(self):
+        self.holds_connection = True
+        self.pool.checked_out += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+        return False
+
+    async def close(self):
+        self.closed_by_handler = True
+        self.release()
+
+    def release(self):
+        if self.holds_connection:
+            self.holds_connection = False
+            self.pool.checked_out -= 1
+
+    async def execute(self, statement):
+        await asyncio.sleep(0.01)
+        return FakeResult()
+
+
+class FakePool:
+    """Stands in for async_session_maker and counts the connections checked out at the same time."""
+
+    def __init__(self):
+        self.sessions = []
+        self.checked_out = 0
+
+    def __call__(self):
+        session = FakeSession(self)
+        self.sessions.append(session)
+        return session
+
+
+class SlowClient:
+    """
+    Provider client whose streams wait until all requests are streaming, then records the checked out
+    connections per frame.
+    """
+
+    def __init__(self, pool: FakePool, streams: int):
+        self.pool = pool
+        self.streams = streams
+        self.started = 0
+        self.all_started = asyncio.Event()
+        self.checked_out_while_streaming = []
+
+    async def generate(self, models, request, context=""):
+        self.started += 1
+        if self.started == self.streams:
+            self.all_started.set()
+        await self.all_started.wait()
+        for i in range(5):
+            await asyncio.sleep(0.02)
+            self.checked_out_while_streaming.append(self.pool.checked_out)
+            yield StreamFrame(model=models[0].id, data=f'{{"chunk": {i}}}\n'.encode("utf-8"))
+
+
+class FakeThreadContext:
+    async def get(self, db, user_uuid, thread_id):
+        await db.execute("select history")
+        return "history"
+
+
+class TestStreamSessionRelease(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pool = FakePool()
+        patcher = patch("server.app.db.get_db.async_session_maker", new=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        api_key_cache.clear()
+        self.addCleanup(api_key_cache.clear)
+
+        self.requests = 40
+        self.client = SlowClient(self.pool, self.requests)
+        self.app = FastAPI()
+        self.app.include_router(anthropic_router)
+        self.app.include_router(google_ai_router)
+        self.app.state.clients = SimpleNamespace(anthropic=self.client, google_ai=self.client)
+        self.app.state.thread_context = FakeThreadContext()
+
+    async def stream_concurrently(self, path: str):
+        payload = {"id": "request-1", "prompt": "Hello", "models": [MODEL]}
+        transport = httpx.ASGITransport(app=self.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post(path, params={"api_key": "key"}, json=payload) for _ in range(self.requests)
+            ))
+
+    async def assert_released_before_streaming(self, path: str):
+        requests = self.requests
+
+        responses = await asyncio.wait_for(self.stream_concurrently(path), timeout=10)
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertTrue(all(response.text.count("chunk") == 5 for response in responses))
+        # All streams run at the same time and none of them holds a connection
+        self.assertEqual(len(self.client.checked_out_while_streaming), requests * 5)
+        self.assertEqual(set(self.client.checked_out_while_streaming), {0})
+        # Released by the handler itself, independent of when FastAPI tears down get_db
+        self.assertEqual(len(self.pool.sessions), requests)
+        self.assertTrue(all(session.closed_by_handler for session in self.pool.sessions))
+        self.assertEqual(self.pool.checked_out, 0)
+
+    async def test_anthropic_stream_releases_the_connection(self):
+        await self.assert_released_before_streaming("/stream/anthropic")
+
+    async def test_google_ai_stream_releases_the_connection(self):
+        await self.assert_released_before_streaming("/stream/google-ai")
+
+
+if __name__ == '__main__':
+    unittest.main()
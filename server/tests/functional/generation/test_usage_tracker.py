@@ -0,0 +1,97 @@
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from server.app.clients.openai.openai_client import OpenAIClient
+from server.app.models.generation.openai_model import OpenaiModel
+from server.app.utils.usage_tracker import UsageTracker, reported_cached_tokens
+
+
+def chunk(content=None, finish_reason=None, usage=None):
+    choices = []
+    if content is not None or finish_reason is not None:
+        choices = [SimpleNamespace(
+            delta=SimpleNamespace(content=content, role="assistant", function_call=None),
+            finish_reason=finish_reason,
+            index=0
+        )]
+    return SimpleNamespace(id="chatcmpl-test", created=0, object="chat.completion.chunk", choices=choices, usage=usage)
+
+
+class FakeOpenAIStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self.chunks:
+            yield item
+
+
+class TestUsageTracker(unittest.TestCase):
+    def test_deltas_are_counted_incrementally(self):
+        deltas = ["Spaces", "? ", "SPACES", "? Tabs are", " the one true way."]
+        tracker = UsageTracker("gpt-4o", "Write a rant about tabs.")
+
+        for delta in deltas:
+            tracker.add(delta)
+
+        usage = tracker.usage()
+        self.assertEqual(usage.completion_tokens, sum(tracker.count(delta) for delta in deltas))
+        self.assertEqual(usage.prompt_tokens, tracker.count("Write a rant about tabs."))
+        self.assertEqual(usage.total_tokens, usage.prompt_tokens + usage.completion_tokens)
+
+    def test_reported_usage_wins(self):
+        tracker = UsageTracker("claude-3-5-sonnet-20240620", "prompt")
+        tracker.add("some streamed text")
+
+        tracker.report(prompt_tokens=120, completion_tokens=42)
+        tracker.add("late delta")
+
+        usage = tracker.usage()
+        self.assertEqual((usage.prompt_tokens, usage.completion_tokens, usage.total_tokens), (120, 42, 162))
+        self.assertIsNone(usage.cached_tokens)
+
+    def test_cached_tokens_are_reported(self):
+        tracker = UsageTracker("gpt-4o", "prompt")
+
+        tracker.report(prompt_tokens=2048, completion_tokens=10, cached_tokens=1920)
+
+        self.assertEqual(tracker.usage().cached_tokens, 1920)
+        self.assertEqual(reported_cached_tokens(SimpleNamespace(prompt_tokens_details=SimpleNamespace(cached_tokens=64))), 64)
+        self.assertIsNone(reported_cached_tokens(SimpleNamespace(prompt_tokens=10)))
+
+
+class TestOpenAIStreamUsage(unittest.IsolatedAsyncioTestCase):
+    async def test_final_frame_carries_provider_usage(self):
+        client = OpenAIClient(api_key="test-key")
+        stream = FakeOpenAIStream([
+            chunk("Hello"),
+            chunk(" world"),
+            chunk("", finish_reason="stop"),
+            chunk(usage=SimpleNamespace(prompt_tokens=321, completion_tokens=2,
+                                        prompt_tokens_details={"cached_tokens": 256})),
+        ])
+        create = AsyncMock(return_value=stream)
+        client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+        generator = await client.fetch_completion(
+            OpenaiModel(id="gpt-4o", object="model", model="gpt-4o"),
+            "prompt", "id", context="", use_tool=False, user_system_prompt="system prompt"
+        )
+        frames = [json.loads(frame.data) async for frame in generator]
+
+        self.assertEqual(create.call_args.kwargs["stream_options"], {"include_usage": True})
+        final = frames[-1]["completion"]
+        self.assertEqual(final["choices"][0]["message"]["content"], "Hello world")
+        self.assertEqual(final["usage"]["prompt_tokens"], 321)
+        self.assertEqual(final["usage"]["completion_tokens"], 2)
+        self.assertEqual(final["usage"]["total_tokens"], 323)
+        self.assertEqual(final["usage"]["cached_tokens"], 256)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+from server.app.utils.extractive_summary import build_digest, outline, split_sentences, summarize
+
+VOCABULARY = ["apple", "bridge", "candle", "desert", "engine", "forest", "garden", "hammer", "island", "jacket",
+              "kettle", "ladder", "meadow", "needle", "orange", "pepper", "quartz", "river", "saddle", "tunnel",
+              "umbrella", "valley", "window", "yogurt", "zipper", "anchor", "basket", "canyon", "dollar", "eagle"]
+KEY = "The drone fleet needs new batteries because drone flights over the harbour drain drone batteries quickly."
+
+
+def filler(i: int) -> str:
+    """Sentences without a common subject: every word occurs once in the document."""
+    size = len(VOCABULARY)
+    words = [VOCABULARY[k % size] + VOCABULARY[k // size % size] + VOCABULARY[k // size ** 2]
+             for k in range(i * 8, i * 8 + 8)]
+    return " ".join(words).capitalize() + "."
+
+
+def document(paragraphs: int) -> str:
+    parts = ["# Drone Operations", "1. Batteries"]
+    for i in range(paragraphs):
+        parts.append(KEY.replace("quickly", f"quickly {VOCABULARY[i % 30]}") if i % 10 == 3 else filler(i))
+    parts.append("2. Harbour Flights")
+    return "\n\n".join(parts)
+
+
+class TestExtractiveSummary(unittest.TestCase):
+    def test_sentences_are_split_on_sentence_ends(self):
+        self.assertEqual(split_sentences("First one. Second one! Third?\n\nNew paragraph"),
+                         ["First one.", "Second one!", "Third?", "New paragraph"])
+
+    def test_summary_prefers_sentences_with_frequent_terms(self):
+        text = " ".join([filler(i) for i in range(20)] + [KEY])
+
+        summary = summarize(text, max_sentences=1)
+
+        self.assertEqual(summary, KEY)
+
+    def test_repeated_sentences_are_selected_once(self):
+        text = " ".join([filler(i) for i in range(20)] + [KEY] * 3)
+
+        summary = summarize(text, max_sentences=3)
+
+        self.assertEqual(summary.count(KEY), 1)
+
+    def test_summary_keeps_document_order(self):
+        sentences = [f"Sentence number {i} talks about drone batteries and the harbour." for i in range(30)]
+
+        summary = summarize(" ".join(sentences), max_sentences=5)
+
+        positions = [sentences.index(sentence + ".") for sentence in summary.split(".")[:-1]
+                     if sentence + "." in sentences]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_outline_finds_headings(self):
+        text = "# Overview\nSome text that is a sentence.\n2.1 Setup Steps\nINSTALLATION\nA line ending with a period."
+
+        self.assertEqual(outline(text), ["Overview", "2.1 Setup Steps", "INSTALLATION"])
+
+    def test_digest_of_large_document_is_much_shorter(self):
+        text = document(200)
+
+        digest = build_digest(text)
+
+        self.assertTrue(digest.startswith("Outline:\n- Drone Operations\n- 1. Batteries\n- 2. Harbour Flights"))
+        self.assertIn("Summary:\n", digest)
+        self.assertIn("The drone fleet needs new batteries", digest)
+        self.assertLess(len(digest), len(text) / 5)
+
+    def test_small_document_is_not_summarized(self):
+        self.assertEqual(build_digest(f"  {KEY}\n"), KEY)
+
+
+if __name__ == '__main__':
+    unittest.main()
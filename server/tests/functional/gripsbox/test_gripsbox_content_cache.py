@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+from server.app.utils.file_content_cache import FileContentCache
+
+
+class TestFileContentCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name: str, content: str, mtime: int = None) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    async def test_unchanged_file_is_read_once(self):
+        cache = FileContentCache(max_bytes=1024)
+        path = self.write("notes.txt", "hello gripsbox")
+
+        for _ in range(5):
+            self.assertEqual(await cache.read(path), "hello gripsbox")
+
+        self.assertEqual((cache.hits, cache.misses), (4, 1))
+
+    async def test_changed_file_is_read_again(self):
+        cache = FileContentCache(max_bytes=1024)
+        path = self.write("notes.txt", "first", mtime=1000)
+        await cache.read(path)
+
+        self.write("notes.txt", "second", mtime=2000)
+
+        self.assertEqual(await cache.read(path), "second")
+        self.assertEqual(cache.misses, 2)
+
+    async def test_least_recently_used_files_are_evicted_within_budget(self):
+        cache = FileContentCache(max_bytes=25)
+        first = self.write("a.txt", "a" * 10)
+        second = self.write("b.txt", "b" * 10)
+        third = self.write("c.txt", "c" * 10)
+
+        await cache.read(first)
+        await cache.read(second)
+        await cache.read(first)
+        await cache.read(third)
+
+        self.assertLessEqual(cache.size, 25)
+        self.assertEqual(list(cache.entries), [first, third])
+
+    async def test_files_above_budget_are_not_cached(self):
+        cache = FileContentCache(max_bytes=5)
+        path = self.write("big.txt", "x" * 10)
+
+        self.assertEqual(await cache.read(path), "x" * 10)
+        self.assertEqual(cache.entries, {})
+
+    async def test_invalidate_drops_entry(self):
+        cache = FileContentCache(max_bytes=1024)
+        path = self.write("notes.txt", "hello")
+        await cache.read(path)
+
+        cache.invalidate(path)
+
+        self.assertEqual((cache.size, len(cache.entries)), (0, 0))
+
+    async def test_missing_file_raises(self):
+        cache = FileContentCache(max_bytes=1024)
+        with self.assertRaises(FileNotFoundError):
+            await cache.read(os.path.join(self.directory, "missing.txt"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import asyncio
+import tempfile
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from server.app.services.gripsbox_index_service import (EmbedderLoader, EmbeddingModelUnavailable, GripsboxIndex,
+                                                        GripsboxIndexService, hashing_embedder)
+from server.app.services import gripsbox_service
+from server.app.services.gripsbox_service import (GripsboxIndexPending, load_relevant_gripsbox_chunks,
+                                                  schedule_gripsbox_indexing)
+from server.app.utils.text_chunker import chunk_text
+
+
+def paragraph(topic: str, words: int = 50) -> str:
+    return " ".join([topic] + ["filler"] * (words - 1))
+
+
+class TestChunkText(unittest.TestCase):
+    def test_short_paragraphs_are_packed_together(self):
+        chunks = chunk_text("one two\n\nthree four\n\nfive", max_words=4, overlap_words=1)
+
+        self.assertEqual([chunk.text for chunk in chunks], ["one two\n\nthree four", "five"])
+
+    def test_long_paragraphs_are_split_with_overlap(self):
+        words = [f"w{i}" for i in range(10)]
+
+        chunks = chunk_text(" ".join(words), max_words=4, overlap_words=1)
+
+        self.assertEqual([chunk.text.split() for chunk in chunks],
+                         [words[0:4], words[3:7], words[6:10]])
+        self.assertEqual([chunk.index for chunk in chunks], [0, 1, 2])
+
+    def test_empty_text_has_no_chunks(self):
+        self.assertEqual(chunk_text("  \n\n "), [])
+
+
+class TestGripsboxIndex(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.folder = directory.name
+        self.index = GripsboxIndex(self.folder, hashing_embedder())
+        text = "\n\n".join(paragraph(topic, 150) for topic in ("invoice", "drone", "podcast"))
+        self.index.add_document("a", "a.txt", text)
+        self.index.add_document("b", "b.txt", paragraph("contract", 150))
+
+    def test_search_returns_the_relevant_chunk(self):
+        results = self.index.search("contract", k=1)
+
+        self.assertEqual([(chunk.gripsbox_id, chunk.name) for chunk in results], [("b", "b.txt")])
+
+    def test_search_is_restricted_to_allowed_documents(self):
+        results = self.index.search("contract", k=2, allowed=["a"])
+
+        self.assertTrue(results)
+        self.assertTrue(all(chunk.gripsbox_id == "a" for chunk in results))
+        self.assertEqual(self.index.search("contract", k=2, allowed=[]), [])
+
+    def test_removed_document_is_not_found(self):
+        self.index.remove_document("b")
+
+        self.assertEqual(self.index.documents(), {"a"})
+        self.assertTrue(all(chunk.gripsbox_id == "a" for chunk in self.index.search("contract", k=5)))
+
+    def test_index_is_loaded_from_disk(self):
+        reloaded = GripsboxIndex(self.folder, hashing_embedder())
+
+        self.assertEqual(reloaded.documents(), {"a", "b"})
+        self.assertEqual(reloaded.search("drone", k=1)[0].text, paragraph("drone", 150))
+
+    def test_adding_a_document_again_replaces_it(self):
+        self.index.add_document("b", "b.txt", paragraph("budget", 20))
+
+        results = self.index.search("budget", k=5, allowed=["b"])
+        self.assertEqual([chunk.text for chunk in results], [paragraph("budget", 20)])
+
+
+class TestGripsboxIndexService(unittest.IsolatedAsyncioTestCase):
+    async def test_embedding_model_is_not_loaded_for_deletes(self):
+        loads = []
+
+        def embedder():
+            loads.append(1)
+            return hashing_embedder()
+
+        service = GripsboxIndexService(embedder=embedder)
+        with tempfile.TemporaryDirectory() as folder:
+            await service.remove_document(folder, "missing")
+            self.assertEqual(loads, [])
+
+            await service.add_document(folder, "a", "a.txt", "hello gripsbox")
+            results = await service.search(folder, "hello", 3, ["a"])
+
+        self.assertEqual([chunk.text for chunk in results], ["hello gripsbox"])
+        self.assertEqual(len(loads), 2)
+
+
+class TestEmbedderLoader(unittest.TestCase):
+    def failing_load(self):
+        self.loads += 1
+        if self.loads == 1:
+            raise OSError("model not found")
+        return hashing_embedder()
+
+    def setUp(self):
+        self.loads = 0
+
+    def test_failed_load_is_not_retried_during_the_cool_down(self):
+        loader = EmbedderLoader(self.failing_load, retry_seconds=60)
+
+        with self.assertLogs("server.app.services.gripsbox_index_service", level="ERROR") as logs:
+            for _ in range(5):
+                with self.assertRaises(EmbeddingModelUnavailable):
+                    loader()
+
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(len(logs.records), 1)
+        self.assertFalse(loader.available())
+        self.assertFalse(GripsboxIndexService(embedder=loader).available())
+
+    def test_load_is_retried_after_the_cool_down(self):
+        loader = EmbedderLoader(self.failing_load, retry_seconds=0)
+
+        with self.assertLogs("server.app.services.gripsbox_index_service", level="ERROR"):
+            with self.assertRaises(EmbeddingModelUnavailable):
+                loader()
+
+        self.assertIs(loader(), loader())
+        self.assertEqual(self.loads, 2)
+        self.assertTrue(loader.available())
+
+
+class TestBackgroundIndexing(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.release = asyncio.Event()
+
+        async def slow_index(*args):
+            await self.release.wait()
+
+        patcher = patch.object(gripsbox_service, "index_gripsbox_file", AsyncMock(side_effect=slow_index))
+        self.index_file = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_a_file_is_indexed_once_at_a_time(self):
+        first = schedule_gripsbox_indexing("user", "a", "a.txt", "/a.txt")
+        second = schedule_gripsbox_indexing("user", "a", "a.txt", "/a.txt")
+
+        self.assertIs(first, second)
+        self.release.set()
+        await first
+        self.assertEqual(self.index_file.await_count, 1)
+        self.assertNotIn("a", gripsbox_service.gripsbox_indexing)
+
+    async def test_missing_files_are_indexed_without_waiting(self):
+        entry = SimpleNamespace(id=uuid.uuid4(), name="a.txt", type="txt", summary_mode=False)
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = [entry]
+        db = SimpleNamespace(execute=AsyncMock(return_value=result))
+
+        with patch.object(gripsbox_service.gripsbox_index_service, "indexed_documents",
+                          AsyncMock(return_value=set())):
+            with self.assertRaises(GripsboxIndexPending):
+                await load_relevant_gripsbox_chunks("user", "prompt", db=db)
+
+        # The request falls back to the full files while the index is built
+        self.assertIn(str(entry.id), gripsbox_service.gripsbox_indexing)
+        self.release.set()
+        await gripsbox_service.gripsbox_indexing[str(entry.id)]
+        self.index_file.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi import HTTPException
+
+from server.app.routers.gripsbox.gripsbox_router import (get_gripsbox_summary, update_gripsbox_summary_mode,
+                                                         GripsboxSummaryModeUpdateModel)
+
+
+def fake_db(gripsbox):
+    result = MagicMock()
+    result.scalars.return_value.first.return_value = gripsbox
+    return SimpleNamespace(execute=AsyncMock(return_value=result), commit=AsyncMock())
+
+
+class TestGripsboxSummaryAccess(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.user = SimpleNamespace(uuid=uuid.uuid4())
+        self.id = uuid.uuid4()
+
+    def assert_filtered_by_owner(self, db):
+        statement = db.execute.await_args.args[0]
+        params = statement.compile().params
+        self.assertIn(self.id, params.values())
+        self.assertIn(self.user.uuid, params.values())
+
+    async def test_summary_of_another_user_is_not_found(self):
+        db = fake_db(None)
+
+        with self.assertRaises(HTTPException) as raised:
+            await get_gripsbox_summary(self.id, db=db, user=self.user)
+
+        self.assertEqual(raised.exception.status_code, 404)
+        self.assert_filtered_by_owner(db)
+
+    async def test_summary_mode_of_another_user_is_not_changed(self):
+        db = fake_db(None)
+
+        with self.assertRaises(HTTPException) as raised:
+            await update_gripsbox_summary_mode(self.id, GripsboxSummaryModeUpdateModel(summary_mode=True),
+                                               db=db, user=self.user)
+
+        self.assertEqual(raised.exception.status_code, 404)
+        self.assert_filtered_by_owner(db)
+        db.commit.assert_not_awaited()
+
+    async def test_owner_can_change_summary_mode(self):
+        gripsbox = SimpleNamespace(summary_mode=False)
+        db = fake_db(gripsbox)
+
+        await update_gripsbox_summary_mode(self.id, GripsboxSummaryModeUpdateModel(summary_mode=True),
+                                           db=db, user=self.user)
+
+        self.assertTrue(gripsbox.summary_mode)
+        db.commit.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from server.app.services.gripsbox_service import create_gripsbox_fingerprints, load_gripsbox_fingerprints
+from server.app.utils.simhash import ParagraphDeduplicator, fingerprint_paragraphs, hamming_distance, simhash
+
+PARAGRAPHS = [
+    "The drone fleet is inspected every Monday before the first flight over the harbour starts. The inspection "
+    "covers propellers, motors and the landing gear and is recorded in the maintenance log of each drone.",
+    "Batteries are replaced after two hundred charge cycles or when their capacity drops below eighty percent. "
+    "Replaced batteries are discharged to storage voltage and handed over to the recycling partner every month.",
+    "Pilots report every incident to the operations desk within one hour, including near misses and lost links. "
+    "The desk decides whether the remaining flights of the day are cancelled or continue with a second observer.",
+]
+VERSION_1 = "\n\n".join(PARAGRAPHS)
+# Second version of the document: reflowed first paragraph, other punctuation and case, one new paragraph
+VERSION_2 = "\n\n".join([
+    PARAGRAPHS[0].replace(" before ", "\nbefore "),
+    PARAGRAPHS[1].replace("eighty percent.", "Eighty Percent;"),
+    PARAGRAPHS[2],
+    "Since version two every flight plan needs a second signature from the shift supervisor on duty.",
+])
+
+
+class TestSimhash(unittest.TestCase):
+    def test_near_duplicates_have_close_fingerprints(self):
+        self.assertLessEqual(hamming_distance(simhash(PARAGRAPHS[0]), simhash(PARAGRAPHS[0].upper())), 3)
+        self.assertGreater(hamming_distance(simhash(PARAGRAPHS[0]), simhash(PARAGRAPHS[1])), 10)
+
+    def test_short_paragraphs_are_not_fingerprinted(self):
+        self.assertEqual(fingerprint_paragraphs("Chapter 1\n\n" + PARAGRAPHS[0])[0], 0)
+
+
+class TestParagraphDeduplicator(unittest.TestCase):
+    def test_second_version_keeps_only_new_paragraphs(self):
+        deduplicator = ParagraphDeduplicator()
+
+        first = deduplicator.deduplicate("v1.txt", VERSION_1)
+        second = deduplicator.deduplicate("v2.txt", VERSION_2)
+
+        self.assertEqual(first, VERSION_1)
+        self.assertTrue(second.startswith("Since version two"))
+        self.assertEqual(deduplicator.removed_paragraphs, 3)
+        self.assertEqual(deduplicator.documents, {"v2.txt"})
+        self.assertGreater(deduplicator.removed_tokens, 30)
+
+    def test_identical_document_is_removed_completely(self):
+        deduplicator = ParagraphDeduplicator()
+        deduplicator.deduplicate("a.txt", VERSION_1)
+
+        self.assertEqual(deduplicator.deduplicate("copy.txt", VERSION_1), "")
+        self.assertEqual(deduplicator.removed_paragraphs, 3)
+
+    def test_edited_paragraphs_are_kept(self):
+        deduplicator = ParagraphDeduplicator()
+        deduplicator.deduplicate("a.txt", VERSION_1)
+        edited = PARAGRAPHS[2].replace("within one hour", "immediately after landing")
+
+        self.assertEqual(deduplicator.deduplicate("b.txt", edited), edited)
+
+    def test_repeated_short_lines_are_kept(self):
+        deduplicator = ParagraphDeduplicator()
+        deduplicator.deduplicate("a.txt", "Kind regards\n\n" + PARAGRAPHS[0])
+
+        self.assertEqual(deduplicator.deduplicate("b.txt", "Kind regards\n\n" + PARAGRAPHS[1]),
+                         "Kind regards\n\n" + PARAGRAPHS[1])
+
+    def test_outdated_fingerprints_are_recomputed(self):
+        deduplicator = ParagraphDeduplicator()
+        deduplicator.deduplicate("a.txt", VERSION_1)
+
+        self.assertEqual(deduplicator.deduplicate("b.txt", VERSION_1, fingerprints=[1, 2]), "")
+
+
+class TestStoredFingerprints(unittest.IsolatedAsyncioTestCase):
+    async def test_fingerprints_are_stored_next_to_the_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            text_path = os.path.join(folder, "manual.txt")
+            with open(text_path, "w", encoding="utf-8") as file:
+                file.write(VERSION_1)
+
+            with patch("server.app.services.gripsbox_service.get_users_gripsbox_folder", return_value=folder):
+                created = await create_gripsbox_fingerprints("user", "manual.txt", text_path)
+                loaded = await load_gripsbox_fingerprints("user", "manual.txt")
+
+            self.assertTrue(os.path.exists(os.path.join(folder, "manual_fingerprints.json")))
+            self.assertEqual(created, fingerprint_paragraphs(VERSION_1))
+            self.assertEqual(loaded, created)
+
+    async def test_missing_fingerprints_are_computed_on_first_use(self):
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, "old.txt"), "w", encoding="utf-8") as file:
+                file.write(VERSION_2)
+
+            with patch("server.app.services.gripsbox_service.get_users_gripsbox_folder", return_value=folder):
+                loaded = await load_gripsbox_fingerprints("user", "old.txt")
+
+            self.assertEqual(loaded, fingerprint_paragraphs(VERSION_2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from diskcache import FanoutCache
+
+from server.app.services.system_prompt_service import SystemPromptService
+
+
+def fake_db(value):
+    return SimpleNamespace(execute=AsyncMock(return_value=SimpleNamespace(scalar=lambda: value)))
+
+
+class TestSystemPromptService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = FanoutCache(directory=directory.name, shards=2)
+        self.addCleanup(cache.close)
+        self.service = SystemPromptService(cache)
+
+    async def test_prompt_is_queried_once(self):
+        db = fake_db("You are Hudini.")
+
+        prompts = [await self.service.get(db, "user") for _ in range(3)]
+
+        self.assertEqual(prompts, ["You are Hudini."] * 3)
+        self.assertEqual(db.execute.await_count, 1)
+
+    async def test_missing_prompt_is_cached_too(self):
+        db = fake_db(None)
+
+        self.assertIsNone(await self.service.get(db, "user"))
+        self.assertIsNone(await self.service.get(db, "user"))
+        self.assertEqual(db.execute.await_count, 1)
+
+    async def test_invalidate_loads_the_new_prompt(self):
+        await self.service.get(fake_db("old"), "user")
+
+        await self.service.invalidate("user")
+
+        self.assertEqual(await self.service.get(fake_db("new"), "user"), "new")
+
+    async def test_prompts_are_scoped_to_user(self):
+        await self.service.get(fake_db("mine"), "user")
+
+        self.assertEqual(await self.service.get(fake_db("theirs"), "other-user"), "theirs")
+
+    async def test_database_errors_are_not_cached(self):
+        failing = SimpleNamespace(execute=AsyncMock(side_effect=RuntimeError("connection lost")))
+
+        self.assertIsNone(await self.service.get(failing, "user"))
+        self.assertEqual(await self.service.get(fake_db("recovered"), "user"), "recovered")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import tempfile
+import time
+import unittest
+
+from diskcache import FanoutCache
+
+from server.app.services.model_discovery_service import ModelDiscoveryService
+
+
+class FakeProviderClient:
+    """Blocking `get_available_models` like the provider SDKs."""
+
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def get_available_models(self) -> list:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ValueError(f"{self.name} is down")
+        return [{"id": f"{self.name}-model-{self.calls}"}]
+
+
+class FakeAsyncProviderClient(FakeProviderClient):
+    """`get_available_models` on a pooled async SDK client, like the OpenAI client."""
+
+    async def get_available_models(self) -> list:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return [{"id": f"{self.name}-model-{self.calls}"}]
+
+
+class FakeRegistry:
+    def __init__(self, **clients):
+        self.clients = clients
+
+    def get(self, provider: str):
+        return self.clients[provider]
+
+
+class TestModelDiscovery(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = FanoutCache(directory=directory.name, shards=2)
+        self.addCleanup(self.cache.close)
+
+    def service(self, ttl: int = 300, **clients) -> ModelDiscoveryService:
+        return ModelDiscoveryService(self.cache, FakeRegistry(**clients), ttl=ttl)
+
+    async def test_providers_are_queried_concurrently(self):
+        discovery = self.service(openai=FakeProviderClient("openai", delay=0.3),
+                                 anthropic=FakeProviderClient("anthropic", delay=0.3),
+                                 cerebras=FakeProviderClient("cerebras", delay=0.3))
+
+        started = time.perf_counter()
+        models = await discovery.get_models(["OPEN_AI", "ANTHROPIC", "CEREBRAS"])
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(models), 3)
+        self.assertLess(elapsed, 0.6, "Providers were queried one after another")
+
+    async def test_async_clients_are_awaited(self):
+        discovery = self.service(openai=FakeAsyncProviderClient("openai", delay=0.3),
+                                 cerebras=FakeProviderClient("cerebras", delay=0.3))
+
+        started = time.perf_counter()
+        models = await discovery.get_models(["OPEN_AI", "CEREBRAS"])
+
+        self.assertEqual(sorted(model["id"] for model in models), ["cerebras-model-1", "openai-model-1"])
+        self.assertLess(time.perf_counter() - started, 0.6)
+
+    async def test_failing_provider_is_left_out(self):
+        discovery = self.service(openai=FakeProviderClient("openai"),
+                                 cerebras=FakeProviderClient("cerebras", fail=True))
+
+        models = await discovery.get_models(["OPEN_AI", "CEREBRAS"])
+
+        self.assertEqual(models, [{"id": "openai-model-1"}])
+
+    async def test_stale_list_is_served_while_refreshing(self):
+        openai = FakeProviderClient("openai")
+        discovery = self.service(ttl=0, openai=openai)
+
+        first = await discovery.get_models(["OPEN_AI"])
+        await asyncio.sleep(0.01)
+        openai.delay = 0.3
+
+        started = time.perf_counter()
+        second = await discovery.get_models(["OPEN_AI"])
+        self.assertLess(time.perf_counter() - started, 0.1, "Stale list was not served immediately")
+        self.assertEqual(second, first)
+
+        await asyncio.gather(*discovery.refreshing.values())
+        self.assertEqual(await discovery.get_models(["OPEN_AI"]), [{"id": "openai-model-2"}])
+
+    async def test_failed_refresh_keeps_last_good_list(self):
+        openai = FakeProviderClient("openai")
+        discovery = self.service(ttl=0, openai=openai)
+
+        first = await discovery.get_models(["OPEN_AI"])
+        openai.fail = True
+        await asyncio.sleep(0.01)
+        await discovery.get_models(["OPEN_AI"])
+        await asyncio.gather(*discovery.refreshing.values(), return_exceptions=True)
+
+        self.assertEqual(await discovery.get_models(["OPEN_AI"]), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from diskcache import FanoutCache
+
+from server.app.services.thread_context_service import ThreadContextService
+
+
+def turn(prompt: str, answer: str) -> dict:
+    return {"prompt": {"prompt": prompt, "context_data": [
+        {"completion": {"choices": [{"message": {"content": answer}}]}}
+    ]}}
+
+
+def fake_db(rows: list):
+    return SimpleNamespace(execute=AsyncMock(return_value=SimpleNamespace(all=lambda: rows)))
+
+
+class TestThreadContext(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = FanoutCache(directory=directory.name, shards=2)
+        self.addCleanup(cache.close)
+        self.service = ThreadContextService(cache)
+
+    async def test_context_is_built_once_and_then_read_from_cache(self):
+        db = fake_db([("a", turn("Hi", "Hello")), ("b", turn("Tabs?", "Spaces."))])
+
+        first = await self.service.get(db, "user", 1)
+        second = await self.service.get(db, "user", 1)
+
+        self.assertEqual(first, "prompt: Hi answer: Hello prompt: Tabs? answer: Spaces.")
+        self.assertEqual(second, first)
+        self.assertEqual(db.execute.await_count, 1)
+
+    async def test_saved_turn_updates_context_in_place(self):
+        db = fake_db([("a", turn("Hi", "Hello"))])
+        await self.service.get(db, "user", 1)
+
+        await self.service.save_turn("user", 1, "b", turn("Tabs?", "Spaces."))
+        self.assertEqual(await self.service.get(db, "user", 1), "prompt: Hi answer: Hello prompt: Tabs? answer: Spaces.")
+
+        await self.service.save_turn("user", 1, "a", turn("Hi", "Hey"))
+        self.assertEqual(await self.service.get(db, "user", 1), "prompt: Hi answer: Hey prompt: Tabs? answer: Spaces.")
+        self.assertEqual(db.execute.await_count, 1)
+
+    async def test_turns_make_up_the_context(self):
+        db = fake_db([("a", turn("Hi", "Hello")), ("empty", {}), ("b", turn("Tabs?", "Spaces."))])
+
+        turns = await self.service.get_turns(db, "user", 1)
+
+        self.assertEqual(turns, ["prompt: Hi answer: Hello", "prompt: Tabs? answer: Spaces."])
+        self.assertEqual(" ".join(turns), await self.service.get(db, "user", 1))
+        self.assertEqual(db.execute.await_count, 1)
+
+    async def test_context_is_scoped_to_user_and_thread(self):
+        await self.service.get(fake_db([("a", turn("Hi", "Hello"))]), "user", 1)
+        await self.service.save_turn("user", 2, "b", turn("Other", "Thread"))
+
+        self.assertEqual(await self.service.get(fake_db([]), "other-user", 1), "")
+        self.assertEqual(await self.service.get(fake_db([("b", turn("Other", "Thread"))]), "user", 2),
+                         "prompt: Other answer: Thread")
+        self.assertEqual(await self.service.get(fake_db([]), "user", 1), "prompt: Hi answer: Hello")
+
+    async def test_invalidate_rebuilds_from_database(self):
+        await self.service.get(fake_db([("a", turn("Hi", "Hello"))]), "user", 1)
+
+        await self.service.invalidate("user", 1)
+
+        self.assertEqual(await self.service.get(fake_db([]), "user", 1), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
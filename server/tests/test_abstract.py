@@ -2,6 +2,7 @@ import asyncio
 import sqlalchemy as sa
 from server.app.models.users.user import User
 from server.app.db.get_db import get_db
+from server.app.services.api_key_service import create_api_key, delete_api_key
 from sqlalchemy.orm import selectinload
 import unittest
 
@@ -12,10 +13,16 @@ class TestAbstract(unittest.TestCase):
         # Retrieve the API key for the default admin user
         cls.api_key = await cls.get_api_key_for_admin()
 
+    @classmethod
+    def tearDownClass(cls):
+        """Delete the API key issued for the test class, so test runs do not pile up keys of the admin user."""
+        if getattr(cls, "api_key_id", None) is not None:
+            asyncio.run(delete_api_key(cls.api_key_id, cls.api_key_user))
+            cls.api_key_id = None
 
     @classmethod
     async def get_api_key_for_admin(cls):
-        """Retrieve the first API key for the default admin user."""
+        """Issue an API key for the default admin user (stored keys are hashed and cannot be read back)."""
         async for session in get_db():
             # Fetch the admin user based on the username and eagerly load the api_keys relationship
             result = await session.execute(
@@ -23,4 +30,6 @@ class TestAbstract(unittest.TestCase):
             )
             admin_user = result.scalar()
 
-            return admin_user.api_keys[0].key
+            entry, api_key = await create_api_key(admin_user.uuid, db=session)
+            cls.api_key_id, cls.api_key_user = entry.id, entry.user
+            return api_key